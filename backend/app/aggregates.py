@@ -0,0 +1,101 @@
+"""
+Incrementally maintained donation aggregates.
+
+The webhook workers apply each newly succeeded donation to the aggregates
+in the same transaction that records it; a periodic job reconciles them
+against the donations table to repair any drift.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from .config import settings
+from .database import (
+    increment_donation_totals,
+    increment_user_donation_stats,
+    increment_donation_rollups,
+    reconcile_donation_totals,
+    reconcile_user_donation_stats,
+    backfill_donation_rollups,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reconciliation runs; 0 disables the job
+DONATION_TOTALS_RECONCILE_SECONDS = settings.donation_totals_reconcile_seconds
+
+# Days of rollups rebuilt by each reconciliation run, and how long hourly
+# buckets are kept (daily buckets are kept forever)
+DONATION_ROLLUP_RECONCILE_DAYS = settings.donation_rollup_reconcile_days
+DONATION_ROLLUP_HOURLY_RETENTION_DAYS = settings.donation_rollup_hourly_retention_days
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+
+def apply_succeeded_donation(
+    cursor,
+    crisis_id: int,
+    charity_id: Optional[int],
+    amount: int,
+    currency: str,
+    donated_at: datetime,
+    user_id: Optional[int] = None,
+) -> None:
+    """Add a donation that just reached `succeeded` to every aggregate."""
+    increment_donation_totals(cursor, crisis_id, charity_id, amount)
+    increment_donation_rollups(cursor, crisis_id, amount, donated_at)
+    if user_id is not None:
+        increment_user_donation_stats(cursor, user_id, crisis_id, charity_id, amount, currency)
+
+
+def reconcile_aggregates() -> None:
+    """Recompute all aggregates from donations, reporting any drift."""
+    fixed = reconcile_donation_totals()
+    fixed["users"] = reconcile_user_donation_stats()
+    backfill_donation_rollups(DONATION_ROLLUP_RECONCILE_DAYS, DONATION_ROLLUP_HOURLY_RETENTION_DAYS)
+    if any(fixed.values()):
+        logger.warning("Reconciled drifted donation aggregates", extra={"fixed": fixed})
+
+
+async def _reconcile_loop() -> None:
+    """Run reconciliation every DONATION_TOTALS_RECONCILE_SECONDS until cancelled."""
+    while True:
+        await asyncio.sleep(DONATION_TOTALS_RECONCILE_SECONDS)
+        try:
+            await asyncio.to_thread(reconcile_aggregates)
+        except Exception:
+            logger.exception("Donation aggregate reconciliation failed")
+
+
+def start_reconciliation_job() -> None:
+    """Start the periodic reconciliation job, unless disabled."""
+    global _reconcile_task
+    if DONATION_TOTALS_RECONCILE_SECONDS > 0:
+        _reconcile_task = asyncio.create_task(_reconcile_loop())
+
+
+async def stop_reconciliation_job() -> None:
+    """Cancel the reconciliation job and wait for it to exit."""
+    global _reconcile_task
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        await asyncio.gather(_reconcile_task, return_exceptions=True)
+        _reconcile_task = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile donation aggregates")
+    parser.add_argument("--backfill-rollups-days", type=int, default=None,
+                        help="Rebuild time-bucketed rollups for this many days instead of reconciling")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.backfill_rollups_days is not None:
+        written = backfill_donation_rollups(
+            args.backfill_rollups_days, DONATION_ROLLUP_HOURLY_RETENTION_DAYS
+        )
+        print(f"✅ Backfilled {written} rollup buckets")
+    else:
+        reconcile_aggregates()
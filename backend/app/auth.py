@@ -1,20 +1,22 @@
 """
 Authentication utilities for JWT tokens and password hashing
 """
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Generator, Optional
 from jose import JWTError, jwt
 import bcrypt
 import secrets
 from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from .config import settings
+from .tracing import span
 
 # JWT Configuration
-SECRET_KEY = os.getenv("SECRET_KEY")
+SECRET_KEY = settings.secret_key
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable not set")
 ALGORITHM = "HS256"
@@ -27,16 +29,39 @@ COOKIE_MAX_AGE = 60 * 60 * 24 * 7  # 7 days in seconds
 # CSRF Configuration
 CSRF_TOKEN_LENGTH = 32
 CSRF_COOKIE_NAME = "csrf_token"
+
+# Admin access (comma-separated emails allowed to use admin endpoints)
+ADMIN_EMAILS = {email.lower() for email in settings.admin_emails}
+_bcrypt_lock = threading.Lock()
+_bcrypt_stats = {"running": 0, "completed": 0, "seconds": 0.0}
+
 # HTTP Bearer token security (kept for backward compatibility)
 security = HTTPBearer(auto_error=False)
 
 
+@contextmanager
+def _timed_bcrypt(operation: str) -> Generator[None, None, None]:
+    """Count and time a bcrypt call for /metrics, under a trace span"""
+    with _bcrypt_lock:
+        _bcrypt_stats["running"] += 1
+    started = time.perf_counter()
+    try:
+        with span(f"bcrypt.{operation}"):
+            yield
+    finally:
+        with _bcrypt_lock:
+            _bcrypt_stats["running"] -= 1
+            _bcrypt_stats["completed"] += 1
+            _bcrypt_stats["seconds"] += time.perf_counter() - started
+
+
 def hash_password(password: str) -> str:
     """Hash a plain password using bcrypt"""
     # Bcrypt has a max password length of 72 bytes
     password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    with _timed_bcrypt("hash_password"):
+        salt = bcrypt.gensalt(rounds=12)
+        hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
 
@@ -44,7 +69,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a bcrypt hash"""
     password_bytes = plain_password.encode('utf-8')[:72]
     hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    with _timed_bcrypt("verify_password"):
+        return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+
+def get_bcrypt_stats() -> Dict[str, float]:
+    """Password hashing calls running now, completed so far and their total time"""
+    with _bcrypt_lock:
+        return dict(_bcrypt_stats)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -156,6 +188,16 @@ async def get_current_user(request: Request) -> dict:
     return {"user_id": user_id, "email": email}
 
 
+async def get_current_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency to require an authenticated user listed in ADMIN_EMAILS"""
+    if current_user["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
+
+
 def verify_csrf(request: Request) -> None:
     """Verify CSRF token for state-changing requests using double submit cookie pattern."""
     csrf_token_header = request.headers.get("X-CSRF-Token")
@@ -0,0 +1,194 @@
+"""
+Small in-process caches.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed number of seconds.
+
+    Hits and misses are counted so cache effectiveness can be reported.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not), or default."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CacheRead(NamedTuple):
+    """A value from StaleWhileRevalidateCache and how it was served."""
+    value: Any
+    # None when fresh, "revalidating" past the soft TTL, "error" once a refresh has failed
+    stale: Optional[str]
+    # Seconds since the value was loaded
+    age: float
+
+
+class StaleWhileRevalidateCache:
+    """
+    LRU cache of loader results that keeps serving entries after they go stale.
+
+    An entry younger than soft_ttl is fresh. Until hard_ttl it is still
+    served, marked stale, while a refresh runs on `executor`. If that refresh
+    fails the old value keeps being served and the refresh is retried at most
+    every retry_seconds. On a miss, or past hard_ttl, the loader runs in the
+    caller and its errors propagate. Values for which `cache_if` returns
+    False are returned but not kept, so lookups of keys with nothing behind
+    them cannot evict useful entries.
+    """
+
+    def __init__(self, maxsize: int, soft_ttl: float, hard_ttl: float, executor: Executor,
+                 retry_seconds: float = 5.0, cache_if: Optional[Callable[[Any], bool]] = None):
+        self.maxsize = maxsize
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+        self.retry_seconds = retry_seconds
+        self.cache_if = cache_if
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+        self._executor = executor
+        # key -> [monotonic time loaded, value, monotonic time of the last failed refresh or None]
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._refreshing: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> CacheRead:
+        """The cached value for key, loading it with loader() on a miss."""
+        refresh = False
+        with self._lock:
+            entry = self._data.get(key)
+            now = time.monotonic()
+            age = now - entry[0] if entry is not None else 0.0
+            if entry is not None and age < self.hard_ttl:
+                self._data.move_to_end(key)
+                if age < self.soft_ttl:
+                    self.hits += 1
+                    return CacheRead(entry[1], None, age)
+                self.stale_hits += 1
+                failed_at = entry[2]
+                if key not in self._refreshing and (failed_at is None or now - failed_at >= self.retry_seconds):
+                    self._refreshing.add(key)
+                    refresh = True
+                read = CacheRead(entry[1], "error" if failed_at is not None else "revalidating", age)
+            else:
+                self.misses += 1
+                read = None
+        if read is not None:
+            if refresh:
+                self._executor.submit(self._refresh, key, loader)
+            return read
+        value = loader()
+        self._store(key, value)
+        return CacheRead(value, None, 0.0)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if self.cache_if is not None and not self.cache_if(value):
+                self._data.pop(key, None)
+                return
+            self._data[key] = [time.monotonic(), value, None]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self.refresh_failures += 1
+                entry = self._data.get(key)
+                if entry is not None:
+                    entry[2] = time.monotonic()
+            logger.warning("Cache refresh failed, serving stale", extra={"cache_key": repr(key), "error": str(e)})
+        else:
+            self._store(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, fresh and stale hits, misses and failed background refreshes."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits + self.stale_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_failures": self.refresh_failures,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
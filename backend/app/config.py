@@ -0,0 +1,142 @@
+"""
+Application settings, read once from the environment and .env.
+
+Modules take their configuration from `settings` rather than calling
+os.getenv themselves, so .env is parsed a single time at startup and every
+knob is listed here. Each field is set by the environment variable of the
+same name upper-cased, e.g. `stripe_max_concurrency` by STRIPE_MAX_CONCURRENCY.
+"""
+import os
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from dotenv import load_dotenv
+
+
+def _parse_bool(raw: str) -> bool:
+    return raw.strip().lower() in ("1", "true", "yes")
+
+
+def _parse_list(raw: str) -> FrozenSet[str]:
+    return frozenset(item.strip() for item in raw.split(",") if item.strip())
+
+
+_PARSERS: Dict[Any, Callable[[str], Any]] = {
+    str: str,
+    Optional[str]: str,
+    int: int,
+    float: float,
+    bool: _parse_bool,
+    FrozenSet[str]: _parse_list,
+}
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Database
+    db_host: str = "localhost"
+    db_port: str = "5432"
+    db_name: str = "globemap"
+    db_user: str = "postgres"
+    db_password: str = "postgres"
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_pool_timeout_seconds: float = 5
+    db_pool_max_idle_seconds: float = 600
+    db_export_max_connections: int = 4
+    db_slow_query_ms: float = 200
+    db_explain_slow_queries: bool = False
+    db_explain_timeout_ms: int = 5000
+    db_query_stats_max: int = 500
+
+    # Auth
+    secret_key: Optional[str] = None
+    admin_emails: FrozenSet[str] = frozenset()
+
+    # Stripe
+    stripe_secret_key: Optional[str] = None
+    stripe_webhook_secret: Optional[str] = None
+    stripe_api_base: Optional[str] = None
+    stripe_timeout_seconds: float = 10
+    stripe_connect_timeout_seconds: float = 3
+    stripe_max_network_retries: int = 2
+    stripe_max_connections: int = 20
+    stripe_max_keepalive_connections: int = 10
+    stripe_keepalive_expiry_seconds: float = 30
+    stripe_max_concurrency: int = 20
+    stripe_queue_timeout_seconds: float = 5
+    payment_status_stale_seconds: float = 30
+    idempotency_key_ttl_seconds: float = 3600
+    idempotency_cache_size: int = 10000
+
+    # Webhook inbox
+    webhook_workers: int = 2
+    webhook_batch_size: int = 50
+    webhook_poll_interval_seconds: float = 1
+    webhook_max_attempts: int = 8
+    webhook_retry_base_seconds: float = 5
+    webhook_retry_max_seconds: float = 900
+    webhook_event_cache_size: int = 10000
+    webhook_event_cache_ttl_seconds: float = 3600
+
+    # Donation aggregates and partitions
+    donation_totals_reconcile_seconds: float = 3600
+    donation_rollup_reconcile_days: int = 2
+    donation_rollup_hourly_retention_days: int = 90
+    donation_partition_months_ahead: int = 3
+    donation_archive_after_months: int = 0
+    donation_partition_maintenance_seconds: float = 86400
+
+    # Health probes
+    health_cache_seconds: float = 2
+    health_probe_timeout_seconds: float = 1
+    health_inbox_max_lag_seconds: float = 300
+    health_max_pool_saturation: float = 1
+
+    # Public read caches
+    public_cache_soft_ttl_seconds: float = 30
+    public_cache_hard_ttl_seconds: float = 3600
+    public_cache_retry_seconds: float = 5
+    public_cache_size: int = 256
+    public_search_cache_size: int = 64
+
+    # Exports
+    export_fetch_size: int = 2000
+    export_chunk_bytes: int = 65536
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    log_error_burst: int = 5
+    log_error_window_seconds: float = 60
+
+    # Tracing
+    trace_sample_rate: float = 0
+    trace_trust_parent_sampling: bool = False
+    trace_exporter: str = "file"
+    trace_file: str = "traces.ndjson"
+    trace_queue_size: int = 10000
+    trace_batch_size: int = 512
+    trace_flush_seconds: float = 1
+
+    # Profiling
+    profiling_enabled: bool = False
+    profiling_token: str = ""
+    profile_max_seconds: float = 60
+    profile_interval_ms: float = 5
+    request_profile_interval_ms: float = 1
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Settings from the environment, after loading .env; unset variables keep their defaults."""
+        load_dotenv()
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(field.name.upper())
+            if raw is not None:
+                values[field.name] = _PARSERS[field.type](raw)
+        return cls(**values)
+
+
+settings = Settings.from_env()
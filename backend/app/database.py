@@ -2,35 +2,95 @@
 Database connection and query utilities.
 """
 
-import os
+import threading
+import time
 from contextlib import contextmanager
-from typing import Generator, Any, List, Dict, Optional
+from datetime import date, datetime
+from typing import Generator, Any, List, Dict, Optional, Tuple
 
 import psycopg
 from psycopg.rows import dict_row
-from dotenv import load_dotenv
+from psycopg.types.json import Jsonb
 
-load_dotenv()
+from .config import settings
+from .pool import ConnectionPool, PoolTimeout
+from .query_stats import InstrumentedCursor, InstrumentedServerCursor
+
+DB_POOL_MIN_SIZE = settings.db_pool_min_size
+DB_POOL_MAX_SIZE = settings.db_pool_max_size
+# How long a request waits for a free connection before failing
+DB_POOL_TIMEOUT_SECONDS = settings.db_pool_timeout_seconds
+DB_POOL_MAX_IDLE_SECONDS = settings.db_pool_max_idle_seconds
+# Concurrent streaming exports per worker, each on its own unpooled connection
+DB_EXPORT_MAX_CONNECTIONS = settings.db_export_max_connections
 
 
 def get_connection_params() -> str:
-    """Get database connection parameters from environment as connection string."""
-    host = os.getenv("DB_HOST", "localhost")
-    port = os.getenv("DB_PORT", "5432")
-    dbname = os.getenv("DB_NAME", "globemap")
-    user = os.getenv("DB_USER", "postgres")
-    password = os.getenv("DB_PASSWORD", "postgres")
-    
-    return f"host={host} port={port} dbname={dbname} user={user} password={password}"
+    """Get database connection parameters from settings as connection string."""
+    return (
+        f"host={settings.db_host} port={settings.db_port} dbname={settings.db_name} "
+        f"user={settings.db_user} password={settings.db_password}"
+    )
+
+
+def _configure_connection(conn: psycopg.Connection) -> None:
+    conn.server_cursor_factory = InstrumentedServerCursor
+
+
+pool = ConnectionPool(
+    get_connection_params,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT_SECONDS,
+    max_idle=DB_POOL_MAX_IDLE_SECONDS,
+    configure=_configure_connection,
+    cursor_factory=InstrumentedCursor,
+)
 
 
 @contextmanager
 def get_db_connection() -> Generator:
-    """Context manager for database connections."""
-    with psycopg.connect(get_connection_params()) as conn:
+    """Context manager for a pooled database connection; statements on it are instrumented."""
+    started = time.perf_counter()
+    with pool.connection() as conn:
+        # Charged to the first statement run on this connection
+        conn.acquire_wait = time.perf_counter() - started
         yield conn
 
 
+_export_slots = threading.BoundedSemaphore(DB_EXPORT_MAX_CONNECTIONS)
+
+
+@contextmanager
+def get_export_connection() -> Generator:
+    """
+    Context manager for an unpooled connection held for the length of a streamed export.
+
+    A slow download can hold its connection for minutes, so exports never
+    borrow from the pool that serves requests and background jobs. At most
+    DB_EXPORT_MAX_CONNECTIONS are open at once; past that, the caller waits
+    up to DB_POOL_TIMEOUT_SECONDS and then gets PoolTimeout.
+    """
+    if not _export_slots.acquire(timeout=DB_POOL_TIMEOUT_SECONDS):
+        raise PoolTimeout(f"No export connection available after {DB_POOL_TIMEOUT_SECONDS:.1f}s")
+    try:
+        with psycopg.connect(get_connection_params(), cursor_factory=InstrumentedCursor) as conn:
+            _configure_connection(conn)
+            yield conn
+    finally:
+        _export_slots.release()
+
+
+def get_connection_stats() -> Dict[str, float]:
+    """Pool size, connections idle and in use, waiters, timeouts and time spent acquiring connections."""
+    return pool.get_stats()
+
+
+def close_pool() -> None:
+    """Close pooled connections at shutdown."""
+    pool.close()
+
+
 @contextmanager
 def get_db_cursor() -> Generator:
     """Context manager for database cursors with dict results."""
@@ -44,54 +104,174 @@ def get_db_cursor() -> Generator:
                 raise
 
 
+@contextmanager
+def use_cursor(cursor=None) -> Generator:
+    """
+    Yield the given cursor, or open a new one in its own transaction.
+
+    Lets write helpers join a caller's transaction when handed a cursor.
+    """
+    if cursor is not None:
+        yield cursor
+    else:
+        with get_db_cursor() as new_cursor:
+            yield new_cursor
+
+
+def build_crises_query(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    sort: str = "severity",
+) -> Tuple[str, List[Any]]:
+    """Build the active crises query and its parameters for fetch_crises."""
+    query = """
+        SELECT
+            c.*,
+            COALESCE(t.total_amount, 0) as total_raised,
+            COALESCE(t.donation_count, 0) as donation_count
+        FROM crises c
+        LEFT JOIN crisis_donation_totals t ON t.crisis_id = c.id
+        WHERE c.is_active = TRUE
+    """
+    params: List[Any] = []
+    
+    if search:
+        query += """ AND (
+            c.title ILIKE %s OR 
+            c.summary ILIKE %s OR 
+            c.description ILIKE %s OR 
+            c.country ILIKE %s
+        )"""
+        search_param = f"%{search}%"
+        params.extend([search_param] * 4)
+    
+    if category:
+        query += " AND c.category = %s"
+        params.append(category)
+    
+    if severity:
+        query += " AND c.severity = %s"
+        params.append(severity)
+    
+    if sort == "funding":
+        query += " ORDER BY total_raised DESC, c.id"
+    else:
+        query += " ORDER BY CASE c.severity WHEN 'Critical' THEN 1 WHEN 'High' THEN 2 WHEN 'Medium' THEN 3 ELSE 4 END, c.start_date DESC"
+    
+    return query, params
+
+
 def fetch_crises(
     search: Optional[str] = None,
     category: Optional[str] = None,
-    severity: Optional[str] = None
+    severity: Optional[str] = None,
+    sort: str = "severity",
 ) -> List[Dict[str, Any]]:
-    """Fetch crises with optional filters."""
+    """Fetch crises with optional filters, including donation totals."""
     with get_db_cursor() as cursor:
-        query = "SELECT * FROM crises WHERE is_active = TRUE"
-        params: List[Any] = []
-        
-        if search:
-            query += """ AND (
-                title ILIKE %s OR 
-                summary ILIKE %s OR 
-                description ILIKE %s OR 
-                country ILIKE %s
-            )"""
-            search_param = f"%{search}%"
-            params.extend([search_param] * 4)
-        
-        if category:
-            query += " AND category = %s"
-            params.append(category)
-        
-        if severity:
-            query += " AND severity = %s"
-            params.append(severity)
-        
-        query += " ORDER BY CASE severity WHEN 'Critical' THEN 1 WHEN 'High' THEN 2 WHEN 'Medium' THEN 3 ELSE 4 END, start_date DESC"
-        
-        cursor.execute(query, params)
+        cursor.execute(*build_crises_query(search, category, severity, sort))
         return cursor.fetchall()
 
 
+CRISIS_BY_ID_QUERY = """
+    SELECT
+        c.*,
+        COALESCE(t.total_amount, 0) as total_raised,
+        COALESCE(t.donation_count, 0) as donation_count
+    FROM crises c
+    LEFT JOIN crisis_donation_totals t ON t.crisis_id = c.id
+    WHERE c.id = %s
+"""
+
+USER_BY_EMAIL_QUERY = "SELECT id, email, password_hash FROM users WHERE email = %s"
+
+USER_BY_ID_QUERY = "SELECT id, email, created_at FROM users WHERE id = %s"
+
+
 def fetch_crisis_by_id(crisis_id: int) -> Optional[Dict[str, Any]]:
-    """Fetch a single crisis by ID."""
+    """Fetch a single crisis by ID, including donation totals."""
     with get_db_cursor() as cursor:
-        cursor.execute("SELECT * FROM crises WHERE id = %s", (crisis_id,))
+        cursor.execute(CRISIS_BY_ID_QUERY, (crisis_id,))
         return cursor.fetchone()
 
 
+# psycopg dumps an int as smallint, integer or bigint depending on its value,
+# and keys prepared statements on the query and parameter types. Serial ids
+# arrive as either of the first two, so id lookups are warmed with both.
+WARM_UP_IDS = (1, 2 ** 15)
+
+
+def hot_statements() -> List[Tuple[str, List[Any]]]:
+    """
+    Statements worth preparing on every pooled connection, with sample parameters.
+
+    Every filter combination of fetch_crises, the crisis lookup and the user
+    lookups behind login and /auth/me. Parameters have the Python types the
+    real callers pass (str filters and emails, int ids), so the prepared
+    statements are the ones those calls reuse.
+    """
+    statements = [
+        build_crises_query(search, category, severity, sort)
+        for search in (None, "water")
+        for category in (None, "Disaster")
+        for severity in (None, "Critical")
+        for sort in ("severity", "funding")
+    ]
+    for sample_id in WARM_UP_IDS:
+        statements += [
+            (CRISIS_BY_ID_QUERY, [sample_id]),
+            (USER_BY_ID_QUERY, [sample_id]),
+        ]
+    statements.append((USER_BY_EMAIL_QUERY, ["warm-up@example.com"]))
+    return statements
+
+
+def warm_up_pool() -> int:
+    """
+    Open the pool to its minimum size and prepare the hot statements on each connection.
+
+    Returns the number of connections warmed. Uses plain cursors so the
+    warm-up runs are kept out of the query statistics.
+
+    Best effort: psycopg deallocates a connection's prepared statements when
+    a transaction on it rolls back, so after a failed request that
+    connection prepares them again on demand.
+    """
+    pool.open()
+    statements = hot_statements()
+    connections = []
+    try:
+        for _ in range(pool.min_size):
+            connections.append(pool.getconn())
+        for conn in connections:
+            with conn.pipeline():
+                cursor = psycopg.Cursor(conn)
+                for query, params in statements:
+                    cursor.execute(query, params, prepare=True)
+            # Read-only; psycopg deallocates prepared statements on rollback
+            conn.commit()
+    finally:
+        for conn in connections:
+            pool.putconn(conn)
+    return len(connections)
+
+
 def fetch_charities(crisis_id: Optional[int] = None) -> List[Dict[str, Any]]:
-    """Fetch charities, optionally filtered by crisis ID."""
+    """Fetch charities, optionally filtered by crisis ID, including donation totals."""
     with get_db_cursor() as cursor:
+        query = """
+            SELECT
+                ch.*,
+                COALESCE(t.total_amount, 0) as total_raised,
+                COALESCE(t.donation_count, 0) as donation_count
+            FROM charities ch
+            LEFT JOIN charity_donation_totals t ON t.charity_id = ch.id
+        """
         if crisis_id:
-            cursor.execute("SELECT * FROM charities WHERE crisis_id = %s ORDER BY name", (crisis_id,))
+            cursor.execute(query + " WHERE ch.crisis_id = %s ORDER BY ch.name", (crisis_id,))
         else:
-            cursor.execute("SELECT * FROM charities ORDER BY name")
+            cursor.execute(query + " ORDER BY ch.name")
         return cursor.fetchall()
 
 
@@ -108,67 +288,715 @@ def create_donation_record(
     status: str,
     user_id: Optional[int] = None,
     charity_id: Optional[int] = None,
-) -> Dict[str, Any]:
-    """Create a record for a new donation."""
-    with get_db_cursor() as cursor:
+    cursor=None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Create or update the donation record for a payment intent.
+
+    Idempotent: replaying the same payment intent status is a no-op and
+    returns None. A status change updates the existing row, except that a
+    succeeded donation is never downgraded by a late, out-of-order event.
+    The returned row includes previous_status (None for a new donation).
+
+    donations is partitioned by created_at, so uniqueness per payment intent
+    is enforced by donation_keys, which also pins the row's id and partition.
+    Donations already moved to the archive are frozen: events for them are no-ops.
+    """
+    with use_cursor(cursor) as cursor:
         query = """
+            WITH key AS (
+                INSERT INTO donation_keys (stripe_payment_intent_id) VALUES (%(payment_intent_id)s)
+                ON CONFLICT (stripe_payment_intent_id) DO UPDATE SET
+                    stripe_payment_intent_id = EXCLUDED.stripe_payment_intent_id
+                RETURNING donation_id, created_at
+            ), previous AS (
+                SELECT d.status FROM donations d, key
+                WHERE d.id = key.donation_id AND d.created_at = key.created_at
+            )
             INSERT INTO donations (
-                crisis_id, amount, currency, stripe_payment_intent_id, status, user_id, charity_id
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, created_at
+                id, created_at, crisis_id, amount, currency, stripe_payment_intent_id,
+                status, user_id, charity_id
+            )
+            SELECT
+                key.donation_id, key.created_at, %(crisis_id)s, %(amount)s, %(currency)s,
+                %(payment_intent_id)s, %(status)s, %(user_id)s, %(charity_id)s
+            FROM key
+            WHERE NOT EXISTS (
+                SELECT 1 FROM archive.donations a
+                WHERE a.id = key.donation_id AND a.created_at = key.created_at
+            )
+            ON CONFLICT (id, created_at) DO UPDATE SET
+                status = EXCLUDED.status,
+                amount = EXCLUDED.amount,
+                currency = EXCLUDED.currency
+            WHERE donations.status IS DISTINCT FROM EXCLUDED.status
+                AND donations.status <> 'succeeded'
+            RETURNING id, created_at, status, (SELECT status FROM previous) as previous_status
+        """
+        params = {
+            "payment_intent_id": stripe_payment_intent_id,
+            "crisis_id": crisis_id,
+            "amount": amount,
+            "currency": currency,
+            "status": status,
+            "user_id": user_id,
+            "charity_id": charity_id,
+        }
+        cursor.execute(query, params)
+        return cursor.fetchone()
+
+
+def increment_donation_totals(
+    cursor,
+    crisis_id: int,
+    charity_id: Optional[int],
+    amount: int,
+) -> None:
+    """Add a newly succeeded donation to the crisis and charity running totals."""
+    cursor.execute(
+        """
+        INSERT INTO crisis_donation_totals (crisis_id, total_amount, donation_count)
+        VALUES (%s, %s, 1)
+        ON CONFLICT (crisis_id) DO UPDATE SET
+            total_amount = crisis_donation_totals.total_amount + EXCLUDED.total_amount,
+            donation_count = crisis_donation_totals.donation_count + 1,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (crisis_id, amount),
+    )
+    if charity_id is not None:
+        cursor.execute(
+            """
+            INSERT INTO charity_donation_totals (charity_id, total_amount, donation_count)
+            VALUES (%s, %s, 1)
+            ON CONFLICT (charity_id) DO UPDATE SET
+                total_amount = charity_donation_totals.total_amount + EXCLUDED.total_amount,
+                donation_count = charity_donation_totals.donation_count + 1,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            (charity_id, amount),
+        )
+
+
+def increment_user_donation_stats(
+    cursor,
+    user_id: int,
+    crisis_id: int,
+    charity_id: Optional[int],
+    amount: int,
+    currency: str,
+) -> None:
+    """
+    Add a newly succeeded donation to the user's summary.
+
+    Distinct crisis and charity counts only grow when the donation is the
+    user's first for that crisis or charity.
+    """
+    cursor.execute(
+        """
+        WITH new_crisis AS (
+            INSERT INTO user_supported_crises (user_id, crisis_id)
+            VALUES (%(user_id)s, %(crisis_id)s)
+            ON CONFLICT DO NOTHING
+            RETURNING 1
+        ), new_charity AS (
+            INSERT INTO user_supported_charities (user_id, charity_id)
+            SELECT %(user_id)s, %(charity_id)s
+            WHERE %(charity_id)s::integer IS NOT NULL
+            ON CONFLICT DO NOTHING
+            RETURNING 1
+        )
+        INSERT INTO user_donation_stats (
+            user_id, total_amount, currency, donation_count, crisis_count, charity_count
+        ) VALUES (
+            %(user_id)s, %(amount)s, %(currency)s, 1,
+            (SELECT COUNT(*) FROM new_crisis),
+            (SELECT COUNT(*) FROM new_charity)
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_amount = user_donation_stats.total_amount + EXCLUDED.total_amount,
+            currency = GREATEST(user_donation_stats.currency, EXCLUDED.currency),
+            donation_count = user_donation_stats.donation_count + 1,
+            crisis_count = user_donation_stats.crisis_count + EXCLUDED.crisis_count,
+            charity_count = user_donation_stats.charity_count + EXCLUDED.charity_count,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        {
+            "user_id": user_id,
+            "crisis_id": crisis_id,
+            "charity_id": charity_id,
+            "amount": amount,
+            "currency": currency,
+        },
+    )
+
+
+def increment_donation_rollups(
+    cursor,
+    crisis_id: int,
+    amount: int,
+    donated_at: datetime,
+) -> None:
+    """Add a newly succeeded donation to its crisis's hourly and daily rollup buckets."""
+    cursor.execute(
+        """
+        INSERT INTO crisis_donation_rollups (crisis_id, bucket, bucket_start, total_amount, donation_count)
+        VALUES
+            (%(crisis_id)s, 'hour', date_trunc('hour', %(donated_at)s::timestamp), %(amount)s, 1),
+            (%(crisis_id)s, 'day', date_trunc('day', %(donated_at)s::timestamp), %(amount)s, 1)
+        ON CONFLICT (crisis_id, bucket, bucket_start) DO UPDATE SET
+            total_amount = crisis_donation_rollups.total_amount + EXCLUDED.total_amount,
+            donation_count = crisis_donation_rollups.donation_count + 1
+        """,
+        {"crisis_id": crisis_id, "amount": amount, "donated_at": donated_at},
+    )
+
+
+def backfill_donation_rollups(days: int, hourly_retention_days: Optional[int] = None) -> int:
+    """
+    Rebuild the rollups for the last `days` days from live and archived donations.
+
+    The window starts at a day boundary so both bucket sizes are rebuilt
+    whole; the created_at range is served by the BRIN index. Hourly buckets
+    older than hourly_retention_days are pruned. Returns the number of
+    buckets written.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute("LOCK TABLE crisis_donation_rollups IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT date_trunc('day', CURRENT_TIMESTAMP::timestamp - make_interval(days => %s)) as since",
+            (days,),
+        )
+        since = cursor.fetchone()["since"]
+        cursor.execute("DELETE FROM crisis_donation_rollups WHERE bucket_start >= %s", (since,))
+        cursor.execute(
+            """
+            INSERT INTO crisis_donation_rollups (crisis_id, bucket, bucket_start, total_amount, donation_count)
+            SELECT crisis_id, bucket, bucket_start, SUM(amount), COUNT(*)
+            FROM donations_all
+            CROSS JOIN LATERAL (
+                VALUES ('hour', date_trunc('hour', created_at)), ('day', date_trunc('day', created_at))
+            ) b(bucket, bucket_start)
+            WHERE status = 'succeeded' AND created_at >= %s
+            GROUP BY crisis_id, bucket, bucket_start
+            """,
+            (since,),
+        )
+        written = cursor.rowcount
+        if hourly_retention_days is not None:
+            cursor.execute(
+                """
+                DELETE FROM crisis_donation_rollups
+                WHERE bucket = 'hour'
+                    AND bucket_start < CURRENT_TIMESTAMP - make_interval(days => %s)
+                """,
+                (hourly_retention_days,),
+            )
+        return written
+
+
+def fetch_crisis_donation_timeseries(
+    crisis_id: int,
+    bucket: str,
+    days: int,
+) -> List[Dict[str, Any]]:
+    """Fetch non-empty rollup buckets for a crisis over the last `days` days, oldest first."""
+    with get_db_cursor() as cursor:
+        query = """
+            SELECT bucket_start, total_amount, donation_count
+            FROM crisis_donation_rollups
+            WHERE crisis_id = %s AND bucket = %s
+                AND bucket_start >= date_trunc(%s, CURRENT_TIMESTAMP::timestamp - make_interval(days => %s))
+            ORDER BY bucket_start
+        """
+        cursor.execute(query, (crisis_id, bucket, bucket, days))
+        return cursor.fetchall()
+
+
+def reconcile_user_donation_stats() -> int:
+    """
+    Rebuild per-user summaries and memberships from donations, fixing any drift.
+
+    Memberships and summaries with no succeeded donation behind them are
+    deleted. Returns the number of corrected or deleted user_donation_stats rows.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            LOCK TABLE user_donation_stats, user_supported_crises, user_supported_charities
+            IN SHARE ROW EXCLUSIVE MODE
+            """
+        )
+        cursor.execute(
+            """
+            DELETE FROM user_supported_crises sc
+            WHERE NOT EXISTS (
+                SELECT 1 FROM donations_all d
+                WHERE d.user_id = sc.user_id AND d.crisis_id = sc.crisis_id AND d.status = 'succeeded'
+            )
+            """
+        )
+        cursor.execute(
+            """
+            DELETE FROM user_supported_charities sch
+            WHERE NOT EXISTS (
+                SELECT 1 FROM donations_all d
+                WHERE d.user_id = sch.user_id AND d.charity_id = sch.charity_id AND d.status = 'succeeded'
+            )
+            """
+        )
+        cursor.execute(
+            """
+            DELETE FROM user_donation_stats s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM donations_all d
+                WHERE d.user_id = s.user_id AND d.status = 'succeeded'
+            )
+            """
+        )
+        deleted = cursor.rowcount
+        cursor.execute(
+            """
+            INSERT INTO user_supported_crises (user_id, crisis_id)
+            SELECT DISTINCT user_id, crisis_id
+            FROM donations_all
+            WHERE status = 'succeeded' AND user_id IS NOT NULL
+            ON CONFLICT DO NOTHING
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO user_supported_charities (user_id, charity_id)
+            SELECT DISTINCT user_id, charity_id
+            FROM donations_all
+            WHERE status = 'succeeded' AND user_id IS NOT NULL AND charity_id IS NOT NULL
+            ON CONFLICT DO NOTHING
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO user_donation_stats (
+                user_id, total_amount, currency, donation_count, crisis_count, charity_count
+            )
+            SELECT
+                d.user_id,
+                SUM(d.amount),
+                MAX(d.currency),
+                COUNT(*),
+                (SELECT COUNT(*) FROM user_supported_crises sc WHERE sc.user_id = d.user_id),
+                (SELECT COUNT(*) FROM user_supported_charities sch WHERE sch.user_id = d.user_id)
+            FROM donations_all d
+            WHERE d.status = 'succeeded' AND d.user_id IS NOT NULL
+            GROUP BY d.user_id
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_amount = EXCLUDED.total_amount,
+                currency = EXCLUDED.currency,
+                donation_count = EXCLUDED.donation_count,
+                crisis_count = EXCLUDED.crisis_count,
+                charity_count = EXCLUDED.charity_count,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (
+                user_donation_stats.total_amount, user_donation_stats.currency,
+                user_donation_stats.donation_count, user_donation_stats.crisis_count,
+                user_donation_stats.charity_count
+            ) IS DISTINCT FROM (
+                EXCLUDED.total_amount, EXCLUDED.currency, EXCLUDED.donation_count,
+                EXCLUDED.crisis_count, EXCLUDED.charity_count
+            )
+            """
+        )
+        return deleted + cursor.rowcount
+
+
+def reconcile_donation_totals() -> Dict[str, int]:
+    """
+    Recompute crisis and charity totals from donations and fix any drift.
+
+    The totals tables are locked against concurrent increments for the
+    duration, so no in-flight donation is lost or counted twice.
+    Returns the number of corrected rows per table.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "LOCK TABLE crisis_donation_totals, charity_donation_totals IN SHARE ROW EXCLUSIVE MODE"
+        )
+        cursor.execute(
+            """
+            INSERT INTO crisis_donation_totals (crisis_id, total_amount, donation_count)
+            SELECT c.id, COALESCE(SUM(d.amount), 0), COUNT(d.id)
+            FROM crises c
+            LEFT JOIN donations_all d ON d.crisis_id = c.id AND d.status = 'succeeded'
+            GROUP BY c.id
+            ON CONFLICT (crisis_id) DO UPDATE SET
+                total_amount = EXCLUDED.total_amount,
+                donation_count = EXCLUDED.donation_count,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (crisis_donation_totals.total_amount, crisis_donation_totals.donation_count)
+                IS DISTINCT FROM (EXCLUDED.total_amount, EXCLUDED.donation_count)
+            """
+        )
+        crises_fixed = cursor.rowcount
+        cursor.execute(
+            """
+            INSERT INTO charity_donation_totals (charity_id, total_amount, donation_count)
+            SELECT ch.id, COALESCE(SUM(d.amount), 0), COUNT(d.id)
+            FROM charities ch
+            LEFT JOIN donations_all d ON d.charity_id = ch.id AND d.status = 'succeeded'
+            GROUP BY ch.id
+            ON CONFLICT (charity_id) DO UPDATE SET
+                total_amount = EXCLUDED.total_amount,
+                donation_count = EXCLUDED.donation_count,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (charity_donation_totals.total_amount, charity_donation_totals.donation_count)
+                IS DISTINCT FROM (EXCLUDED.total_amount, EXCLUDED.donation_count)
+            """
+        )
+        return {"crises": crises_fixed, "charities": cursor.rowcount}
+
+
+def ensure_donation_partitions(months_ahead: int) -> int:
+    """
+    Create any missing monthly donations partitions from the current month
+    through `months_ahead` months ahead. Returns the number created.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT ensure_donation_partitions(
+                CURRENT_DATE, (CURRENT_DATE + make_interval(months => %s))::date
+            ) as created
+            """,
+            (months_ahead,),
+        )
+        return cursor.fetchone()["created"]
+
+
+def archive_donation_partitions(cutoff: date) -> List[str]:
+    """
+    Move donations partitions ending on or before `cutoff` to archive.donations.
+
+    Archived rows stay visible through the donations_all view. Returns the
+    names of the archived partitions.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT archive_donation_partitions(%s) as name", (cutoff,))
+        return [row["name"] for row in cursor.fetchall()]
+
+
+def upsert_payment_status(
+    payment_intent_id: str,
+    status: str,
+    amount: int,
+    currency: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    observed_at: Optional[int] = None,
+    cursor=None,
+) -> None:
+    """
+    Store the latest known status of a payment intent.
+
+    observed_at is the Unix time the status was observed (the Stripe event's
+    `created` time); it defaults to now. Older observations never overwrite
+    newer ones, and a final status wins ties within the same second, so
+    out-of-order webhook deliveries are harmless.
+    """
+    with use_cursor(cursor) as cursor:
+        query = """
+            INSERT INTO payment_intent_statuses (
+                payment_intent_id, status, amount, currency, metadata, observed_at
+            ) VALUES (
+                %s, %s, %s, %s, %s,
+                COALESCE(to_timestamp(%s)::timestamp, CURRENT_TIMESTAMP)
+            )
+            ON CONFLICT (payment_intent_id) DO UPDATE SET
+                status = EXCLUDED.status,
+                amount = EXCLUDED.amount,
+                currency = EXCLUDED.currency,
+                metadata = EXCLUDED.metadata,
+                observed_at = EXCLUDED.observed_at,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE payment_intent_statuses.observed_at < EXCLUDED.observed_at
+                OR (
+                    payment_intent_statuses.observed_at = EXCLUDED.observed_at
+                    AND payment_intent_statuses.status NOT IN ('succeeded', 'canceled')
+                )
         """
         params = (
-            crisis_id, amount, currency, stripe_payment_intent_id, status, user_id, charity_id
+            payment_intent_id, status, amount, currency, Jsonb(metadata or {}), observed_at
         )
         cursor.execute(query, params)
-        new_donation = cursor.fetchone()
-        return new_donation
 
 
-def fetch_user_donations(user_id: int) -> List[Dict[str, Any]]:
-    """Fetch all donations made by a user with crisis and charity details."""
+def fetch_payment_status(payment_intent_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch the locally stored status of a payment intent, with its age in seconds."""
+    with get_db_cursor() as cursor:
+        query = """
+            SELECT
+                payment_intent_id as id,
+                amount,
+                currency,
+                status,
+                metadata,
+                EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - updated_at))::float as age_seconds
+            FROM payment_intent_statuses
+            WHERE payment_intent_id = %s
+        """
+        cursor.execute(query, (payment_intent_id,))
+        return cursor.fetchone()
+
+
+def fetch_idempotent_response(
+    user_id: int,
+    idempotency_key: str,
+    ttl_seconds: float,
+) -> Optional[Dict[str, Any]]:
+    """Fetch a stored create-intent response for an unexpired idempotency key."""
+    with get_db_cursor() as cursor:
+        query = """
+            SELECT request_hash, response
+            FROM payment_idempotency_keys
+            WHERE user_id = %s AND idempotency_key = %s
+                AND created_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+        """
+        cursor.execute(query, (user_id, idempotency_key, ttl_seconds))
+        return cursor.fetchone()
+
+
+def store_idempotent_response(
+    user_id: int,
+    idempotency_key: str,
+    request_hash: str,
+    response: Dict[str, Any],
+    ttl_seconds: float,
+) -> None:
+    """Store a create-intent response under its idempotency key and purge expired keys."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM payment_idempotency_keys
+            WHERE created_at <= CURRENT_TIMESTAMP - make_interval(secs => %s)
+            """,
+            (ttl_seconds,),
+        )
+        query = """
+            INSERT INTO payment_idempotency_keys (user_id, idempotency_key, request_hash, response)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (user_id, idempotency_key) DO UPDATE SET
+                request_hash = EXCLUDED.request_hash,
+                response = EXCLUDED.response,
+                created_at = CURRENT_TIMESTAMP
+        """
+        cursor.execute(query, (user_id, idempotency_key, request_hash, Jsonb(response)))
+
+
+def insert_webhook_event(event_id: str, event_type: str, payload: Dict[str, Any]) -> bool:
+    """
+    Store a verified webhook event in the inbox for asynchronous processing.
+
+    Returns False if the event was already received (Stripe redelivery).
+    """
     with get_db_cursor() as cursor:
         query = """
-            SELECT 
-                d.id,
-                d.amount,
-                d.currency,
-                d.created_at,
-                c.title as crisis_title,
-                c.country as crisis_country,
-                ch.name as charity_name
-            FROM donations d
-            JOIN crises c ON d.crisis_id = c.id
-            LEFT JOIN charities ch ON d.charity_id = ch.id
-            WHERE d.user_id = %s AND d.status = 'succeeded'
-            ORDER BY d.created_at DESC
+            INSERT INTO webhook_inbox (event_id, event_type, payload)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (event_id) DO NOTHING
+        """
+        cursor.execute(query, (event_id, event_type, Jsonb(payload)))
+        return cursor.rowcount == 1
+
+
+def claim_webhook_events(cursor, limit: int) -> List[Dict[str, Any]]:
+    """
+    Lock a batch of due inbox events for processing.
+
+    Rows stay locked until the caller's transaction ends; SKIP LOCKED lets
+    concurrent workers claim disjoint batches.
+    """
+    query = """
+        SELECT event_id, event_type, payload, attempts
+        FROM webhook_inbox
+        WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+        ORDER BY received_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """
+    cursor.execute(query, (limit,))
+    return cursor.fetchall()
+
+
+def mark_webhook_event_processed(cursor, event_id: str) -> None:
+    """Mark an inbox event as successfully processed."""
+    cursor.execute(
+        """
+        UPDATE webhook_inbox
+        SET status = 'processed', attempts = attempts + 1,
+            processed_at = CURRENT_TIMESTAMP, last_error = NULL
+        WHERE event_id = %s
+        """,
+        (event_id,),
+    )
+
+
+def mark_webhook_event_failed(
+    cursor,
+    event_id: str,
+    error: str,
+    retry_in_seconds: Optional[float],
+) -> None:
+    """
+    Record a failed processing attempt.
+
+    The event is retried after retry_in_seconds, or moved to the dead-letter
+    state when retry_in_seconds is None.
+    """
+    cursor.execute(
         """
-        cursor.execute(query, (user_id,))
+        UPDATE webhook_inbox
+        SET attempts = attempts + 1,
+            last_error = %s,
+            status = CASE WHEN %s::float IS NULL THEN 'dead' ELSE 'pending' END,
+            next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => COALESCE(%s::float, 0))
+        WHERE event_id = %s
+        """,
+        (error, retry_in_seconds, retry_in_seconds, event_id),
+    )
+
+
+WEBHOOK_INBOX_STATS_QUERY = """
+    SELECT
+        COUNT(*) FILTER (WHERE status = 'pending')::integer as pending,
+        COUNT(*) FILTER (WHERE status = 'dead')::integer as dead,
+        COALESCE(EXTRACT(EPOCH FROM (
+            CURRENT_TIMESTAMP - MIN(received_at) FILTER (WHERE status = 'pending')
+        )), 0)::float as oldest_pending_age_seconds
+    FROM webhook_inbox
+    WHERE status IN ('pending', 'dead')
+"""
+
+
+def fetch_webhook_inbox_stats() -> Dict[str, Any]:
+    """Fetch backlog size and lag of the webhook inbox."""
+    with get_db_cursor() as cursor:
+        cursor.execute(WEBHOOK_INBOX_STATS_QUERY)
+        return cursor.fetchone()
+
+
+def probe_database(timeout: float) -> Dict[str, Any]:
+    """
+    Readiness probe: borrow a pooled connection and fetch the webhook inbox backlog.
+
+    Waiting for the connection and running the query are each limited to
+    `timeout` seconds, so a hung database fails the probe instead of hanging it.
+    """
+    with pool.connection(timeout=timeout) as conn:
+        with conn.cursor(row_factory=dict_row) as cursor:
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(timeout * 1000)),))
+            cursor.execute(WEBHOOK_INBOX_STATS_QUERY)
+            return cursor.fetchone()
+
+
+USER_DONATIONS_QUERY = """
+    SELECT 
+        d.id,
+        d.amount,
+        d.currency,
+        d.created_at,
+        c.title as crisis_title,
+        c.country as crisis_country,
+        ch.name as charity_name
+    FROM donations_all d
+    JOIN crises c ON d.crisis_id = c.id
+    LEFT JOIN charities ch ON d.charity_id = ch.id
+    WHERE d.user_id = %s AND d.status = 'succeeded'
+"""
+
+USER_DONATION_SUMMARY_QUERY = """
+    SELECT 
+        total_amount::integer as total_amount,
+        currency,
+        crisis_count,
+        charity_count
+    FROM user_donation_stats
+    WHERE user_id = %s
+"""
+
+EMPTY_DONATION_SUMMARY = {
+    'total_amount': 0,
+    'currency': 'USD',
+    'crisis_count': 0,
+    'charity_count': 0
+}
+
+
+def build_user_donations_query(
+    user_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[str, List[Any]]:
+    """Build the keyset-paginated user donations query and its parameters."""
+    query = USER_DONATIONS_QUERY
+    params: List[Any] = [user_id]
+    
+    if before:
+        query += " AND (d.created_at, d.id) < (%s, %s)"
+        params.extend(before)
+    
+    query += " ORDER BY d.created_at DESC, d.id DESC"
+    
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    
+    return query, params
+
+
+def fetch_user_donations(
+    user_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch donations made by a user with crisis and charity details, newest first.
+
+    Pages with a keyset on (created_at, id): pass the last row's
+    (created_at, id) as `before` to get the next page. Reads live and
+    archived donations, the same scope as the summary, and is served by each
+    partition's copy of the partial index idx_donations_user_succeeded.
+    """
+    with get_db_cursor() as cursor:
+        query, params = build_user_donations_query(user_id, limit, before)
+        cursor.execute(query, params)
         return cursor.fetchall()
 
 
 def fetch_user_donation_summary(user_id: int) -> Dict[str, Any]:
     """Fetch summary statistics for a user's donations."""
     with get_db_cursor() as cursor:
-        query = """
-            SELECT 
-                COALESCE(SUM(d.amount), 0)::integer as total_amount,
-                COALESCE(MAX(d.currency), 'USD') as currency,
-                COUNT(DISTINCT d.crisis_id)::integer as crisis_count,
-                COUNT(DISTINCT CASE WHEN d.charity_id IS NOT NULL THEN d.charity_id END)::integer as charity_count
-            FROM donations d
-            WHERE d.user_id = %s AND d.status = 'succeeded'
-        """
-        cursor.execute(query, (user_id,))
+        cursor.execute(USER_DONATION_SUMMARY_QUERY, (user_id,))
         result = cursor.fetchone()
         
-        # If no result or all values are None/0, return default
-        if not result or result.get('total_amount') is None:
-            return {
-                'total_amount': 0,
-                'currency': 'USD',
-                'crisis_count': 0,
-                'charity_count': 0
-            }
-        
-        return result
+        # Users without succeeded donations have no stats row yet
+        return result or dict(EMPTY_DONATION_SUMMARY)
+
+
+def fetch_user_dashboard(user_id: int, limit: int) -> Dict[str, Any]:
+    """
+    Fetch a user's profile, first page of donations and donation summary.
+
+    The three queries are sent in pipeline mode, so the whole dashboard
+    costs one connection and a single network round trip.
+    """
+    with get_db_connection() as conn:
+        user_cursor = conn.cursor(row_factory=dict_row)
+        donations_cursor = conn.cursor(row_factory=dict_row)
+        summary_cursor = conn.cursor(row_factory=dict_row)
+        with conn.pipeline():
+            user_cursor.execute(USER_BY_ID_QUERY, (user_id,))
+            donations_cursor.execute(*build_user_donations_query(user_id, limit))
+            summary_cursor.execute(USER_DONATION_SUMMARY_QUERY, (user_id,))
+        conn.commit()
+        return {
+            "user": user_cursor.fetchone(),
+            "donations": donations_cursor.fetchall(),
+            "summary": summary_cursor.fetchone() or dict(EMPTY_DONATION_SUMMARY),
+        }
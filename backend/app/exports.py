@@ -0,0 +1,177 @@
+"""
+Streaming donation exports.
+
+Rows are streamed from the database in fixed-size chunks so worker memory
+stays flat regardless of export size: CSV uses COPY ... TO STDOUT and NDJSON
+a named (server-side) cursor. The generators are sync and are consumed by
+StreamingResponse one chunk at a time, so a slow client holds back the
+database reads instead of letting them pile up in memory. Each export runs
+on its own connection outside the pool, so slow downloads cannot starve
+request handlers of connections.
+
+stream_donations_export opens the connection and reads the first chunk
+before it returns, so a caller can still turn setup errors into an error
+status. Once the 200 has been sent, an error ends the body with a marker
+line instead: `# error: ...` for CSV, `{"error": ...}` for NDJSON.
+"""
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg
+from psycopg.rows import dict_row
+
+from .config import settings
+from .database import get_export_connection
+
+logger = logging.getLogger(__name__)
+# Rows fetched per round trip by the NDJSON server-side cursor
+EXPORT_FETCH_SIZE = settings.export_fetch_size
+
+# Bytes buffered before a chunk is handed to the response
+EXPORT_CHUNK_BYTES = settings.export_chunk_bytes
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+USER_EXPORT_COLUMNS = """
+    d.id, d.created_at, d.amount, d.currency,
+    d.crisis_id, c.title as crisis_title, c.country as crisis_country,
+    d.charity_id, ch.name as charity_name
+"""
+
+ADMIN_EXPORT_COLUMNS = """
+    d.id, d.created_at, d.user_id, d.amount, d.currency, d.status,
+    d.stripe_payment_intent_id,
+    d.crisis_id, c.title as crisis_title, c.country as crisis_country,
+    d.charity_id, ch.name as charity_name
+"""
+
+
+def build_export_query(
+    columns: str,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> Tuple[str, List[Any]]:
+    """
+    Build the export query over live and archived donations, oldest first.
+
+    `until` is exclusive; date bounds prune partitions on both sides of donations_all.
+    """
+    conditions = []
+    params: List[Any] = []
+    if user_id is not None:
+        conditions.append("d.user_id = %s")
+        params.append(user_id)
+    if status is not None:
+        conditions.append("d.status = %s")
+        params.append(status)
+    if since is not None:
+        conditions.append("d.created_at >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("d.created_at < %s")
+        params.append(until)
+
+    query = f"""
+        SELECT {columns}
+        FROM donations_all d
+        JOIN crises c ON d.crisis_id = c.id
+        LEFT JOIN charities ch ON d.charity_id = ch.id
+    """
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY d.created_at, d.id"
+    return query, params
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def stream_csv(query: str, params: List[Any]) -> Iterator[bytes]:
+    """Stream the query's rows as CSV with a header, via COPY ... TO STDOUT."""
+    copy_sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    with get_export_connection() as conn:
+        with conn.cursor() as cursor:
+            # COPY takes no server-side parameters; psycopg binds these client-side
+            with cursor.copy(copy_sql, params) as copy:
+                buffer = bytearray()
+                for data in copy:
+                    buffer += data
+                    if len(buffer) >= EXPORT_CHUNK_BYTES:
+                        yield bytes(buffer)
+                        buffer.clear()
+                if buffer:
+                    yield bytes(buffer)
+
+
+def stream_ndjson(query: str, params: List[Any]) -> Iterator[bytes]:
+    """Stream the query's rows as newline-delimited JSON, via a server-side cursor."""
+    with get_export_connection() as conn:
+        with conn.cursor(name="donations_export", row_factory=dict_row) as cursor:
+            cursor.itersize = EXPORT_FETCH_SIZE
+            cursor.execute(query, params)
+            buffer: List[str] = []
+            size = 0
+            for row in cursor:
+                line = json.dumps(row, default=_json_default) + "\n"
+                buffer.append(line)
+                size += len(line)
+                if size >= EXPORT_CHUNK_BYTES:
+                    yield "".join(buffer).encode("utf-8")
+                    buffer.clear()
+                    size = 0
+            if buffer:
+                yield "".join(buffer).encode("utf-8")
+
+
+def _error_marker(export_format: str, message: str) -> bytes:
+    if export_format == "csv":
+        return f"# error: {message}\n".encode("utf-8")
+    return (json.dumps({"error": message}) + "\n").encode("utf-8")
+
+
+def _finish_export(export_format: str, first: bytes, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    try:
+        if first:
+            yield first
+        yield from chunks
+    except psycopg.Error as e:
+        logger.exception("Export failed mid-stream", extra={"format": export_format})
+        yield _error_marker(export_format, f"Export failed: {e}")
+
+
+def stream_donations_export(export_format: str, query: str, params: List[Any]) -> Iterator[bytes]:
+    """
+    Stream an export query in the given format ("csv" or "ndjson").
+
+    Blocks until the first chunk is read, raising PoolTimeout or a database
+    error if the export cannot start. Call it off the event loop.
+    """
+    if export_format == "csv":
+        chunks = stream_csv(query, params)
+    else:
+        chunks = stream_ndjson(query, params)
+    # Started generators are closed when dropped, so the connection is released
+    # even if the response body is never read
+    first = next(chunks, b"")
+    return _finish_export(export_format, first, chunks)
+
+
+def export_filename(prefix: str, export_format: str, since: Optional[date], until: Optional[date]) -> str:
+    """Build a download filename such as donations_2025-01-01_2025-02-01.csv."""
+    parts = [prefix] + [d.isoformat() for d in (since, until) if d is not None]
+    return f"{'_'.join(parts)}.{export_format}"
+
+
+def export_headers(filename: str) -> Dict[str, str]:
+    """Response headers for a streamed export download."""
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
@@ -0,0 +1,104 @@
+"""
+Liveness and readiness probes.
+
+/health/live only shows the event loop is answering. It never touches the
+database, so an outage does not get healthy workers restarted.
+
+/health/ready is what the load balancer should route on. It checks:
+- warm-up has finished
+- a pooled connection can be borrowed and queried within
+  HEALTH_PROBE_TIMEOUT_SECONDS
+- the pool is not saturated past HEALTH_MAX_POOL_SATURATION
+
+A failure means this worker should get no traffic for now. Webhook inbox lag
+over HEALTH_INBOX_MAX_LAG_SECONDS is reported as "degraded" but keeps the
+worker in rotation: the inbox is shared, so failing on it would pull every
+worker at once.
+
+The database probe result, failure included, is cached for
+HEALTH_CACHE_SECONDS. Concurrent probes share one check, so a probe storm
+costs at most one query per worker per interval. Pool saturation is read
+from memory on every probe.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+from .database import get_connection_stats, probe_database
+from .warmup import warmup_complete
+
+HEALTH_CACHE_SECONDS = settings.health_cache_seconds
+HEALTH_PROBE_TIMEOUT_SECONDS = settings.health_probe_timeout_seconds
+# Oldest pending webhook older than this reports "degraded"; 0 disables the check
+HEALTH_INBOX_MAX_LAG_SECONDS = settings.health_inbox_max_lag_seconds
+# (in-use connections + waiters) / pool max size above this fails readiness
+HEALTH_MAX_POOL_SATURATION = settings.health_max_pool_saturation
+
+_probe_lock = asyncio.Lock()
+# (monotonic time checked, result) of the last database probe
+_last_probe: Optional[Tuple[float, Dict[str, Any]]] = None
+
+
+def _run_database_probe() -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        inbox = probe_database(HEALTH_PROBE_TIMEOUT_SECONDS)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "latency_ms": (time.perf_counter() - started) * 1000}
+    return {"ok": True, "inbox": inbox, "latency_ms": (time.perf_counter() - started) * 1000}
+
+
+async def database_probe() -> Dict[str, Any]:
+    """The cached database probe result, refreshed at most every HEALTH_CACHE_SECONDS."""
+    global _last_probe
+    async with _probe_lock:
+        if _last_probe is None or time.monotonic() - _last_probe[0] >= HEALTH_CACHE_SECONDS:
+            result = await asyncio.to_thread(_run_database_probe)
+            _last_probe = (time.monotonic(), result)
+        checked_at, result = _last_probe
+    return {**result, "age_seconds": round(time.monotonic() - checked_at, 3)}
+
+
+def pool_check() -> Dict[str, Any]:
+    stats = get_connection_stats()
+    return {
+        "ok": stats["saturation"] <= HEALTH_MAX_POOL_SATURATION,
+        "saturation": round(stats["saturation"], 3),
+        "max_saturation": HEALTH_MAX_POOL_SATURATION,
+        "in_use": stats["in_use"],
+        "idle": stats["idle"],
+        "waiting": stats["waiting"],
+        "max_size": stats["max_size"],
+    }
+
+
+async def readiness() -> Dict[str, Any]:
+    """Status ("ready", "degraded" or "not_ready") and the result of each check."""
+    checks: Dict[str, Dict[str, Any]] = {
+        "warmup": {"ok": warmup_complete()},
+        "pool": pool_check(),
+    }
+    # A saturated pool would only queue the probe behind the requests it is waiting for
+    if checks["pool"]["ok"]:
+        database = await database_probe()
+    else:
+        database = {"ok": False, "error": "skipped: connection pool saturated"}
+    inbox = database.pop("inbox", None)
+    checks["database"] = database
+    if inbox is not None:
+        lag = inbox["oldest_pending_age_seconds"]
+        checks["inbox"] = {
+            "ok": not HEALTH_INBOX_MAX_LAG_SECONDS or lag <= HEALTH_INBOX_MAX_LAG_SECONDS,
+            "pending": inbox["pending"],
+            "lag_seconds": round(lag, 3),
+            "max_lag_seconds": HEALTH_INBOX_MAX_LAG_SECONDS,
+        }
+
+    if not all(checks[name]["ok"] for name in ("warmup", "pool", "database")):
+        status = "not_ready"
+    elif not checks.get("inbox", {"ok": True})["ok"]:
+        status = "degraded"
+    else:
+        status = "ready"
+    return {"status": status, "checks": checks}
@@ -0,0 +1,219 @@
+"""
+Structured, non-blocking logging.
+
+Modules log through `logging.getLogger(__name__)` with a constant message and
+the variable parts in `extra`, e.g.
+
+    logger.info("Donation recorded", extra={"donation_id": 42, "status": "succeeded"})
+
+setup_logging() puts a QueueHandler on the "app" logger. The calling thread
+only merges arguments, renders any traceback and stamps the request id and
+trace id. A QueueListener thread formats records as JSON lines (or text with
+LOG_FORMAT=text) and writes them to stdout, so request latency never includes
+a stdout write. When the queue is full, records are dropped and counted
+rather than blocking. Errors are rate limited per logger and message: after
+LOG_ERROR_BURST records in LOG_ERROR_WINDOW_SECONDS the rest are suppressed,
+and the next one logged carries a `suppressed` count.
+"""
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+from .tracing import current_span
+
+LOG_LEVEL = settings.log_level.upper()
+LOG_FORMAT = settings.log_format
+LOG_QUEUE_SIZE = settings.log_queue_size
+LOG_ERROR_BURST = settings.log_error_burst
+LOG_ERROR_WINDOW_SECONDS = settings.log_error_window_seconds
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Caller-supplied request ids are echoed back only if they look like ids
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_log_stats = {"dropped": 0, "suppressed": 0}
+_listener: Optional[QueueListener] = None
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def get_request_id() -> Optional[str]:
+    """Correlation id of the request being handled, if any."""
+    return _request_id.get()
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the current request id and trace id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        span = current_span()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """Lets through at most `burst` ERROR records per logger and message in each window."""
+
+    def __init__(self, burst: int = LOG_ERROR_BURST, window: float = LOG_ERROR_WINDOW_SECONDS):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        # (logger, message template) -> [window start, records let through, records suppressed]
+        self._windows: Dict[Tuple[str, str], List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.ERROR:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = int(state[2])
+                self._windows[key] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        _log_stats["suppressed"] += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking."""
+
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what must happen on the calling thread; formatting is left to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _log_stats["dropped"] += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, ids and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging() -> None:
+    """Route the "app" loggers through the queue to a background writer. Safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s"
+        ))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(ErrorRateLimitFilter())
+    queue_handler.addFilter(ContextFilter())
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.handlers = [queue_handler]
+    app_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_log_stats() -> Dict[str, int]:
+    """Records dropped on a full queue and errors suppressed by rate limiting."""
+    return dict(_log_stats)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving each request a correlation id.
+
+    Uses the caller's X-Request-ID if it looks like an id, otherwise generates
+    one. The id is available to log records for the whole request and is
+    returned in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if REQUEST_ID_RE.match(candidate):
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_id.reset(token)
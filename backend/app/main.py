@@ -3,10 +3,17 @@ Global Problems Map - FastAPI Backend
 Main application entry point.
 """
 
-from typing import Optional, List
+import asyncio
+import base64
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Optional, List, Tuple
 
-from fastapi import FastAPI, HTTPException, Query, Depends, Response, Request
+from fastapi import FastAPI, HTTPException, Query, Depends, Response, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 from .models import (
     CrisisResponse,
@@ -14,8 +21,13 @@ from .models import (
     CharityResponse,
     CharityListResponse,
     HealthResponse,
+    ReadinessResponse,
     CategoryType,
     SeverityType,
+    CrisisSortType,
+    RollupBucketType,
+    ExportFormatType,
+    DonationTimeseriesResponse,
     UserRegister,
     UserLogin,
     Token,
@@ -24,21 +36,28 @@ from .models import (
     PaymentIntentResponse,
     UserDonationResponse,
     UserDonationSummary,
+    UserDashboardResponse,
 )
 from .database import (
-    fetch_crises,
-    fetch_crisis_by_id,
-    fetch_charities,
-    fetch_charities_by_crisis,
-    create_donation_record,
+    fetch_crisis_donation_timeseries,
     fetch_user_donations,
     fetch_user_donation_summary,
+    fetch_user_dashboard,
+    upsert_payment_status,
+    fetch_payment_status,
+    fetch_idempotent_response,
+    store_idempotent_response,
+    USER_BY_EMAIL_QUERY,
+    USER_BY_ID_QUERY,
+    close_pool,
 )
+from .pool import PoolTimeout
 from .auth import (
     hash_password,
     verify_password,
     create_access_token,
     get_current_user,
+    get_current_admin,
     set_auth_cookie,
     clear_auth_cookie,
     generate_csrf_token,
@@ -50,13 +69,83 @@ from .payments import (
     create_donation_payment,
     retrieve_payment_intent,
     verify_webhook_signature,
+    close_stripe_client,
+    is_payment_status_fresh,
+    payment_request_hash,
+    idempotency_cache,
+    IDEMPOTENCY_KEY_TTL_SECONDS,
 )
+from .aggregates import (
+    start_reconciliation_job,
+    stop_reconciliation_job,
+)
+from .exports import (
+    build_export_query,
+    stream_donations_export,
+    export_filename,
+    export_headers,
+    EXPORT_MEDIA_TYPES,
+    USER_EXPORT_COLUMNS,
+    ADMIN_EXPORT_COLUMNS,
+)
+from .health import readiness
+from .logs import RequestIdMiddleware, setup_logging, shutdown_logging
+from .metrics import MetricsMiddleware, render_metrics, route_template, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .profiler import (
+    PROFILING_ENABLED,
+    PROFILE_MAX_SECONDS,
+    PROFILE_INTERVAL_MS,
+    ProfilerBusy,
+    RequestProfilerMiddleware,
+    profile_worker,
+    request_profiles,
+)
+from .partitions import start_partition_maintenance, stop_partition_maintenance
+from .public_cache import (
+    STALE_HEADER,
+    cached_charities,
+    cached_crises,
+    cached_crisis,
+    stale_headers,
+)
+from .query_stats import get_query_stats, reset_query_stats
+from .tracing import TracingMiddleware, shutdown_tracing
+from .warmup import warm_up
+from .webhooks import (
+    enqueue_webhook_event,
+    start_inbox_workers,
+    stop_inbox_workers,
+    get_inbox_metrics,
+)
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks."""
+    # Before anything else touches the database; the worker takes traffic once this returns
+    await warm_up()
+    await start_partition_maintenance()
+    start_inbox_workers()
+    start_reconciliation_job()
+    yield
+    await stop_reconciliation_job()
+    await stop_partition_maintenance()
+    await stop_inbox_workers()
+    await close_stripe_client()
+    close_pool()
+    shutdown_tracing()
+    shutdown_logging()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Global Problems Map API",
     description="API for tracking global crises and connecting donors with relief organizations.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS for same-origin setup (frontend on port 8080 proxies to backend)
@@ -68,8 +157,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Request-ID", "X-Profile-Id", STALE_HEADER, "Age"],
 )
 
+# Server span per sampled request; DB, bcrypt and Stripe spans nest under it
+app.add_middleware(TracingMiddleware, route_resolver=route_template)
+
+# Profiles requests carrying X-Profile-Token, when profiling is enabled
+app.add_middleware(RequestProfilerMiddleware)
+
+# Correlation id for every log record written while handling a request
+app.add_middleware(RequestIdMiddleware)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
 async def health_check():
@@ -80,11 +182,51 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/live", response_model=HealthResponse, tags=["Health"])
+async def liveness_check():
+    """
+    Liveness probe: the worker is up and its event loop is answering.
+    Does not touch the database, so an outage never restarts healthy workers.
+    """
+    return {"status": "ok"}
+
+
+@app.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "Not ready for traffic"}},
+    tags=["Health"],
+)
+async def readiness_check():
+    """
+    Readiness probe: warm-up finished, the database answers through the pool
+    and the pool is not saturated. Returns 503 when this worker should get
+    no traffic. Webhook inbox lag only marks the worker `degraded`.
+    Database results are cached for a couple of seconds.
+    """
+    result = await readiness()
+    return JSONResponse(result, status_code=503 if result["status"] == "not_ready" else 200)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics: per-route request counts and latency, in-flight
+    requests, database connections, bcrypt calls, Stripe concurrency and caches.
+    """
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+# Endpoints that use the database (or bcrypt) are plain `def`, so FastAPI runs
+# them in its threadpool; async endpoints hand that work to asyncio.to_thread.
+# Either way, waiting for a pooled connection never blocks the event loop.
 @app.get("/crises/", response_model=CrisisListResponse, tags=["Crises"])
-async def get_crises(
+def get_crises(
+    response: Response,
     q: Optional[str] = Query(None, description="Search text in title, summary, description, country"),
     category: Optional[CategoryType] = Query(None, description="Filter by crisis category"),
     severity: Optional[SeverityType] = Query(None, description="Filter by severity level"),
+    sort: CrisisSortType = Query("severity", description="Order by severity or by funding raised"),
 ):
     """
     Get list of active crises with optional filtering.
@@ -92,9 +234,14 @@ async def get_crises(
     - **q**: Search across title, summary, description, and country fields
     - **category**: Filter by category (Conflict, Disaster, Health, Humanitarian, Climate)
     - **severity**: Filter by severity level (Low, Medium, High, Critical)
+    - **sort**: `severity` (default) or `funding` to rank by total raised
+    
+    Served from cache; stale results carry an `X-Served-Stale` header.
     """
     try:
-        crises = fetch_crises(search=q, category=category, severity=severity)
+        read = cached_crises(search=q, category=category, severity=severity, sort=sort)
+        response.headers.update(stale_headers(read))
+        crises = read.value
         return {
             "crises": [CrisisResponse(**crisis) for crisis in crises],
             "total": len(crises),
@@ -104,48 +251,73 @@ async def get_crises(
 
 
 @app.get("/crises/{crisis_id}", response_model=CrisisResponse, tags=["Crises"])
-async def get_crisis(crisis_id: int):
+def get_crisis(crisis_id: int, response: Response):
     """
     Get detailed information about a specific crisis.
     """
-    crisis = fetch_crisis_by_id(crisis_id)
+    read = cached_crisis(crisis_id)
+    response.headers.update(stale_headers(read))
+    crisis = read.value
     if not crisis:
         raise HTTPException(status_code=404, detail="Crisis not found")
     return CrisisResponse(**crisis)
 
 
+@app.get("/crises/{crisis_id}/donations/timeseries", response_model=DonationTimeseriesResponse, tags=["Crises"])
+def get_crisis_donation_timeseries(
+    crisis_id: int,
+    bucket: RollupBucketType = Query("day", description="Bucket size: hour or day"),
+    days: int = Query(90, ge=1, le=365, description="How many days back to include"),
+):
+    """
+    Get donation totals for a crisis per hour or per day.
+    Reads only the precomputed rollups; buckets without donations are omitted.
+    """
+    try:
+        points = fetch_crisis_donation_timeseries(crisis_id=crisis_id, bucket=bucket, days=days)
+        return {"crisis_id": crisis_id, "bucket": bucket, "points": points}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 @app.get("/charities/", response_model=CharityListResponse, tags=["Charities"])
-async def get_charities(
+def get_charities(
+    response: Response,
     crisis_id: Optional[int] = Query(None, description="Filter charities by crisis ID"),
 ):
     """
     Get list of charities, optionally filtered by crisis.
     """
     try:
-        charities = fetch_charities(crisis_id=crisis_id)
+        read = cached_charities(crisis_id)
+        response.headers.update(stale_headers(read))
+        charities = read.value
         return {"charities": [CharityResponse(**charity) for charity in charities]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/charities/by-crisis/{crisis_id}", response_model=CharityListResponse, tags=["Charities"])
-async def get_charities_by_crisis(crisis_id: int):
+def get_charities_by_crisis(crisis_id: int, response: Response):
     """
     Get all charities associated with a specific crisis.
     """
     # Verify crisis exists
-    crisis = fetch_crisis_by_id(crisis_id)
-    if not crisis:
+    crisis_read = cached_crisis(crisis_id)
+    if not crisis_read.value:
         raise HTTPException(status_code=404, detail="Crisis not found")
     
-    charities = fetch_charities_by_crisis(crisis_id)
+    charities_read = cached_charities(crisis_id)
+    for read in (crisis_read, charities_read):
+        response.headers.update(stale_headers(read))
+    charities = charities_read.value
     return {"charities": [CharityResponse(**charity) for charity in charities]}
 
 
 # ============ Authentication Routes ============
 
 @app.post("/auth/register", tags=["Authentication"])
-async def register(user: UserRegister, response: Response):
+def register(user: UserRegister, response: Response):
     """
     Register a new user with email and password.
     Sets an httpOnly cookie with JWT token upon successful registration.
@@ -153,6 +325,9 @@ async def register(user: UserRegister, response: Response):
     from .database import get_db_connection
     
     try:
+        # Hash before taking a pooled connection, so none is held while bcrypt runs
+        hashed_password = hash_password(user.password)
+        
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
@@ -163,8 +338,7 @@ async def register(user: UserRegister, response: Response):
             if existing_user:
                 raise HTTPException(status_code=400, detail="Email already registered")
             
-            # Hash password and create user
-            hashed_password = hash_password(user.password)
+            # Create user
             cursor.execute(
                 "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id",
                 (user.email, hashed_password)
@@ -195,7 +369,7 @@ async def register(user: UserRegister, response: Response):
 
 
 @app.post("/auth/login", tags=["Authentication"])
-async def login(user: UserLogin, response: Response):
+def login(user: UserLogin, response: Response):
     """
     Login with email and password.
     Sets an httpOnly cookie with JWT token upon successful authentication.
@@ -207,10 +381,7 @@ async def login(user: UserLogin, response: Response):
             cursor = conn.cursor()
             
             # Fetch user by email
-            cursor.execute(
-                "SELECT id, email, password_hash FROM users WHERE email = %s",
-                (user.email,)
-            )
+            cursor.execute(USER_BY_EMAIL_QUERY, (user.email,))
             db_user = cursor.fetchone()
             cursor.close()
         
@@ -250,7 +421,7 @@ async def login(user: UserLogin, response: Response):
 
 
 @app.get("/auth/me", response_model=UserResponse, tags=["Authentication"])
-async def get_current_user_info(request: Request, current_user: dict = Depends(get_current_user)):
+def get_current_user_info(request: Request, current_user: dict = Depends(get_current_user)):
     """
     Get current authenticated user's information.
     Requires a valid JWT token in httpOnly cookie.
@@ -261,10 +432,7 @@ async def get_current_user_info(request: Request, current_user: dict = Depends(g
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute(
-                "SELECT id, email, created_at FROM users WHERE id = %s",
-                (current_user["user_id"],)
-            )
+            cursor.execute(USER_BY_ID_QUERY, (current_user["user_id"],))
             db_user = cursor.fetchone()
             cursor.close()
         
@@ -334,11 +502,40 @@ async def refresh_token(response: Response, request: Request, current_user: dict
 # Payment Routes
 # ============================================
 
+def lookup_idempotent_response(user_id: int, idempotency_key: str) -> Optional[dict]:
+    """Find a stored create-intent response, checking this worker's cache before the database."""
+    cache_key = (user_id, idempotency_key)
+    stored = idempotency_cache.get(cache_key)
+    if stored is None:
+        try:
+            stored = fetch_idempotent_response(user_id, idempotency_key, IDEMPOTENCY_KEY_TTL_SECONDS)
+        except Exception as db_error:
+            # Stripe still deduplicates on the forwarded key
+            logger.error("Database error reading idempotency key", extra={"error": str(db_error)})
+            return None
+        if stored:
+            idempotency_cache.set(cache_key, stored)
+    return stored
+
+
+def remember_idempotent_response(
+    user_id: int, idempotency_key: str, request_hash: str, response: dict
+) -> None:
+    """Store a create-intent response for repeats of the same Idempotency-Key."""
+    stored = {"request_hash": request_hash, "response": response}
+    idempotency_cache.set((user_id, idempotency_key), stored)
+    try:
+        store_idempotent_response(user_id, idempotency_key, request_hash, response, IDEMPOTENCY_KEY_TTL_SECONDS)
+    except Exception as db_error:
+        logger.error("Database error storing idempotency key", extra={"error": str(db_error)})
+
+
 @app.post("/payments/create-intent", response_model=PaymentIntentResponse, tags=["Payments"])
 async def create_payment_intent_endpoint(
     payment_data: CreatePaymentIntent,
     request: Request,
     current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
     Create a Stripe payment intent for donation.
@@ -348,19 +545,56 @@ async def create_payment_intent_endpoint(
     - **charity_id**: Optional specific charity to donate to
     - **donor_email**: Optional donor email for receipt
     - **donor_name**: Optional donor name
+    
+    Send an `Idempotency-Key` header to make retries safe: repeating a request
+    with the same key returns the original payment intent without calling Stripe.
     """
+    user_id = current_user["user_id"]
+    request_hash = payment_request_hash(payment_data.model_dump(mode="json"))
+    
+    if idempotency_key:
+        stored = await asyncio.to_thread(lookup_idempotent_response, user_id, idempotency_key)
+        if stored:
+            if stored["request_hash"] != request_hash:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            return PaymentIntentResponse(**stored["response"])
+    
     try:
         # Create payment intent
-        payment_intent = create_donation_payment(
+        payment_intent = await create_donation_payment(
             amount=payment_data.amount,
             crisis_id=payment_data.crisis_id,
             charity_id=payment_data.charity_id,
             donor_email=payment_data.donor_email,
             donor_name=payment_data.donor_name,
-            user_id=current_user["user_id"],
+            user_id=user_id,
+            idempotency_key=f"{user_id}:{idempotency_key}" if idempotency_key else None,
         )
         
-        return PaymentIntentResponse(**payment_intent)
+        # Seed the local status so checkout polling never needs to reach Stripe
+        try:
+            await asyncio.to_thread(
+                upsert_payment_status,
+                payment_intent_id=payment_intent["payment_intent_id"],
+                status=payment_intent["status"],
+                amount=payment_intent["amount"],
+                currency=payment_intent["currency"],
+                metadata=payment_intent.get("metadata"),
+                observed_at=payment_intent.get("created"),
+            )
+        except Exception as db_error:
+            logger.error("Database error recording payment status", extra={"error": str(db_error)})
+        
+        response = PaymentIntentResponse(**payment_intent)
+        if idempotency_key:
+            await asyncio.to_thread(
+                remember_idempotent_response,
+                user_id, idempotency_key, request_hash, response.model_dump(),
+            )
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment creation failed: {str(e)}")
@@ -370,19 +604,50 @@ async def create_payment_intent_endpoint(
 async def get_payment_status(payment_intent_id: str):
     """
     Get the status of a payment intent.
+    Served from the locally stored status kept up to date by the webhook;
+    Stripe is only asked when the record is unknown or stale.
     """
     try:
-        payment_intent = retrieve_payment_intent(payment_intent_id)
-        return payment_intent
+        record = await asyncio.to_thread(fetch_payment_status, payment_intent_id)
+    except Exception as db_error:
+        logger.error("Database error reading payment status", extra={"error": str(db_error)})
+        record = None
+    
+    if record and is_payment_status_fresh(record):
+        return {
+            "id": record["id"],
+            "amount": record["amount"],
+            "currency": record["currency"],
+            "status": record["status"],
+            "metadata": record["metadata"],
+        }
+    
+    try:
+        payment_intent = await retrieve_payment_intent(payment_intent_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Payment not found: {str(e)}")
+    
+    try:
+        await asyncio.to_thread(
+            upsert_payment_status,
+            payment_intent_id=payment_intent["id"],
+            status=payment_intent["status"],
+            amount=payment_intent["amount"],
+            currency=payment_intent["currency"],
+            metadata=payment_intent["metadata"],
+        )
+    except Exception as db_error:
+        logger.error("Database error recording payment status", extra={"error": str(db_error)})
+    
+    return payment_intent
 
 
 @app.post("/payments/webhook", tags=["Payments"])
 async def stripe_webhook(request: Request):
     """
     Webhook endpoint for Stripe events.
-    Handles payment confirmations and updates.
+    Verifies the signature and queues the event in the durable inbox;
+    payment confirmations and updates are applied by the inbox workers.
     """
     payload = await request.body()
     signature = request.headers.get("stripe-signature")
@@ -392,69 +657,86 @@ async def stripe_webhook(request: Request):
     
     try:
         event = verify_webhook_signature(payload, signature)
-        
-        # Handle different event types
-        if event["type"] == "payment_intent.succeeded":
-            payment_intent = event["data"]["object"]
-            
-            # Record successful donation in database
-            try:
-                metadata = payment_intent.get("metadata", {})
-                crisis_id = int(metadata.get("crisis_id"))
-                charity_id = int(metadata.get("charity_id")) if metadata.get("charity_id") else None
-                user_id = int(metadata.get("user_id")) if metadata.get("user_id") else None
-
-                donation = create_donation_record(
-                    crisis_id=crisis_id,
-                    amount=payment_intent["amount"],
-                    currency=payment_intent["currency"],
-                    stripe_payment_intent_id=payment_intent["id"],
-                    status=payment_intent["status"],
-                    user_id=user_id,
-                    charity_id=charity_id,
-                )
-                print(f"✅ Donation recorded: {donation['id']}")
-                
-            except Exception as db_error:
-                print(f"🚨 Database error recording donation: {db_error}")
-
-            print(f"✅ Payment succeeded: {payment_intent['id']}")
-            print(f"   Amount: ${payment_intent['amount'] / 100}")
-            print(f"   Crisis ID: {payment_intent['metadata'].get('crisis_id')}")
-            
-        elif event["type"] == "payment_intent.payment_failed":
-            payment_intent = event["data"]["object"]
-            print(f"❌ Payment failed: {payment_intent['id']}")
-            
-        return {"status": "success"}
-        
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Webhook error: {str(e)}")
+    
+    # Store the event and acknowledge immediately; inbox workers process it
+    try:
+        await asyncio.to_thread(
+            enqueue_webhook_event,
+            event_id=event["id"],
+            event_type=event["type"],
+            payload=json.loads(payload),
+        )
+    except Exception as e:
+        # Let Stripe redeliver rather than losing the event
+        raise HTTPException(status_code=500, detail=f"Webhook error: {str(e)}")
+    
+    return {"status": "success"}
+
+
+@app.get("/payments/webhook/metrics", tags=["Payments"])
+def get_webhook_inbox_metrics(current_admin: dict = Depends(get_current_admin)):
+    """
+    Get webhook inbox backlog and lag.
+    Reports pending and dead-lettered events, the age of the oldest pending event,
+    and this worker process's processing counters. Restricted to ADMIN_EMAILS.
+    """
+    try:
+        return get_inbox_metrics()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def encode_donation_cursor(donation: dict) -> str:
+    """Opaque pagination cursor pointing just past the given donation."""
+    raw = f"{donation['created_at'].isoformat()}|{donation['id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_donation_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_donation_cursor into (created_at, id)."""
+    try:
+        created_at, donation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(donation_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @app.get("/me/donations", response_model=List[UserDonationResponse], tags=["User"])
-async def get_user_donations(
+def get_user_donations(
     request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of donations to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
 ):
     """
-    Get a list of donations made by the current user with crisis and charity details.
-    Returns all successful donations ordered by date (newest first).
+    Get a page of donations made by the current user with crisis and charity details.
+    Returns successful donations ordered by date (newest first).
+    
+    When more donations exist, the `X-Next-Cursor` response header holds the
+    cursor for the next page.
     """
+    before = decode_donation_cursor(cursor) if cursor else None
     try:
-        print(f"📊 Fetching donations for user_id: {current_user['user_id']}")
-        donations = fetch_user_donations(user_id=current_user["user_id"])
-        print(f"📊 Found {len(donations)} donations")
-        return [UserDonationResponse(**donation) for donation in donations]
+        donations = fetch_user_donations(
+            user_id=current_user["user_id"],
+            limit=limit + 1,
+            before=before,
+        )
     except Exception as e:
-        print(f"🚨 Error fetching donations: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching donations", extra={"user_id": current_user["user_id"]})
         raise HTTPException(status_code=500, detail=f"Failed to fetch donations: {str(e)}")
+    
+    if len(donations) > limit:
+        donations = donations[:limit]
+        response.headers["X-Next-Cursor"] = encode_donation_cursor(donations[-1])
+    return [UserDonationResponse(**donation) for donation in donations]
 
 
 @app.get("/me/donations/summary", response_model=UserDonationSummary, tags=["User"])
-async def get_user_donations_summary(
+def get_user_donations_summary(
     request: Request,
     current_user: dict = Depends(get_current_user),
 ):
@@ -463,17 +745,176 @@ async def get_user_donations_summary(
     Returns total amount, currency, number of crises and charities supported.
     """
     try:
-        print(f"📊 Fetching donation summary for user_id: {current_user['user_id']}")
         summary = fetch_user_donation_summary(user_id=current_user["user_id"])
-        print(f"📊 Summary: {summary}")
         return UserDonationSummary(**summary)
     except Exception as e:
-        print(f"🚨 Error fetching donation summary: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching donation summary", extra={"user_id": current_user["user_id"]})
         raise HTTPException(status_code=500, detail=f"Failed to fetch donation summary: {str(e)}")
 
 
+def validate_export_range(since: Optional[date], until: Optional[date]) -> None:
+    """Reject an export date range that ends before it starts."""
+    if since is not None and until is not None and until <= since:
+        raise HTTPException(status_code=400, detail="'until' must be after 'since'")
+
+
+def start_export(export_format: str, query: str, params: list):
+    """Open an export stream, mapping failures to start it to 503 or 500."""
+    try:
+        return stream_donations_export(export_format, query, params)
+    except PoolTimeout:
+        logger.warning("No export connection available")
+        raise HTTPException(status_code=503, detail="Too many exports in progress, try again shortly")
+    except Exception as e:
+        logger.exception("Error starting export")
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
+@app.get("/me/donations/export", tags=["User"])
+def export_user_donations(
+    current_user: dict = Depends(get_current_user),
+    format: ExportFormatType = Query("csv", description="Export format"),
+    since: Optional[date] = Query(None, description="First day to include"),
+    until: Optional[date] = Query(None, description="Day after the last day to include"),
+):
+    """
+    Download the current user's successful donations as CSV or NDJSON, oldest first.
+    The export is streamed, so it can be arbitrarily large.
+    """
+    validate_export_range(since, until)
+    query, params = build_export_query(
+        USER_EXPORT_COLUMNS,
+        user_id=current_user["user_id"],
+        status="succeeded",
+        since=since,
+        until=until,
+    )
+    return StreamingResponse(
+        start_export(format, query, params),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=export_headers(export_filename("donations", format, since, until)),
+    )
+
+
+@app.get("/admin/donations/export", tags=["Admin"])
+def export_all_donations(
+    current_admin: dict = Depends(get_current_admin),
+    format: ExportFormatType = Query("csv", description="Export format"),
+    since: Optional[date] = Query(None, description="First day to include"),
+    until: Optional[date] = Query(None, description="Day after the last day to include"),
+    status: Optional[str] = Query(None, description="Only include donations with this status"),
+):
+    """
+    Download all donations, including archived ones, as CSV or NDJSON, oldest first.
+    Restricted to ADMIN_EMAILS. The export is streamed, so it can be arbitrarily large.
+    """
+    validate_export_range(since, until)
+    logger.info("Donations export", extra={
+        "admin": current_admin["email"],
+        "format": format,
+        "since": since,
+        "until": until,
+    })
+    query, params = build_export_query(
+        ADMIN_EXPORT_COLUMNS,
+        status=status,
+        since=since,
+        until=until,
+    )
+    return StreamingResponse(
+        start_export(format, query, params),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=export_headers(export_filename("all_donations", format, since, until)),
+    )
+
+
+@app.get("/admin/queries", tags=["Admin"])
+async def get_admin_query_stats(
+    current_admin: dict = Depends(get_current_admin),
+    limit: int = Query(50, ge=1, le=500, description="Number of fingerprints to return"),
+):
+    """
+    Per-statement database stats for this worker process, most total time first.
+    Each entry is a normalized SQL fingerprint with calls, errors, rows, total/mean/max
+    time, connection-acquire wait, and an EXPLAIN (ANALYZE, BUFFERS) sample if captured.
+    """
+    return {"queries": get_query_stats(limit)}
+
+
+@app.delete("/admin/queries", tags=["Admin"])
+async def reset_admin_query_stats(current_admin: dict = Depends(get_current_admin)):
+    """Reset this worker process's statement stats and captured plans."""
+    reset_query_stats()
+    return {"status": "reset"}
+
+
+def require_profiling_enabled() -> None:
+    """Hide the profiling endpoints unless PROFILING_ENABLED is set."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse, tags=["Admin"])
+async def profile_this_worker(
+    current_admin: dict = Depends(get_current_admin),
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS, description="How long to sample for"),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000, description="Milliseconds between samples"),
+):
+    """
+    Sample every thread of the worker serving this request and return collapsed
+    stacks (flamegraph.pl / speedscope format). Only when PROFILING_ENABLED is set.
+    """
+    require_profiling_enabled()
+    logger.info("Worker profile started", extra={"admin": current_admin["email"], "seconds": seconds})
+    try:
+        return await asyncio.to_thread(profile_worker, seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/admin/profile/requests/{profile_id}", response_class=PlainTextResponse, tags=["Admin"])
+async def get_request_profile(profile_id: str, current_admin: dict = Depends(get_current_admin)):
+    """Collapsed stacks of a request profiled with X-Profile-Token, by its X-Profile-Id."""
+    require_profiling_enabled()
+    profile = request_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return profile
+
+
+@app.get("/me/dashboard", response_model=UserDashboardResponse, tags=["User"])
+def get_user_dashboard(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of donations to return"),
+):
+    """
+    Get the current user's profile, first page of donations and donation summary.
+    Replaces separate calls to /auth/me, /me/donations and /me/donations/summary;
+    `next_cursor` continues the donation list via /me/donations.
+    """
+    try:
+        dashboard = fetch_user_dashboard(user_id=current_user["user_id"], limit=limit + 1)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard: {str(e)}")
+    
+    if not dashboard["user"]:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    donations = dashboard["donations"]
+    next_cursor = None
+    if len(donations) > limit:
+        donations = donations[:limit]
+        next_cursor = encode_donation_cursor(donations[-1])
+    
+    return UserDashboardResponse(
+        user=UserResponse(**dashboard["user"]),
+        donations=[UserDonationResponse(**donation) for donation in donations],
+        next_cursor=next_cursor,
+        summary=UserDonationSummary(**dashboard["summary"]),
+    )
+
+
 @app.patch("/me/email", tags=["User"])
 async def update_user_email(
     request: Request,
@@ -494,23 +935,27 @@ async def update_user_email(
         # Verify CSRF token
         verify_csrf(request)
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Check if email already exists
-            cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (new_email, current_user["user_id"]))
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                raise HTTPException(status_code=400, detail="Email already in use")
-            
-            # Update email
-            cursor.execute(
-                "UPDATE users SET email = %s WHERE id = %s",
-                (new_email, current_user["user_id"])
-            )
-            conn.commit()
-            cursor.close()
+        def save_email():
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                
+                # Check if email already exists
+                cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (new_email, current_user["user_id"]))
+                existing_user = cursor.fetchone()
+                
+                if existing_user:
+                    raise HTTPException(status_code=400, detail="Email already in use")
+                
+                # Update email
+                cursor.execute(
+                    "UPDATE users SET email = %s WHERE id = %s",
+                    (new_email, current_user["user_id"])
+                )
+                conn.commit()
+                cursor.close()
+        
+        # Off the event loop: waiting for a pooled connection blocks
+        await asyncio.to_thread(save_email)
         
         return {"message": "Email updated successfully", "email": new_email}
         
@@ -540,19 +985,23 @@ async def update_user_password(
         # Verify CSRF token
         verify_csrf(request)
         
-        # Hash new password
-        hashed_password = hash_password(new_password)
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        def save_password():
+            # Hash new password
+            hashed_password = hash_password(new_password)
             
-            # Update password
-            cursor.execute(
-                "UPDATE users SET password_hash = %s WHERE id = %s",
-                (hashed_password, current_user["user_id"])
-            )
-            conn.commit()
-            cursor.close()
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                
+                # Update password
+                cursor.execute(
+                    "UPDATE users SET password_hash = %s WHERE id = %s",
+                    (hashed_password, current_user["user_id"])
+                )
+                conn.commit()
+                cursor.close()
+        
+        # Off the event loop: bcrypt and waiting for a pooled connection both block
+        await asyncio.to_thread(save_password)
         
         return {"message": "Password updated successfully"}
         
@@ -563,7 +1012,7 @@ async def update_user_password(
 
 
 @app.delete("/me/account", tags=["User"])
-async def delete_user_account(
+def delete_user_account(
     request: Request,
     response: Response,
     current_user: dict = Depends(get_current_user),
@@ -0,0 +1,313 @@
+"""
+Prometheus metrics for the API.
+
+Request metrics are recorded by a plain ASGI middleware labelled with the
+matched route template (e.g. /crises/{crisis_id}) rather than the raw URL,
+so label cardinality stays bounded. Everything else (connections, bcrypt
+calls, Stripe concurrency, caches, webhook workers) is read from in-memory
+counters when /metrics is scraped, keeping the request path cheap.
+"""
+import bisect
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .auth import get_bcrypt_stats
+from .database import get_connection_stats
+from .logs import get_log_stats
+from .payments import get_stripe_stats, idempotency_cache
+from .public_cache import (
+    charities_cache,
+    crises_cache,
+    crises_search_cache,
+    crisis_cache,
+)
+from .query_stats import get_query_stats
+from .tracing import get_trace_stats
+from .warmup import get_warmup_stats
+from .webhooks import get_worker_stats, recent_event_ids
+
+# Latency buckets in seconds (Prometheus client defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _format_family(name: str, kind: str, help_text: str, samples: Iterable[Tuple[str, Dict[str, str], float]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for sample_name, labels, value in samples:
+        lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return _format_family(self.name, "counter", self.help_text, (
+            (self.name, dict(zip(self.labelnames, labels)), value)
+            for labels, value in sorted(self._values.items())
+        ))
+
+
+class Gauge(Counter):
+    """Value that can go up and down, keyed by a tuple of label values."""
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def render(self) -> List[str]:
+        return _format_family(self.name, "gauge", self.help_text, (
+            (self.name, dict(zip(self.labelnames, labels)), value)
+            for labels, value in sorted(self._values.items())
+        ))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        samples = []
+        for labels, series in sorted(self._values.items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                samples.append((f"{self.name}_bucket", {**base, "le": le}, cumulative))
+            samples.append((f"{self.name}_sum", base, float(series[-1])))
+            samples.append((f"{self.name}_count", base, cumulative))
+        return _format_family(self.name, "histogram", self.help_text, samples)
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status class.",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route"),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.",
+    ("method",),
+)
+
+_route_templates: Dict[Callable, str] = {}
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """The path template of the route that handled a request, from the ASGI scope."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    template = _route_templates.get(endpoint)
+    if template is None:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        else:
+            template = UNMATCHED_ROUTE
+        _route_templates[endpoint] = template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc((method,))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_PROGRESS.dec((method,))
+            route = route_template(scope)
+            HTTP_REQUESTS.inc((method, route, f"{status_code // 100}xx"))
+            HTTP_REQUEST_DURATION.observe((method, route), elapsed)
+
+
+def _gauge(name: str, help_text: str, value: float, labels: Optional[Dict[str, str]] = None) -> List[str]:
+    return _format_family(name, "gauge", help_text, [(name, labels or {}, value)])
+
+
+def _counter(name: str, help_text: str, value: float, labels: Optional[Dict[str, str]] = None) -> List[str]:
+    return _format_family(name, "counter", help_text, [(name, labels or {}, value)])
+
+
+def _cache_lines() -> List[str]:
+    caches = {
+        "idempotency": idempotency_cache,
+        "webhook_events": recent_event_ids,
+        "crises": crises_cache,
+        "crises_search": crises_search_cache,
+        "crisis": crisis_cache,
+        "charities": charities_cache,
+    }
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    families = [
+        ("cache_hits_total", "counter", "Cache lookups that found a live entry.", "hits"),
+        ("cache_misses_total", "counter", "Cache lookups that found nothing or an expired entry.", "misses"),
+        ("cache_hit_ratio", "gauge", "Hits over lookups since startup.", "hit_ratio"),
+        ("cache_entries", "gauge", "Entries currently cached.", "size"),
+    ]
+    lines = []
+    for name, kind, help_text, key in families:
+        lines += _format_family(name, kind, help_text, (
+            (name, {"cache": cache}, values[key])
+            for cache, values in stats.items()
+        ))
+    # Only the stale-while-revalidate caches serve stale entries
+    revalidating = {cache: values for cache, values in stats.items() if "stale_hits" in values}
+    for name, help_text, key in (
+        ("cache_stale_hits_total", "Cache lookups served a stale entry.", "stale_hits"),
+        ("cache_refresh_failures_total", "Background cache refreshes that failed.", "refresh_failures"),
+    ):
+        lines += _format_family(name, "counter", help_text, (
+            (name, {"cache": cache}, values[key])
+            for cache, values in revalidating.items()
+        ))
+    return lines
+
+
+def _query_lines() -> List[str]:
+    """Per-fingerprint statement counters, labelled by fingerprint id (text at /admin/queries)."""
+    stats = get_query_stats()
+    families = [
+        ("db_queries_total", "Statements run, by fingerprint.", "calls"),
+        ("db_query_errors_total", "Statements that raised, by fingerprint.", "errors"),
+        ("db_slow_queries_total", "Statements over DB_SLOW_QUERY_MS, by fingerprint.", "slow_calls"),
+        ("db_query_seconds_total", "Time spent executing statements, by fingerprint.", "total_seconds"),
+        ("db_query_rows_total", "Rows returned or affected, by fingerprint.", "rows"),
+        ("db_query_acquire_wait_seconds_total", "Connection-acquire time charged to statements, by fingerprint.",
+         "acquire_wait_seconds"),
+    ]
+    lines = []
+    for name, help_text, key in families:
+        lines += _format_family(name, "counter", help_text, (
+            (name, {"query": entry["id"]}, entry[key]) for entry in stats
+        ))
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in (HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS):
+        lines += metric.render()
+
+    connections = get_connection_stats()
+    lines += _gauge("db_connections_open", "Pooled database connections open, idle or in use.", connections["size"])
+    lines += _gauge("db_connections_in_use", "Pooled database connections lent out.", connections["in_use"])
+    lines += _gauge("db_connections_idle", "Pooled database connections waiting to be reused.", connections["idle"])
+    lines += _gauge("db_pool_max_size", "Most connections the pool will open.", connections["max_size"])
+    lines += _gauge("db_pool_requests_waiting", "Callers waiting for a pooled connection.", connections["waiting"])
+    lines += _gauge("db_pool_saturation", "Connections in use plus waiters, over the pool max size.",
+                    connections["saturation"])
+    lines += _counter("db_pool_timeouts_total", "Callers that gave up waiting for a pooled connection.",
+                      connections["timeouts"])
+    lines += _counter("db_connections_opened_total", "Database connections opened.", connections["opened"])
+    lines += _counter("db_connection_failures_total", "Failed database connection attempts.", connections["failed"])
+    lines += _counter("db_connections_discarded_total", "Connections closed because they came back broken.",
+                      connections["discarded"])
+    lines += _counter("db_connection_acquire_seconds_total", "Time spent waiting for or opening database connections.",
+                      connections["wait_seconds"])
+    lines += _query_lines()
+
+    bcrypt_stats = get_bcrypt_stats()
+    lines += _gauge("bcrypt_jobs_running", "Password hashing jobs running.", bcrypt_stats["running"])
+    lines += _counter("bcrypt_jobs_completed_total", "Password hashing jobs completed.", bcrypt_stats["completed"])
+    lines += _counter("bcrypt_seconds_total", "Time spent hashing and checking passwords.", bcrypt_stats["seconds"])
+
+    stripe_stats = get_stripe_stats()
+    lines += _gauge("stripe_requests_in_flight", "Stripe API calls in progress.", stripe_stats["in_flight"])
+    lines += _gauge("stripe_requests_waiting", "Stripe API calls waiting for a concurrency slot.", stripe_stats["waiting"])
+    lines += _counter("stripe_requests_rejected_total", "Stripe API calls rejected after waiting too long for a slot.",
+                      stripe_stats["rejected"])
+
+    lines += _cache_lines()
+
+    log_stats = get_log_stats()
+    lines += _counter("log_records_dropped_total", "Log records dropped because the log queue was full.",
+                      log_stats["dropped"])
+    lines += _counter("log_records_suppressed_total", "Error log records suppressed by rate limiting.",
+                      log_stats["suppressed"])
+
+    traces = get_trace_stats()
+    lines += _counter("trace_spans_exported_total", "Trace spans handed to the exporter.", traces["exported"])
+    lines += _counter("trace_spans_dropped_total", "Trace spans dropped because the export queue was full.",
+                      traces["dropped"])
+    lines += _counter("trace_export_failures_total", "Trace export batches that failed.", traces["export_failures"])
+    lines += _gauge("trace_spans_queued", "Trace spans waiting to be exported.", traces["queued"])
+
+    warmup = get_warmup_stats()
+    lines += _gauge("warmup_complete", "1 once startup warm-up has finished.", int(warmup["complete"]))
+    lines += _gauge("warmup_seconds", "Time startup warm-up took.", warmup["seconds"] or 0)
+
+    workers = get_worker_stats()
+    lines += _counter("webhook_events_processed_total", "Webhook inbox events processed.", workers["processed"])
+    lines += _counter("webhook_events_failed_total", "Webhook inbox event processing failures.", workers["failed"])
+    lines += _counter("webhook_events_dead_lettered_total", "Webhook inbox events moved to dead letter.",
+                      workers["dead_lettered"])
+    return "\n".join(lines) + "\n"
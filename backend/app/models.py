@@ -3,13 +3,16 @@ Pydantic models for API request/response validation.
 """
 
 from datetime import date, datetime
-from typing import Optional, List, Literal
+from typing import Any, Dict, Optional, List, Literal
 from pydantic import BaseModel, HttpUrl, EmailStr
 
 
 # Type definitions
 SeverityType = Literal["Low", "Medium", "High", "Critical"]
 CategoryType = Literal["Conflict", "Disaster", "Health", "Humanitarian", "Climate"]
+CrisisSortType = Literal["severity", "funding"]
+RollupBucketType = Literal["hour", "day"]
+ExportFormatType = Literal["csv", "ndjson"]
 
 
 # Authentication Models
@@ -58,6 +61,8 @@ class CrisisBase(BaseModel):
 class CrisisResponse(CrisisBase):
     """Crisis response model."""
     id: int
+    total_raised: int = 0  # Succeeded donations in cents
+    donation_count: int = 0
 
     class Config:
         from_attributes = True
@@ -69,6 +74,20 @@ class CrisisListResponse(BaseModel):
     total: int
 
 
+class DonationTimeseriesPoint(BaseModel):
+    """Donations received in one time bucket."""
+    bucket_start: datetime
+    total_amount: int
+    donation_count: int
+
+
+class DonationTimeseriesResponse(BaseModel):
+    """Donation trend for a crisis; empty buckets are omitted."""
+    crisis_id: int
+    bucket: RollupBucketType
+    points: List[DonationTimeseriesPoint]
+
+
 class CharityBase(BaseModel):
     """Base charity model."""
     name: str
@@ -80,6 +99,8 @@ class CharityBase(BaseModel):
 class CharityResponse(CharityBase):
     """Charity response model."""
     id: int
+    total_raised: int = 0  # Succeeded donations in cents
+    donation_count: int = 0
 
     class Config:
         from_attributes = True
@@ -95,6 +116,12 @@ class HealthResponse(BaseModel):
     status: str = "ok"
 
 
+class ReadinessResponse(BaseModel):
+    """Readiness probe: ready, degraded (still serving) or not_ready, with each check's details."""
+    status: Literal["ready", "degraded", "not_ready"]
+    checks: Dict[str, Dict[str, Any]]
+
+
 # Payment Models
 class CreatePaymentIntent(BaseModel):
     """Create payment intent request."""
@@ -145,7 +172,7 @@ class UserDonationResponse(BaseModel):
     created_at: datetime
     crisis_title: str
     crisis_country: str
-    charity_name: str
+    charity_name: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -160,3 +187,11 @@ class UserDonationSummary(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class UserDashboardResponse(BaseModel):
+    """Everything the dashboard needs on first load."""
+    user: UserResponse
+    donations: List[UserDonationResponse]
+    next_cursor: Optional[str] = None
+    summary: UserDonationSummary
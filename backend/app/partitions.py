@@ -0,0 +1,91 @@
+"""
+Monthly partition maintenance for the donations table.
+
+Partitions are created ahead of time so inserts never need a default
+partition; months older than the archive window are moved to the archive
+schema, keeping the hot table and its indexes small.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date
+from typing import Optional
+
+from .config import settings
+from .database import ensure_donation_partitions, archive_donation_partitions
+
+logger = logging.getLogger(__name__)
+
+# Months of donations partitions kept created ahead of the current month
+DONATION_PARTITION_MONTHS_AHEAD = settings.donation_partition_months_ahead
+
+# Archive partitions once they are this many whole months old; 0 never archives
+DONATION_ARCHIVE_AFTER_MONTHS = settings.donation_archive_after_months
+
+# Seconds between maintenance runs; 0 disables the job (startup still runs once)
+DONATION_PARTITION_MAINTENANCE_SECONDS = settings.donation_partition_maintenance_seconds
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+def archive_cutoff(months: int, today: Optional[date] = None) -> date:
+    """First day of the month `months` months before today's month."""
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def maintain_donation_partitions() -> None:
+    """Create upcoming partitions and archive cold ones, per the env settings."""
+    created = ensure_donation_partitions(DONATION_PARTITION_MONTHS_AHEAD)
+    if created:
+        logger.info("Created donations partitions", extra={"partitions_created": created})
+    if DONATION_ARCHIVE_AFTER_MONTHS > 0:
+        archived = archive_donation_partitions(archive_cutoff(DONATION_ARCHIVE_AFTER_MONTHS))
+        if archived:
+            logger.info("Archived donations partitions", extra={"partitions": archived})
+
+
+async def _maintenance_loop() -> None:
+    """Run maintenance every DONATION_PARTITION_MAINTENANCE_SECONDS until cancelled."""
+    while True:
+        await asyncio.sleep(DONATION_PARTITION_MAINTENANCE_SECONDS)
+        try:
+            await asyncio.to_thread(maintain_donation_partitions)
+        except Exception:
+            logger.exception("Donations partition maintenance failed")
+
+
+async def start_partition_maintenance() -> None:
+    """Run maintenance once, then start the periodic job unless disabled."""
+    global _maintenance_task
+    try:
+        await asyncio.to_thread(maintain_donation_partitions)
+    except Exception:
+        logger.exception("Donations partition maintenance failed")
+    if DONATION_PARTITION_MAINTENANCE_SECONDS > 0:
+        _maintenance_task = asyncio.create_task(_maintenance_loop())
+
+
+async def stop_partition_maintenance() -> None:
+    """Cancel the maintenance job and wait for it to exit."""
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+        _maintenance_task = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain donations partitions")
+    parser.add_argument("--months-ahead", type=int, default=DONATION_PARTITION_MONTHS_AHEAD,
+                        help="Create partitions through this many months ahead")
+    parser.add_argument("--archive-before", type=date.fromisoformat, default=None,
+                        help="Archive partitions ending on or before this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    created = ensure_donation_partitions(args.months_ahead)
+    print(f"✅ Created {created} donations partitions")
+    if args.archive_before is not None:
+        archived = archive_donation_partitions(args.archive_before)
+        print(f"✅ Archived {len(archived)} partitions: {', '.join(archived) or '-'}")
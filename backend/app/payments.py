@@ -1,22 +1,175 @@
 """
 Payment processing with Stripe
 """
-import os
-import stripe
-from typing import Optional
-from dotenv import load_dotenv
+import asyncio
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
 
-load_dotenv()
+from .cache import TTLCache
+from .config import settings
+from .tracing import span
 
-# Initialize Stripe
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+if TYPE_CHECKING:
+    import stripe
 
+STRIPE_SECRET_KEY = settings.stripe_secret_key
+STRIPE_WEBHOOK_SECRET = settings.stripe_webhook_secret
 
-def create_payment_intent(
+# Override the Stripe API host, e.g. http://localhost:12111 for the local
+# emulator in benchmarks/stripe_emulator.py
+STRIPE_API_BASE = settings.stripe_api_base
+
+# HTTP client tuning for Stripe API calls
+STRIPE_TIMEOUT_SECONDS = settings.stripe_timeout_seconds
+STRIPE_CONNECT_TIMEOUT_SECONDS = settings.stripe_connect_timeout_seconds
+STRIPE_MAX_NETWORK_RETRIES = settings.stripe_max_network_retries
+STRIPE_MAX_CONNECTIONS = settings.stripe_max_connections
+STRIPE_MAX_KEEPALIVE_CONNECTIONS = settings.stripe_max_keepalive_connections
+STRIPE_KEEPALIVE_EXPIRY_SECONDS = settings.stripe_keepalive_expiry_seconds
+STRIPE_MAX_CONCURRENCY = settings.stripe_max_concurrency
+STRIPE_QUEUE_TIMEOUT_SECONDS = settings.stripe_queue_timeout_seconds
+
+# Locally stored payment statuses older than this are re-checked with Stripe,
+# unless the payment intent has already reached a final state
+PAYMENT_STATUS_STALE_SECONDS = settings.payment_status_stale_seconds
+TERMINAL_PAYMENT_STATUSES = {"succeeded", "canceled"}
+
+# How long an Idempotency-Key on /payments/create-intent replays its response
+IDEMPOTENCY_KEY_TTL_SECONDS = settings.idempotency_key_ttl_seconds
+IDEMPOTENCY_CACHE_SIZE = settings.idempotency_cache_size
+
+# (user_id, Idempotency-Key) -> {"request_hash", "response"}, in front of the database table
+idempotency_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_KEY_TTL_SECONDS)
+
+
+_stripe_module = None
+
+
+def load_stripe():
+    """
+    Import the Stripe SDK on first use.
+
+    Importing it (and httpx, which its async client needs) is a large share
+    of startup time, and most requests never talk to Stripe.
+    """
+    global _stripe_module
+    if _stripe_module is None:
+        import stripe
+
+        stripe.api_key = STRIPE_SECRET_KEY
+        _stripe_module = stripe
+    return _stripe_module
+
+
+def _pooled_http_client(stripe) -> "stripe.HTTPXClient":
+    """
+    Stripe HTTPX client with an explicit keep-alive connection pool.
+
+    The stock HTTPXClient builds its httpx.AsyncClient with default limits.
+    Handing it an httpx whose clients carry our pool size and keep-alive
+    expiry keeps everything else, certificate verification included, up to
+    the SDK, and no client is created only to be thrown away.
+    """
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=STRIPE_MAX_CONNECTIONS,
+        max_keepalive_connections=STRIPE_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=STRIPE_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    pooled_httpx = SimpleNamespace(
+        AsyncClient=partial(httpx.AsyncClient, limits=limits),
+        Client=partial(httpx.Client, limits=limits),
+    )
+    return stripe.HTTPXClient(
+        timeout=httpx.Timeout(
+            STRIPE_TIMEOUT_SECONDS,
+            connect=STRIPE_CONNECT_TIMEOUT_SECONDS,
+        ),
+        verify_ssl_certs=stripe.verify_ssl_certs,
+        _lib=pooled_httpx,
+    )
+
+
+_stripe_http_client: Optional["stripe.HTTPXClient"] = None
+_stripe_client: Optional["stripe.StripeClient"] = None
+_stripe_semaphore = asyncio.Semaphore(STRIPE_MAX_CONCURRENCY)
+_stripe_stats = {"in_flight": 0, "waiting": 0, "rejected": 0}
+
+
+def get_stripe_client() -> "stripe.StripeClient":
+    """
+    Get the shared async Stripe client, creating it on first use.
+
+    Retries use the SDK's exponential backoff with jitter; POST retries
+    reuse the same idempotency key so they are safe to repeat.
+    """
+    global _stripe_client, _stripe_http_client
+    if _stripe_client is None:
+        stripe = load_stripe()
+        _stripe_http_client = _pooled_http_client(stripe)
+        _stripe_client = stripe.StripeClient(
+            stripe.api_key,
+            http_client=_stripe_http_client,
+            max_network_retries=STRIPE_MAX_NETWORK_RETRIES,
+            base_addresses={"api": STRIPE_API_BASE} if STRIPE_API_BASE else None,
+        )
+    return _stripe_client
+
+
+async def close_stripe_client() -> None:
+    """Close pooled connections held by the shared Stripe client."""
+    global _stripe_client, _stripe_http_client
+    if _stripe_http_client is not None:
+        await _stripe_http_client.close_async()
+    _stripe_client = None
+    _stripe_http_client = None
+
+
+@asynccontextmanager
+async def _stripe_slot(operation: str) -> AsyncIterator[None]:
+    """
+    Limit the number of in-flight Stripe calls.
+
+    Callers wait at most STRIPE_QUEUE_TIMEOUT_SECONDS for a slot so a slow
+    payment provider cannot pile up an unbounded number of requests. The wait
+    and the call are traced as one span named after the Stripe operation.
+    """
+    with span(f"stripe.{operation}", kind="client") as stripe_span:
+        _stripe_stats["waiting"] += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(_stripe_semaphore.acquire(), STRIPE_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            _stripe_stats["rejected"] += 1
+            raise Exception("Stripe error: too many concurrent payment requests")
+        finally:
+            _stripe_stats["waiting"] -= 1
+        if stripe_span is not None:
+            stripe_span.set_attribute("stripe.queue_wait_ms", (time.perf_counter() - started) * 1000)
+        _stripe_stats["in_flight"] += 1
+        try:
+            yield
+        finally:
+            _stripe_stats["in_flight"] -= 1
+            _stripe_semaphore.release()
+
+
+def get_stripe_stats() -> Dict[str, int]:
+    """Stripe calls holding or waiting for a concurrency slot, and calls rejected."""
+    return {**_stripe_stats, "max_concurrency": STRIPE_MAX_CONCURRENCY}
+
+
+async def create_payment_intent(
     amount: int,
     currency: str = "usd",
-    metadata: Optional[dict] = None
+    metadata: Optional[dict] = None,
+    idempotency_key: Optional[str] = None,
 ) -> dict:
     """
     Create a Stripe payment intent
@@ -25,17 +178,22 @@ def create_payment_intent(
         amount: Amount in cents (e.g., 1000 = $10.00)
         currency: Currency code (default: usd)
         metadata: Additional data to attach to the payment
+        idempotency_key: Stripe idempotency key; repeats return the same intent
     
     Returns:
         Payment intent object with client_secret
     """
     try:
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount,
-            currency=currency,
-            metadata=metadata or {},
-            automatic_payment_methods={"enabled": True},
-        )
+        async with _stripe_slot("payment_intents.create"):
+            payment_intent = await get_stripe_client().v1.payment_intents.create_async(
+                params={
+                    "amount": amount,
+                    "currency": currency,
+                    "metadata": metadata or {},
+                    "automatic_payment_methods": {"enabled": True},
+                },
+                options={"idempotency_key": idempotency_key} if idempotency_key else None,
+            )
         
         return {
             "client_secret": payment_intent.client_secret,
@@ -43,11 +201,26 @@ def create_payment_intent(
             "amount": payment_intent.amount,
             "currency": payment_intent.currency,
             "status": payment_intent.status,
+            "metadata": dict(payment_intent.metadata or {}),
+            "created": payment_intent.created,
         }
-    except stripe.error.StripeError as e:
+    except load_stripe().error.StripeError as e:
         raise Exception(f"Stripe error: {str(e)}")
 
 
+def payment_request_hash(request_data: dict) -> str:
+    """Stable hash of a create-intent request body, to detect reused idempotency keys."""
+    encoded = json.dumps(request_data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def is_payment_status_fresh(record: dict) -> bool:
+    """Check whether a locally stored payment status can be served without asking Stripe."""
+    if record["status"] in TERMINAL_PAYMENT_STATUSES:
+        return True
+    return record["age_seconds"] <= PAYMENT_STATUS_STALE_SECONDS
+
+
 def verify_webhook_signature(payload: bytes, signature: str) -> dict:
     """
     Verify Stripe webhook signature
@@ -59,6 +232,7 @@ def verify_webhook_signature(payload: bytes, signature: str) -> dict:
     Returns:
         Verified event object
     """
+    stripe = load_stripe()
     try:
         event = stripe.Webhook.construct_event(
             payload, signature, STRIPE_WEBHOOK_SECRET
@@ -70,7 +244,7 @@ def verify_webhook_signature(payload: bytes, signature: str) -> dict:
         raise Exception("Invalid signature")
 
 
-def retrieve_payment_intent(payment_intent_id: str) -> dict:
+async def retrieve_payment_intent(payment_intent_id: str) -> dict:
     """
     Retrieve payment intent details
     
@@ -81,7 +255,10 @@ def retrieve_payment_intent(payment_intent_id: str) -> dict:
         Payment intent object
     """
     try:
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        async with _stripe_slot("payment_intents.retrieve"):
+            payment_intent = await get_stripe_client().v1.payment_intents.retrieve_async(
+                payment_intent_id
+            )
         return {
             "id": payment_intent.id,
             "amount": payment_intent.amount,
@@ -89,11 +266,11 @@ def retrieve_payment_intent(payment_intent_id: str) -> dict:
             "status": payment_intent.status,
             "metadata": payment_intent.metadata,
         }
-    except stripe.error.StripeError as e:
+    except load_stripe().error.StripeError as e:
         raise Exception(f"Stripe error: {str(e)}")
 
 
-def create_customer(email: str, name: Optional[str] = None, metadata: Optional[dict] = None) -> dict:
+async def create_customer(email: str, name: Optional[str] = None, metadata: Optional[dict] = None) -> dict:
     """
     Create a Stripe customer
     
@@ -106,27 +283,28 @@ def create_customer(email: str, name: Optional[str] = None, metadata: Optional[d
         Customer object
     """
     try:
-        customer = stripe.Customer.create(
-            email=email,
-            name=name,
-            metadata=metadata or {},
-        )
+        params = {"email": email, "metadata": metadata or {}}
+        if name:
+            params["name"] = name
+        async with _stripe_slot("customers.create"):
+            customer = await get_stripe_client().v1.customers.create_async(params=params)
         return {
             "customer_id": customer.id,
             "email": customer.email,
             "name": customer.name,
         }
-    except stripe.error.StripeError as e:
+    except load_stripe().error.StripeError as e:
         raise Exception(f"Stripe error: {str(e)}")
 
 
-def create_donation_payment(
+async def create_donation_payment(
     amount: int,
     crisis_id: int,
     charity_id: Optional[int] = None,
     donor_email: Optional[str] = None,
     donor_name: Optional[str] = None,
     user_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
 ) -> dict:
     """
     Create a payment intent for crisis donation
@@ -138,6 +316,7 @@ def create_donation_payment(
         donor_email: Donor email address
         donor_name: Donor name
         user_id: User ID for tracking donations
+        idempotency_key: Stripe idempotency key for safe retries
     
     Returns:
         Payment intent with client_secret
@@ -156,8 +335,9 @@ def create_donation_payment(
     if user_id:
         metadata["user_id"] = str(user_id)
     
-    return create_payment_intent(
+    return await create_payment_intent(
         amount=amount,
         currency="usd",
-        metadata=metadata
+        metadata=metadata,
+        idempotency_key=idempotency_key,
     )
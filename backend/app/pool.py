@@ -0,0 +1,198 @@
+"""
+A small thread-safe pool of psycopg connections.
+
+Callers borrow a connection with `connection()`, which behaves like
+`with psycopg.connect(...)`: the transaction is committed if the block
+succeeds and rolled back if it raises, but the connection is then returned
+to the pool instead of closed. Connections are opened on demand up to
+max_size. Past that, callers wait up to `timeout` seconds for one to come
+back and then get PoolTimeout. Waiting blocks the calling thread, so
+callers must not be on the event loop. `open()` fills the pool to min_size
+ahead of traffic. Connections returned broken or mid-transaction are closed
+rather than reused, and idle connections above min_size are closed after
+max_idle seconds.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Generator, Optional, Tuple
+
+import psycopg
+from psycopg.pq import TransactionStatus
+
+
+class PoolTimeout(psycopg.OperationalError):
+    """Raised when no connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg connections shared by request handlers and background threads."""
+
+    def __init__(
+        self,
+        conninfo: Callable[[], str],
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_idle: float = 600.0,
+        configure: Optional[Callable[[psycopg.Connection], None]] = None,
+        **connect_kwargs: Any,
+    ):
+        self.conninfo = conninfo
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.configure = configure
+        self.connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        # (connection, monotonic time it was returned); the most recently used is reused first
+        self._idle: Deque[Tuple[psycopg.Connection, float]] = deque()
+        # Connections open or being opened, idle or in use
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            "waiting": 0,
+            "requests": 0,
+            "timeouts": 0,
+            "opened": 0,
+            "failed": 0,
+            "discarded": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _connect(self) -> psycopg.Connection:
+        conn = psycopg.connect(self.conninfo(), **self.connect_kwargs)
+        if self.configure is not None:
+            self.configure(conn)
+        return conn
+
+    def open(self) -> int:
+        """Open connections until the pool holds min_size; returns how many were opened."""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return opened
+                self._size += 1
+            conn = self._new_connection()
+            self.putconn(conn)
+            opened += 1
+
+    def _new_connection(self) -> psycopg.Connection:
+        """Open a connection for a slot already counted in _size."""
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._stats["failed"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["opened"] += 1
+        return conn
+
+    def getconn(self, timeout: Optional[float] = None) -> psycopg.Connection:
+        """Take an idle connection, open a new one, or wait for one to be returned."""
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        conn = None
+        with self._cond:
+            self._stats["requests"] += 1
+            while True:
+                if self._closed:
+                    raise psycopg.OperationalError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()[0]
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No database connection available after {time.monotonic() - started:.1f}s")
+                self._stats["waiting"] += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._stats["waiting"] -= 1
+        if conn is None:
+            conn = self._new_connection()
+        with self._cond:
+            self._stats["wait_seconds"] += time.monotonic() - started
+        return conn
+
+    def putconn(self, conn: psycopg.Connection) -> None:
+        """Return a connection, closing it instead if it cannot be safely reused."""
+        reusable = not conn.closed and conn.info.transaction_status == TransactionStatus.IDLE
+        if reusable and conn.autocommit:
+            conn.autocommit = False
+        expired = []
+        with self._cond:
+            if reusable and not self._closed:
+                now = time.monotonic()
+                self._idle.append((conn, now))
+                # The oldest idle connections are at the left; close those idle too long
+                while self._size > self.min_size and self._idle and now - self._idle[0][1] > self.max_idle:
+                    expired.append(self._idle.popleft()[0])
+                    self._size -= 1
+            else:
+                expired.append(conn)
+                self._size -= 1
+                self._stats["discarded"] += not self._closed
+            self._cond.notify()
+        for old in expired:
+            old.close()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Generator[psycopg.Connection, None, None]:
+        """Borrow a connection for the block, committing on success and rolling back on error."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except BaseException:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg.Error:
+                    pass
+            raise
+        else:
+            if not conn.closed:
+                conn.commit()
+        finally:
+            self.putconn(conn)
+
+    def close(self) -> None:
+        """Close idle connections and refuse new requests; borrowed ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Pool size and limits, connections idle and in use, waiters and lifetime counters.
+
+        `saturation` is connections in use plus callers waiting, over
+        max_size: above 1 means requests are queueing for a connection.
+        """
+        with self._cond:
+            idle = len(self._idle)
+            in_use = self._size - idle
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": idle,
+                "in_use": in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "saturation": (in_use + self._stats["waiting"]) / self.max_size,
+            }
@@ -0,0 +1,174 @@
+"""
+On-demand sampling profiler for a live worker.
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval and counts identical stacks. The
+result is in the collapsed-stack format read by flamegraph.pl, speedscope
+and inferno: one line per stack, frames root first, separated by ";",
+followed by the sample count. Samples are taken whenever the sampler thread
+gets the GIL, so a busy worker is sampled at most once per interpreter
+switch interval (5 ms by default).
+
+Everything is off unless PROFILING_ENABLED is set. Admins can profile the
+whole worker for a few seconds through /admin/profile. A single request is
+profiled when it carries `X-Profile-Token: $PROFILING_TOKEN`. The event loop
+thread and the threadpool threads that run sync endpoints and
+asyncio.to_thread work are sampled; both are shared by every request on the
+worker, so the profile also holds stacks of any requests served
+concurrently. A profiled response carries an X-Profile-Id to fetch the stacks from
+/admin/profile/requests/{id}. Only one profile runs per worker at a time.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from .cache import TTLCache
+from .config import settings
+
+PROFILING_ENABLED = settings.profiling_enabled
+# Shared secret for the per-request X-Profile-Token header; unset disables it
+PROFILING_TOKEN = settings.profiling_token
+PROFILE_MAX_SECONDS = settings.profile_max_seconds
+PROFILE_INTERVAL_MS = settings.profile_interval_ms
+REQUEST_PROFILE_INTERVAL_MS = settings.request_profile_interval_ms
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+# Name prefixes of the threads running sync endpoints (anyio) and asyncio.to_thread calls
+THREADPOOL_THREAD_PREFIXES = ("AnyIO worker thread", "asyncio_")
+
+# Collapsed stacks of recently profiled requests, by profile id
+request_profiles = TTLCache(maxsize=50, ttl=900)
+
+# Held by whichever profile is running on this worker
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when another profile is already running on this worker."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of some or all threads until stopped."""
+
+    def __init__(self, interval: float, thread_ids: Optional[Iterable[int]] = None,
+                 thread_prefixes: Iterable[str] = ()):
+        self.interval = interval
+        # Sample only these threads, by id or by name prefix, when either is given
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.samples = 0
+        self._counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks."""
+        self._stop.set()
+        self._thread.join()
+        return self.collapsed()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or not self._wanted(thread_id, names.get(thread_id)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self._counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _wanted(self, thread_id: int, name: Optional[str]) -> bool:
+        if self.thread_ids is None and not self.thread_prefixes:
+            return True
+        if thread_id in (self.thread_ids or ()):
+            return True
+        return bool(self.thread_prefixes) and name is not None and name.startswith(self.thread_prefixes)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self._counts.items()))
+
+
+def profile_worker(seconds: float, interval_ms: float = PROFILE_INTERVAL_MS) -> str:
+    """Sample every thread of this worker for `seconds`, blocking until done."""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running on this worker")
+    try:
+        profiler = SamplingProfiler(interval_ms / 1000)
+        profiler.start()
+        time.sleep(seconds)
+        return profiler.stop()
+    finally:
+        _profile_lock.release()
+
+
+def profile_token_valid(token: bytes) -> bool:
+    """Whether a raw X-Profile-Token header value matches PROFILING_TOKEN, in constant time."""
+    return bool(PROFILING_ENABLED and PROFILING_TOKEN) and hmac.compare_digest(token, PROFILING_TOKEN.encode())
+
+
+class RequestProfilerMiddleware:
+    """
+    ASGI middleware profiling requests that carry a valid X-Profile-Token.
+
+    The sampled threads are the event loop and the threadpool workers, which
+    every request on the worker shares, so stacks from requests running
+    concurrently with the profiled one end up in its profile too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILING_ENABLED and PROFILING_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        headers: Dict[bytes, bytes] = dict(scope["headers"])
+        token = headers.get(PROFILE_TOKEN_HEADER)
+        if token is None or not profile_token_valid(token):
+            await self.app(scope, receive, send)
+            return
+        # Skip profiling rather than queue behind another profile
+        if not _profile_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (PROFILE_ID_HEADER, profile_id.encode("latin-1"))]}
+            await send(message)
+
+        profiler = SamplingProfiler(
+            REQUEST_PROFILE_INTERVAL_MS / 1000,
+            thread_ids=[threading.get_ident()],
+            thread_prefixes=THREADPOOL_THREAD_PREFIXES,
+        )
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            request_profiles.set(profile_id, profiler.stop())
+            _profile_lock.release()
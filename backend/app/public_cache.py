@@ -0,0 +1,100 @@
+"""
+Caches in front of the public read endpoints: crisis list, crisis details
+and charities.
+
+These are read far more often than they change, and serving slightly old
+data beats failing. Each result is kept per key. For
+PUBLIC_CACHE_SOFT_TTL_SECONDS it is served as is. After that it is served
+stale while a background thread reloads it, and if the database or pool is
+unavailable the last good result keeps being served. Past
+PUBLIC_CACHE_HARD_TTL_SECONDS an entry is never served and the request
+waits on the database. Stale responses carry X-Served-Stale and Age headers.
+warm_public_caches() loads the unfiltered crisis lists at startup.
+
+Anyone can send arbitrary search text or crisis ids, so those must not be
+able to evict the entries serve-stale-on-error exists for. Text searches
+get their own small cache, and unknown crisis ids (no crisis, no
+charities) are not cached at all. The remaining keys are combinations of
+the category, severity and sort enums, which fit in PUBLIC_CACHE_SIZE.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .cache import CacheRead, StaleWhileRevalidateCache
+from .config import settings
+from .database import fetch_charities, fetch_crises, fetch_crisis_by_id
+
+PUBLIC_CACHE_SOFT_TTL_SECONDS = settings.public_cache_soft_ttl_seconds
+# Oldest result ever served, even while the database is down
+PUBLIC_CACHE_HARD_TTL_SECONDS = settings.public_cache_hard_ttl_seconds
+# Minimum seconds between refresh attempts of an entry after one failed
+PUBLIC_CACHE_RETRY_SECONDS = settings.public_cache_retry_seconds
+PUBLIC_CACHE_SIZE = settings.public_cache_size
+# Entries per text-search cache, kept apart from the filter-only results
+PUBLIC_SEARCH_CACHE_SIZE = settings.public_search_cache_size
+
+STALE_HEADER = "X-Served-Stale"
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+def _public_cache(
+    maxsize: int = PUBLIC_CACHE_SIZE,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+) -> StaleWhileRevalidateCache:
+    return StaleWhileRevalidateCache(
+        maxsize=maxsize,
+        soft_ttl=PUBLIC_CACHE_SOFT_TTL_SECONDS,
+        hard_ttl=PUBLIC_CACHE_HARD_TTL_SECONDS,
+        executor=_refresh_executor,
+        retry_seconds=PUBLIC_CACHE_RETRY_SECONDS,
+        cache_if=cache_if,
+    )
+
+
+# (category, severity, sort) -> crisis rows
+crises_cache = _public_cache()
+# (search, category, severity, sort) -> crisis rows
+crises_search_cache = _public_cache(PUBLIC_SEARCH_CACHE_SIZE)
+# crisis id -> crisis row; ids with no crisis are not cached
+crisis_cache = _public_cache(cache_if=lambda crisis: crisis is not None)
+# crisis id, or None for all -> charity rows; empty results are not cached
+charities_cache = _public_cache(cache_if=bool)
+
+
+def cached_crises(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    sort: str = "severity",
+) -> CacheRead:
+    """fetch_crises through the cache; callers must not modify the rows."""
+    def load():
+        return fetch_crises(search=search, category=category, severity=severity, sort=sort)
+
+    if search:
+        return crises_search_cache.get((search, category, severity, sort), load)
+    return crises_cache.get((category, severity, sort), load)
+
+
+def cached_crisis(crisis_id: int) -> CacheRead:
+    """fetch_crisis_by_id through the cache."""
+    return crisis_cache.get(crisis_id, lambda: fetch_crisis_by_id(crisis_id))
+
+
+def cached_charities(crisis_id: Optional[int] = None) -> CacheRead:
+    """fetch_charities through the cache."""
+    return charities_cache.get(crisis_id or None, lambda: fetch_charities(crisis_id))
+
+
+def stale_headers(read: CacheRead) -> Dict[str, str]:
+    """Headers marking a stale response with why it is stale and how old it is."""
+    if read.stale is None:
+        return {}
+    return {STALE_HEADER: read.stale, "Age": str(int(read.age))}
+
+
+def warm_public_caches() -> None:
+    """Load the unfiltered crisis list in both sort orders."""
+    for sort in ("severity", "funding"):
+        cached_crises(sort=sort)
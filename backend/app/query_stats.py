@@ -0,0 +1,272 @@
+"""
+Per-statement database instrumentation.
+
+Connections from get_db_connection create the cursors below, which time every
+execute() and fold it into in-memory aggregates keyed by a normalized
+fingerprint of the SQL (literals and placeholders replaced by ?), so the ten
+variants of a filtered query share one entry. Statements slower than
+DB_SLOW_QUERY_MS are logged with their parameters redacted to type names.
+With DB_EXPLAIN_SLOW_QUERIES on, the slowest read seen for each fingerprint
+is queued for a background thread. That thread re-runs it under EXPLAIN
+(ANALYZE, BUFFERS) on its own connection, in a rolled-back transaction capped
+at DB_EXPLAIN_TIMEOUT_MS, and keeps the plan. The request never waits for it.
+
+Statements sent in pipeline mode are timed when queued, not when the server
+runs them, so they record near-zero durations and are never treated as slow.
+"""
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import psycopg
+
+from .config import settings
+from .tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+DB_SLOW_QUERY_MS = settings.db_slow_query_ms
+DB_EXPLAIN_SLOW_QUERIES = settings.db_explain_slow_queries
+DB_EXPLAIN_TIMEOUT_MS = settings.db_explain_timeout_ms
+# Distinct fingerprints tracked; statements beyond this are pooled under OTHER_QUERY_ID
+DB_QUERY_STATS_MAX = settings.db_query_stats_max
+
+OTHER_QUERY_ID = "other"
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_WRITES = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|COPY|CALL|DECLARE)\b", re.I)
+
+_stats_lock = threading.Lock()
+_query_stats: Dict[str, Dict[str, Any]] = {}
+_query_plans: Dict[str, Dict[str, Any]] = {}
+
+# Slow reads waiting to be explained; more are dropped while it is full
+_plan_queue: "queue.Queue[Tuple[str, str, Any, float]]" = queue.Queue(maxsize=16)
+# Fingerprints queued or being explained, so each is queued at most once at a time
+_plans_pending: set = set()
+_plan_thread: Optional[threading.Thread] = None
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query: str) -> Tuple[str, str]:
+    """Short id and normalized text of a SQL statement."""
+    text = _COMMENTS.sub(" ", query)
+    text = _STRINGS.sub("?", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    text = _VALUE_LISTS.sub("(?, ...)", text)
+    query_id = hashlib.blake2b(text.encode("utf-8"), digest_size=4).hexdigest()
+    return query_id, text
+
+
+def query_text(query: Any, conn: psycopg.Connection) -> str:
+    """SQL text of a str, bytes or psycopg.sql query."""
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return query.as_string(conn)
+
+
+def redact_params(params: Any) -> Any:
+    """Parameters with every value replaced by its type name."""
+    if params is None:
+        return None
+    if isinstance(params, Mapping):
+        return {key: _redact(value) for key, value in params.items()}
+    return [_redact(value) for value in params]
+
+
+def _redact(value: Any) -> Optional[str]:
+    return None if value is None else f"<{type(value).__name__}>"
+
+
+def _new_stats(text: str) -> Dict[str, Any]:
+    return {
+        "query": text,
+        "calls": 0,
+        "errors": 0,
+        "slow_calls": 0,
+        "rows": 0,
+        "total_seconds": 0.0,
+        "max_seconds": 0.0,
+        "acquire_wait_seconds": 0.0,
+    }
+
+
+def record_query(query_id: str, text: str, seconds: float, rows: int, acquire_wait: float,
+                 failed: bool, slow: bool) -> None:
+    """Fold one statement into its fingerprint's aggregates."""
+    with _stats_lock:
+        stats = _query_stats.get(query_id)
+        if stats is None:
+            if len(_query_stats) >= DB_QUERY_STATS_MAX:
+                query_id = OTHER_QUERY_ID
+                stats = _query_stats.get(query_id)
+            if stats is None:
+                stats = _query_stats[query_id] = _new_stats(
+                    text if query_id != OTHER_QUERY_ID else "<statements beyond DB_QUERY_STATS_MAX>"
+                )
+        stats["calls"] += 1
+        stats["errors"] += failed
+        stats["slow_calls"] += slow
+        stats["rows"] += rows
+        stats["total_seconds"] += seconds
+        stats["acquire_wait_seconds"] += acquire_wait
+        if seconds > stats["max_seconds"]:
+            stats["max_seconds"] = seconds
+
+
+def _wants_plan(query_id: str, text: str, seconds: float) -> bool:
+    """Only re-run reads, and only when slower than the plan already kept."""
+    if not text.upper().startswith(("SELECT", "WITH")) or _WRITES.search(text):
+        return False
+    with _stats_lock:
+        sample = _query_plans.get(query_id)
+        return sample is None or seconds > sample["seconds"]
+
+
+def capture_plan(conn: psycopg.Connection, query_id: str, query: str, params: Any, seconds: float) -> None:
+    """Store EXPLAIN (ANALYZE, BUFFERS) of a slow read, run on conn in a rolled-back transaction."""
+    try:
+        # ANALYZE runs the statement again; roll back anything a called function wrote
+        with conn.transaction(force_rollback=True):
+            with psycopg.Cursor(conn) as cursor:
+                cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(DB_EXPLAIN_TIMEOUT_MS),))
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+    except psycopg.Error as e:
+        logger.warning("Could not explain slow query", extra={"query_id": query_id, "error": str(e)})
+        return
+    with _stats_lock:
+        _query_plans[query_id] = {
+            "seconds": seconds,
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "plan": plan,
+        }
+
+
+def _explain_worker() -> None:
+    # Imported here: database imports this module
+    from .database import get_connection_params
+
+    conn: Optional[psycopg.Connection] = None
+    while True:
+        query_id, query, params, seconds = _plan_queue.get()
+        try:
+            if conn is None or conn.closed:
+                conn = psycopg.connect(get_connection_params(), autocommit=True)
+            capture_plan(conn, query_id, query, params, seconds)
+        except psycopg.Error as e:
+            logger.warning("Could not explain slow query", extra={"query_id": query_id, "error": str(e)})
+        finally:
+            with _stats_lock:
+                _plans_pending.discard(query_id)
+
+
+def queue_plan_capture(query_id: str, query: str, params: Any, seconds: float) -> None:
+    """Hand a slow read to the background EXPLAIN thread, dropping it if that is backed up."""
+    global _plan_thread
+    with _stats_lock:
+        if query_id in _plans_pending:
+            return
+        if _plan_thread is None:
+            _plan_thread = threading.Thread(target=_explain_worker, name="query-explain", daemon=True)
+            _plan_thread.start()
+        try:
+            _plan_queue.put_nowait((query_id, query, params, seconds))
+        except queue.Full:
+            return
+        _plans_pending.add(query_id)
+
+
+def observe_statement(cursor: psycopg.Cursor, query: Any, params: Any, seconds: float,
+                      error: Optional[Exception] = None) -> None:
+    """Record a statement run on an instrumented cursor, tracing it and logging and explaining it if slow."""
+    failed = error is not None
+    conn = cursor.connection
+    # Time spent opening the connection is charged to its first statement
+    acquire_wait = getattr(conn, "acquire_wait", 0.0)
+    if acquire_wait:
+        conn.acquire_wait = 0.0
+    rows = 0 if failed else max(cursor.rowcount, 0)
+    sql = query_text(query, conn)
+    query_id, text = fingerprint(sql)
+    slow = seconds * 1000 >= DB_SLOW_QUERY_MS
+    record_query(query_id, text, seconds, rows, acquire_wait, failed, slow)
+    record_span("db.query", seconds, kind="client", error=f"{type(error).__name__}: {error}" if failed else None,
+                **{"db.query_id": query_id, "db.statement": text, "db.rows": rows,
+                   "db.acquire_wait_ms": acquire_wait * 1000})
+    if not slow:
+        return
+    logger.warning("Slow query", extra={
+        "query_id": query_id,
+        "duration_ms": round(seconds * 1000, 1),
+        "rows": rows,
+        "statement": text,
+        "params": redact_params(params),
+    })
+    if DB_EXPLAIN_SLOW_QUERIES and not failed and _wants_plan(query_id, text, seconds):
+        queue_plan_capture(query_id, sql, params, seconds)
+
+
+class _InstrumentedMixin:
+    def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, params, **kwargs)
+        except Exception as e:
+            observe_statement(self, query, params, time.perf_counter() - started, error=e)
+            raise
+        observe_statement(self, query, params, time.perf_counter() - started)
+        return result
+
+    def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = super().executemany(query, params_seq, **kwargs)
+        except Exception as e:
+            observe_statement(self, query, None, time.perf_counter() - started, error=e)
+            raise
+        observe_statement(self, query, None, time.perf_counter() - started)
+        return result
+
+
+class InstrumentedCursor(_InstrumentedMixin, psycopg.Cursor):
+    """Client-side cursor that records every statement it runs."""
+
+
+class InstrumentedServerCursor(_InstrumentedMixin, psycopg.ServerCursor):
+    """Named cursor that records its DECLARE; rows are fetched later and not counted."""
+
+
+def get_query_stats(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per-fingerprint aggregates, most total time first, with any captured plan."""
+    with _stats_lock:
+        entries = [
+            {"id": query_id, **stats, "plan": _query_plans.get(query_id)}
+            for query_id, stats in _query_stats.items()
+        ]
+    for entry in entries:
+        entry["mean_seconds"] = entry["total_seconds"] / entry["calls"] if entry["calls"] else 0.0
+    entries.sort(key=lambda entry: entry["total_seconds"], reverse=True)
+    return entries[:limit] if limit else entries
+
+
+def reset_query_stats() -> None:
+    """Forget all aggregates and captured plans."""
+    with _stats_lock:
+        _query_stats.clear()
+        _query_plans.clear()
@@ -0,0 +1,318 @@
+"""
+Lightweight request tracing.
+
+TracingMiddleware opens a server span per HTTP request, continuing the trace
+from an incoming W3C `traceparent` header when there is one. Code running
+inside the request adds child spans with `span()` (Stripe calls, password
+hashing) or `record_span()` for work already timed (database statements).
+The current span lives in a contextvar, so nothing has to be passed around.
+
+Overhead is bounded by sampling: with TRACE_SAMPLE_RATE at 0 (the default)
+tracing is off and span() is a no-op. Otherwise a request is traced with
+probability TRACE_SAMPLE_RATE. A traceparent's sampled flag is set by the
+client, so it is only followed with TRACE_TRUST_PARENT_SAMPLING on. Finished spans go on a bounded queue, dropped when full,
+and a background thread hands them in batches to the exporter: NDJSON lines
+appended to TRACE_FILE by default, or any `module:factory` in TRACE_EXPORTER
+returning an object with export(spans) and shutdown().
+"""
+import importlib
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = settings.trace_sample_rate
+TRACE_TRUST_PARENT_SAMPLING = settings.trace_trust_parent_sampling
+TRACE_EXPORTER = settings.trace_exporter
+TRACE_FILE = settings.trace_file
+TRACE_QUEUE_SIZE = settings.trace_queue_size
+TRACE_BATCH_SIZE = settings.trace_batch_size
+TRACE_FLUSH_SECONDS = settings.trace_flush_seconds
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+_span_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+_exporter_thread: Optional[threading.Thread] = None
+_exporter_lock = threading.Lock()
+_trace_stats = {"exported": 0, "dropped": 0, "export_failures": 0}
+# Queued by shutdown_tracing to flush and stop the exporter thread
+_STOP: Dict[str, Any] = {}
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error",
+                 "token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: str = "internal",
+                 attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        # Restores the previous current span when this one is finished
+        self.token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        _enqueue(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def tracing_enabled() -> bool:
+    return TRACE_SAMPLE_RATE > 0
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of the current request, if it is being traced."""
+    return _current_span.get()
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent header, or None if invalid."""
+    if not header:
+        return None
+    match = TRACEPARENT_RE.match(header.strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Optional[Span]:
+    """
+    Start a server span if this request is sampled, continuing the caller's trace.
+
+    Returns None when the request is not traced. The span becomes current;
+    pass it to finish_trace() when the request is done.
+    """
+    if not tracing_enabled():
+        return None
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", None, None
+    if sampled is None or not TRACE_TRUST_PARENT_SAMPLING:
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return None
+    root = Span(name, trace_id, parent_id, kind="server", attributes=attributes)
+    root.token = _current_span.set(root)
+    return root
+
+
+def finish_trace(root: Span) -> None:
+    """End a span from start_trace and restore the previous current span."""
+    _current_span.reset(root.token)
+    root.end()
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current span; yields None and records nothing when not traced."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, kind=kind, attributes=attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def record_span(name: str, seconds: float, kind: str = "internal", error: Optional[str] = None,
+                **attributes: Any) -> None:
+    """Record an already-finished child span that ended just now and lasted `seconds`."""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    end_ns = time.time_ns()
+    child = Span(name, parent.trace_id, parent.span_id, kind=kind, attributes=attributes,
+                 start_ns=end_ns - int(seconds * 1e9))
+    child.error = error
+    child.end(end_ns)
+
+
+class FileSpanExporter:
+    """Appends spans to a file as newline-delimited JSON."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(s, default=str) + "\n" for s in spans)
+
+    def shutdown(self) -> None:
+        pass
+
+
+def load_exporter(spec: str = TRACE_EXPORTER):
+    """The exporter named by TRACE_EXPORTER: "file", or "package.module:factory"."""
+    if spec == "file":
+        return FileSpanExporter()
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"TRACE_EXPORTER must be 'file' or 'module:factory', got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+def _enqueue(finished: Span) -> None:
+    try:
+        _span_queue.put_nowait(finished.to_dict())
+    except queue.Full:
+        _trace_stats["dropped"] += 1
+        return
+    if _exporter_thread is None:
+        _start_exporter()
+
+
+def _start_exporter() -> None:
+    global _exporter_thread
+    with _exporter_lock:
+        if _exporter_thread is None:
+            _exporter_thread = threading.Thread(
+                target=_export_loop, args=(load_exporter(),), name="trace-exporter", daemon=True,
+            )
+            _exporter_thread.start()
+
+
+def _export_batch(exporter, batch: List[Dict[str, Any]]) -> None:
+    try:
+        exporter.export(batch)
+        _trace_stats["exported"] += len(batch)
+    except Exception:
+        _trace_stats["export_failures"] += 1
+        logger.exception("Trace export failed", extra={"dropped_spans": len(batch)})
+
+
+def _export_loop(exporter) -> None:
+    """Drain the span queue in batches, flushing at least every TRACE_FLUSH_SECONDS."""
+    batch: List[Dict[str, Any]] = []
+    deadline = time.monotonic() + TRACE_FLUSH_SECONDS
+    while True:
+        try:
+            item = _span_queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+        except queue.Empty:
+            item = None
+        if item is not None and item is not _STOP:
+            batch.append(item)
+        if batch and (item is _STOP or len(batch) >= TRACE_BATCH_SIZE or time.monotonic() >= deadline):
+            _export_batch(exporter, batch)
+            batch = []
+        if time.monotonic() >= deadline:
+            deadline = time.monotonic() + TRACE_FLUSH_SECONDS
+        if item is _STOP:
+            exporter.shutdown()
+            return
+
+
+def shutdown_tracing(timeout: float = 5.0) -> None:
+    """Flush queued spans and stop the exporter thread."""
+    global _exporter_thread
+    with _exporter_lock:
+        thread, _exporter_thread = _exporter_thread, None
+    if thread is None:
+        return
+    _span_queue.put(_STOP)
+    thread.join(timeout)
+
+
+def get_trace_stats() -> Dict[str, int]:
+    """Spans exported, dropped on a full queue, failed export batches and spans waiting."""
+    return {**_trace_stats, "queued": _span_queue.qsize()}
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware running each sampled request under a server span.
+
+    The span is named "<METHOD> <route template>" using route_resolver(scope)
+    once routing is done, and its traceparent is returned to the caller.
+    """
+
+    def __init__(self, app, route_resolver: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.app = app
+        self.route_resolver = route_resolver
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = start_trace(f"{scope['method']} {scope['path']}", traceparent,
+                           **{"http.method": scope["method"], "http.target": scope["path"]})
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", root.traceparent.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if self.route_resolver is not None:
+                route = self.route_resolver(scope)
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)
+            finish_trace(root)
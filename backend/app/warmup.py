@@ -0,0 +1,47 @@
+"""
+Startup warm-up, run from the app lifespan before the worker takes traffic.
+
+Uvicorn only accepts connections once lifespan startup has finished, so the
+first requests after a deploy or rolling restart find the connection pool
+open at DB_POOL_MIN_SIZE with the hot statements prepared, and the crisis
+list in memory. If warm-up fails (say the database is down) the
+error is logged and the worker starts cold instead of crash-looping.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict
+
+from .database import warm_up_pool
+from .public_cache import warm_public_caches
+
+logger = logging.getLogger(__name__)
+
+_warmup_state: Dict[str, Any] = {"complete": False, "seconds": None, "connections": 0, "error": None}
+
+
+async def warm_up() -> None:
+    """Open and prime the connection pool, then load the public caches."""
+    started = time.perf_counter()
+    try:
+        _warmup_state["connections"] = await asyncio.to_thread(warm_up_pool)
+        await asyncio.to_thread(warm_public_caches)
+    except Exception as e:
+        _warmup_state["error"] = str(e)
+        logger.exception("Warm-up failed, starting cold")
+    _warmup_state["seconds"] = time.perf_counter() - started
+    _warmup_state["complete"] = True
+    if _warmup_state["error"] is None:
+        logger.info("Warm-up complete", extra={
+            "duration_ms": round(_warmup_state["seconds"] * 1000, 1),
+            "connections": _warmup_state["connections"],
+        })
+
+
+def warmup_complete() -> bool:
+    return _warmup_state["complete"]
+
+
+def get_warmup_stats() -> Dict[str, Any]:
+    """Whether warm-up has finished, how long it took, connections primed and any error."""
+    return dict(_warmup_state)
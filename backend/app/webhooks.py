@@ -0,0 +1,221 @@
+"""
+Durable inbox for Stripe webhook events.
+
+The webhook endpoint only verifies and stores events; a pool of background
+workers drains the inbox in batches, retrying failures with backoff and
+moving events that keep failing to a dead-letter state.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from .aggregates import apply_succeeded_donation
+from .cache import TTLCache
+from .config import settings
+from .database import (
+    get_db_cursor,
+    insert_webhook_event,
+    claim_webhook_events,
+    mark_webhook_event_processed,
+    mark_webhook_event_failed,
+    fetch_webhook_inbox_stats,
+    create_donation_record,
+    upsert_payment_status,
+)
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = settings.webhook_workers
+WEBHOOK_BATCH_SIZE = settings.webhook_batch_size
+WEBHOOK_POLL_INTERVAL_SECONDS = settings.webhook_poll_interval_seconds
+WEBHOOK_MAX_ATTEMPTS = settings.webhook_max_attempts
+WEBHOOK_RETRY_BASE_SECONDS = settings.webhook_retry_base_seconds
+WEBHOOK_RETRY_MAX_SECONDS = settings.webhook_retry_max_seconds
+WEBHOOK_EVENT_CACHE_SIZE = settings.webhook_event_cache_size
+WEBHOOK_EVENT_CACHE_TTL_SECONDS = settings.webhook_event_cache_ttl_seconds
+
+# Payment intent events that create or update a row in donations
+DONATION_EVENT_TYPES = {
+    "payment_intent.succeeded",
+    "payment_intent.payment_failed",
+    "payment_intent.canceled",
+}
+
+# Per-process counters, reported alongside the inbox backlog
+_worker_stats = {
+    "processed": 0,
+    "failed": 0,
+    "dead_lettered": 0,
+    "last_batch_at": None,
+}
+_worker_tasks: List[asyncio.Task] = []
+
+# Event ids this process has already stored, so Stripe redeliveries are
+# acknowledged without touching the database
+recent_event_ids = TTLCache(maxsize=WEBHOOK_EVENT_CACHE_SIZE, ttl=WEBHOOK_EVENT_CACHE_TTL_SECONDS)
+
+
+def enqueue_webhook_event(event_id: str, event_type: str, payload: Dict[str, Any]) -> bool:
+    """
+    Store a verified event in the inbox unless it was seen before.
+
+    Returns False for redeliveries, whether caught by the in-memory cache
+    or by the inbox's event_id key.
+    """
+    if event_id in recent_event_ids:
+        return False
+    inserted = insert_webhook_event(event_id, event_type, payload)
+    recent_event_ids.set(event_id, True)
+    return inserted
+
+
+def handle_webhook_event(cursor, event: Dict[str, Any]) -> None:
+    """Apply a single Stripe event inside the caller's transaction."""
+    event_type = event["type"]
+
+    # Persist every payment intent status transition for /payments/status
+    if event_type.startswith("payment_intent."):
+        payment_intent = event["data"]["object"]
+        upsert_payment_status(
+            payment_intent_id=payment_intent["id"],
+            status=payment_intent["status"],
+            amount=payment_intent["amount"],
+            currency=payment_intent["currency"],
+            metadata=payment_intent.get("metadata"),
+            observed_at=event["created"],
+            cursor=cursor,
+        )
+
+    if event_type in DONATION_EVENT_TYPES:
+        payment_intent = event["data"]["object"]
+
+        # Record the donation, or its status change, in the database
+        metadata = payment_intent.get("metadata", {})
+        crisis_id = int(metadata.get("crisis_id"))
+        charity_id = int(metadata.get("charity_id")) if metadata.get("charity_id") else None
+        user_id = int(metadata.get("user_id")) if metadata.get("user_id") else None
+
+        donation = create_donation_record(
+            crisis_id=crisis_id,
+            amount=payment_intent["amount"],
+            currency=payment_intent["currency"],
+            stripe_payment_intent_id=payment_intent["id"],
+            status=payment_intent["status"],
+            user_id=user_id,
+            charity_id=charity_id,
+            cursor=cursor,
+        )
+        if donation is None:
+            logger.debug("Donation already up to date", extra={"payment_intent_id": payment_intent["id"]})
+        else:
+            logger.info("Donation recorded", extra={
+                "donation_id": donation["id"],
+                "payment_intent_id": payment_intent["id"],
+                "status": donation["status"],
+            })
+            if donation["status"] == "succeeded":
+                apply_succeeded_donation(
+                    cursor,
+                    crisis_id=crisis_id,
+                    charity_id=charity_id,
+                    amount=payment_intent["amount"],
+                    currency=payment_intent["currency"],
+                    donated_at=donation["created_at"],
+                    user_id=user_id,
+                )
+
+    if event_type == "payment_intent.succeeded":
+        payment_intent = event["data"]["object"]
+        logger.info("Payment succeeded", extra={
+            "payment_intent_id": payment_intent["id"],
+            "amount": payment_intent["amount"],
+            "crisis_id": payment_intent.get("metadata", {}).get("crisis_id"),
+        })
+
+    elif event_type == "payment_intent.payment_failed":
+        payment_intent = event["data"]["object"]
+        logger.info("Payment failed", extra={"payment_intent_id": payment_intent["id"]})
+
+
+def retry_delay_seconds(attempts: int) -> Optional[float]:
+    """
+    Backoff before the next attempt, or None once the event should be dead-lettered.
+
+    attempts is the number of attempts made so far, including the failed one.
+    """
+    if attempts >= WEBHOOK_MAX_ATTEMPTS:
+        return None
+    delay = min(WEBHOOK_RETRY_MAX_SECONDS, WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def process_inbox_batch(limit: int = WEBHOOK_BATCH_SIZE) -> int:
+    """
+    Claim and process one batch of inbox events.
+
+    Each event runs in its own savepoint so one bad event does not roll back
+    the rest of the batch. Returns the number of events claimed.
+    """
+    with get_db_cursor() as cursor:
+        events = claim_webhook_events(cursor, limit)
+        for row in events:
+            try:
+                with cursor.connection.transaction():
+                    handle_webhook_event(cursor, row["payload"])
+                mark_webhook_event_processed(cursor, row["event_id"])
+                _worker_stats["processed"] += 1
+            except Exception as e:
+                delay = retry_delay_seconds(row["attempts"] + 1)
+                mark_webhook_event_failed(cursor, row["event_id"], str(e), delay)
+                _worker_stats["failed"] += 1
+                if delay is None:
+                    _worker_stats["dead_lettered"] += 1
+                    logger.error("Webhook event moved to dead letter",
+                                 extra={"event_id": row["event_id"], "error": str(e)})
+                else:
+                    logger.warning("Webhook event failed, will retry",
+                                   extra={"event_id": row["event_id"], "retry_in_seconds": round(delay), "error": str(e)})
+    _worker_stats["last_batch_at"] = time.time()
+    return len(events)
+
+
+async def _inbox_worker() -> None:
+    """Drain the inbox until cancelled, sleeping while it is empty."""
+    while True:
+        try:
+            claimed = await asyncio.to_thread(process_inbox_batch)
+        except Exception:
+            logger.exception("Webhook inbox worker error")
+            claimed = 0
+        if claimed < WEBHOOK_BATCH_SIZE:
+            await asyncio.sleep(WEBHOOK_POLL_INTERVAL_SECONDS)
+
+
+def start_inbox_workers() -> None:
+    """Start the background inbox worker pool."""
+    for _ in range(WEBHOOK_WORKERS):
+        _worker_tasks.append(asyncio.create_task(_inbox_worker()))
+
+
+async def stop_inbox_workers() -> None:
+    """Cancel the inbox workers and wait for them to exit."""
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+
+
+def get_worker_stats() -> Dict[str, Any]:
+    """This process's webhook worker counters."""
+    return dict(_worker_stats)
+
+
+def get_inbox_metrics() -> Dict[str, Any]:
+    """Inbox backlog and lag plus this process's worker counters."""
+    return {
+        **fetch_webhook_inbox_stats(),
+        "workers": len(_worker_tasks),
+        **_worker_stats,
+    }
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark /me/donations first-page latency for a heavy donor.
+
+Seeds one user with N succeeded donations (100k by default) and times:
+  - the legacy query (every donation, no LIMIT) with only idx_donations_user_id,
+  - the first keyset page with only idx_donations_user_id,
+  - the first keyset page served by idx_donations_user_succeeded.
+
+The index is dropped inside a transaction that is rolled back, so the
+schema is left untouched. Run from the backend directory against a
+scratch database:
+
+    python -m benchmarks.bench_user_donations --donations 100000 --runs 30
+"""
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List
+
+from app.database import get_db_connection, fetch_user_donations
+
+BENCH_EMAIL = "bench-heavy-donor@example.com"
+PAGE_SIZE = 50
+
+# Plans name the per-partition children of idx_donations_user_succeeded,
+# which Postgres derives from the indexed columns
+PARTIAL_INDEX_MARKERS = ("idx_donations_user_succeeded", "_user_id_created_at_id_")
+
+LEGACY_QUERY = """
+    SELECT d.id, d.amount, d.currency, d.created_at,
+           c.title as crisis_title, c.country as crisis_country, ch.name as charity_name
+    FROM donations d
+    JOIN crises c ON d.crisis_id = c.id
+    LEFT JOIN charities ch ON d.charity_id = ch.id
+    WHERE d.user_id = %s AND d.status = 'succeeded'
+    ORDER BY d.created_at DESC
+"""
+
+PAGE_QUERY = """
+    SELECT d.id, d.amount, d.currency, d.created_at,
+           c.title as crisis_title, c.country as crisis_country, ch.name as charity_name
+    FROM donations d
+    JOIN crises c ON d.crisis_id = c.id
+    LEFT JOIN charities ch ON d.charity_id = ch.id
+    WHERE d.user_id = %s AND d.status = 'succeeded'
+    ORDER BY d.created_at DESC, d.id DESC
+    LIMIT %s
+"""
+
+
+def seed_heavy_donor(conn, donations: int) -> int:
+    """Create (or reuse) the benchmark user and give them `donations` succeeded donations."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO users (email, password_hash) VALUES (%s, 'x')
+            ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
+            RETURNING id
+            """,
+            (BENCH_EMAIL,),
+        )
+        user_id = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM donations WHERE user_id = %s", (user_id,))
+        existing = cur.fetchone()[0]
+        if existing < donations:
+            cur.execute(
+                """
+                WITH seeded AS (
+                    SELECT
+                        ch.crisis_id,
+                        ch.id as charity_id,
+                        500 + (g * 7919) %% 50000 as amount,
+                        'pi_bench_' || %(user_id)s || '_' || g as stripe_payment_intent_id,
+                        CASE WHEN g %% 10 = 0 THEN 'requires_payment_method' ELSE 'succeeded' END as status,
+                        CURRENT_TIMESTAMP::timestamp - (g || ' minutes')::interval as created_at
+                    FROM generate_series(%(start)s, %(stop)s) g
+                    JOIN LATERAL (
+                        SELECT id, crisis_id FROM charities
+                        ORDER BY id OFFSET (g %% (SELECT COUNT(*) FROM charities)) LIMIT 1
+                    ) ch ON TRUE
+                ), keys AS (
+                    INSERT INTO donation_keys (stripe_payment_intent_id, created_at)
+                    SELECT stripe_payment_intent_id, created_at FROM seeded
+                    ON CONFLICT (stripe_payment_intent_id) DO NOTHING
+                    RETURNING stripe_payment_intent_id, donation_id
+                )
+                INSERT INTO donations (
+                    id, user_id, crisis_id, charity_id, amount, currency,
+                    stripe_payment_intent_id, status, created_at
+                )
+                SELECT
+                    k.donation_id, %(user_id)s, s.crisis_id, s.charity_id, s.amount, 'usd',
+                    s.stripe_payment_intent_id, s.status, s.created_at
+                FROM seeded s
+                JOIN keys k USING (stripe_payment_intent_id)
+                """,
+                {"user_id": user_id, "start": existing + 1, "stop": donations},
+            )
+        cur.execute("ANALYZE donations")
+    conn.commit()
+    return user_id
+
+
+def time_query(conn, query: str, params: tuple, runs: int) -> Dict[str, Any]:
+    """Run query `runs` times after a warm-up and return latency stats in milliseconds."""
+    timings: List[float] = []
+    rows = 0
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        cur.fetchall()
+        for _ in range(runs):
+            started = time.perf_counter()
+            cur.execute(query, params)
+            rows = len(cur.fetchall())
+            timings.append((time.perf_counter() - started) * 1000)
+        cur.execute("EXPLAIN " + query, params)
+        plan = "\n".join(row[0] for row in cur.fetchall())
+    timings.sort()
+    return {
+        "rows": rows,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        "uses_partial_index": any(marker in plan for marker in PARTIAL_INDEX_MARKERS),
+    }
+
+
+def report(label: str, result: Dict[str, Any]) -> None:
+    print(
+        f"  {label:<44} rows={result['rows']:>7}  "
+        f"p50={result['p50_ms']:8.2f}ms  p95={result['p95_ms']:8.2f}ms  "
+        f"partial_index={'yes' if result['uses_partial_index'] else 'no'}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /me/donations first-page latency")
+    parser.add_argument("--donations", type=int, default=100_000, help="Donations for the heavy donor")
+    parser.add_argument("--runs", type=int, default=30, help="Timed runs per variant")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the benchmark user's donations afterwards")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        print(f"Seeding {args.donations} donations for {BENCH_EMAIL}...")
+        user_id = seed_heavy_donor(conn, args.donations)
+
+        print("Without idx_donations_user_succeeded:")
+        with conn.cursor() as cur:
+            cur.execute("DROP INDEX IF EXISTS idx_donations_user_succeeded")
+        report("legacy query (all rows)", time_query(conn, LEGACY_QUERY, (user_id,), args.runs))
+        report(f"first page (LIMIT {PAGE_SIZE})", time_query(conn, PAGE_QUERY, (user_id, PAGE_SIZE), args.runs))
+        conn.rollback()
+
+        print("With idx_donations_user_succeeded:")
+        report(f"first page (LIMIT {PAGE_SIZE})", time_query(conn, PAGE_QUERY, (user_id, PAGE_SIZE), args.runs))
+        conn.rollback()
+
+        started = time.perf_counter()
+        page = fetch_user_donations(user_id, limit=PAGE_SIZE)
+        print(f"  fetch_user_donations() end to end: {(time.perf_counter() - started) * 1000:.2f}ms ({len(page)} rows)")
+
+        if args.cleanup:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM donation_keys WHERE stripe_payment_intent_id LIKE %s", (f"pi_bench_{user_id}_%",))
+                cur.execute("DELETE FROM donations WHERE user_id = %s", (user_id,))
+                cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Cold-start import time of the backend.
+
+Each run imports the target module (app.main by default) in a fresh
+interpreter with `python -X importtime`, so nothing is cached in-process;
+the OS file cache is warm after the first run. Reported are the median
+total import time over the runs and the modules with the largest cumulative
+and self times, which is where lazy imports pay off. Results can be saved
+as JSON and compared against a baseline; the script exits non-zero when the
+total regresses past --threshold. Run from the backend directory:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 20 --json results/import_time.json
+    python -m benchmarks.import_time --baseline results/import_time.json --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+# "import time: self [us] | cumulative | imported package", nesting shown by indentation
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_once(module: str) -> Dict[str, Tuple[int, int]]:
+    """Import `module` in a new interpreter; (self us, cumulative us) per imported module."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    # app.auth refuses to import without a signing key; any value works here
+    env.setdefault("SECRET_KEY", "import-time-benchmark-secret-key-0123456789")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    timings: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module: str, runs: int, top: int) -> Dict[str, Any]:
+    """Median import timings of `module` and its heaviest dependencies over `runs` runs."""
+    samples = [import_once(module) for _ in range(runs)]
+    totals = [sample[module][1] for sample in samples]
+    names = set().union(*samples)
+    medians = {
+        name: (
+            statistics.median(sample.get(name, (0, 0))[0] for sample in samples),
+            statistics.median(sample.get(name, (0, 0))[1] for sample in samples),
+        )
+        for name in names
+    }
+
+    def heaviest(index: int) -> List[Dict[str, Any]]:
+        ranked = sorted(medians.items(), key=lambda item: item[1][index], reverse=True)
+        return [{"module": name, "self_ms": s / 1000, "cumulative_ms": c / 1000}
+                for name, (s, c) in ranked[:top]]
+
+    return {
+        "module": module,
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "median_ms": statistics.median(totals) / 1000,
+        "min_ms": min(totals) / 1000,
+        "max_ms": max(totals) / 1000,
+        "modules_imported": len(names),
+        "top_cumulative": heaviest(1),
+        "top_self": heaviest(0),
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"import {result['module']}: median {result['median_ms']:.1f}ms "
+          f"(min {result['min_ms']:.1f}ms, max {result['max_ms']:.1f}ms) over {result['runs']} runs, "
+          f"{result['modules_imported']} modules")
+    for title, key in (("cumulative", "top_cumulative"), ("self", "top_self")):
+        print(f"\nTop modules by {title} time")
+        print(f"{'module':<50} {'cumulative':>12} {'self':>10}")
+        for entry in result[key]:
+            print(f"{entry['module']:<50} {entry['cumulative_ms']:>10.1f}ms {entry['self_ms']:>8.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start import time report")
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="Modules listed per table")
+    parser.add_argument("--json", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative increase")
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs, args.top)
+    print_report(result)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        change = result["median_ms"] / baseline["median_ms"] - 1
+        print(f"\nvs baseline: {baseline['median_ms']:.1f}ms -> {result['median_ms']:.1f}ms ({change:+.1%})")
+        if change > args.threshold:
+            print(f"❌ Import time regressed more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
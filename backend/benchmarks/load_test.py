@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the FastAPI backend.
+
+Seeds a local Postgres at a named scale, drives a running server with a
+weighted mix of concurrent clients, and records throughput and p50/p95/p99
+latency per operation as JSON. `compare` flags regressions against a
+stored baseline. Run from the backend directory; the server must use the
+same database and STRIPE_WEBHOOK_SECRET:
+
+    python -m benchmarks.load_test seed --scale small
+    python -m benchmarks.load_test run --scale small --concurrency 32 \\
+        --duration 30 --out results/small.json
+    python -m benchmarks.load_test compare results/baseline-small.json results/small.json
+
+    # Seed and run every scale in turn
+    python -m benchmarks.load_test suite --scales small,medium --out-dir results
+
+The seed step truncates all application tables.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .stripe_emulator import sign_payload
+
+# Synthetic data volumes per scale (see seed_data.seed_synthetic)
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"crises": 100, "charities": 400, "users": 2_000, "donations": 20_000},
+    "medium": {"crises": 1_000, "charities": 5_000, "users": 50_000, "donations": 500_000},
+    "large": {"crises": 5_000, "charities": 25_000, "users": 500_000, "donations": 5_000_000},
+}
+
+# Default operation weights; override with --mix name=weight,...
+DEFAULT_MIX = {
+    "crises_list": 30,
+    "crisis_detail": 25,
+    "charities_list": 15,
+    "login": 5,
+    "dashboard": 10,
+    "webhook": 15,
+}
+
+# Tables emptied before seeding
+SEED_TRUNCATE_TABLES = [
+    "users", "crises", "charities", "donations", "donation_keys", "archive.donations",
+    "payment_intent_statuses", "webhook_inbox", "payment_idempotency_keys",
+    "crisis_donation_totals", "charity_donation_totals", "crisis_donation_rollups",
+    "user_donation_stats", "user_supported_crises", "user_supported_charities",
+]
+
+LOAD_TEST_PASSWORD = "load-test-password"
+
+
+class LoadContext:
+    """Ids and credentials gathered during setup, shared by all clients."""
+
+    def __init__(self, webhook_secret: str):
+        self.webhook_secret = webhook_secret
+        self.crisis_ids: List[int] = []
+        self.users: List[Tuple[int, str]] = []
+        self.tokens: List[str] = []
+
+
+async def op_crises_list(client: httpx.AsyncClient, ctx: LoadContext) -> httpx.Response:
+    return await client.get("/crises/")
+
+
+async def op_crisis_detail(client: httpx.AsyncClient, ctx: LoadContext) -> httpx.Response:
+    return await client.get(f"/crises/{random.choice(ctx.crisis_ids)}")
+
+
+async def op_charities_list(client: httpx.AsyncClient, ctx: LoadContext) -> httpx.Response:
+    return await client.get("/charities/", params={"crisis_id": random.choice(ctx.crisis_ids)})
+
+
+async def op_login(client: httpx.AsyncClient, ctx: LoadContext) -> httpx.Response:
+    _, email = random.choice(ctx.users)
+    return await client.post("/auth/login", json={"email": email, "password": LOAD_TEST_PASSWORD})
+
+
+async def op_dashboard(client: httpx.AsyncClient, ctx: LoadContext) -> httpx.Response:
+    token = random.choice(ctx.tokens)
+    return await client.get("/me/dashboard", headers={"Authorization": f"Bearer {token}"})
+
+
+async def op_webhook(client: httpx.AsyncClient, ctx: LoadContext) -> httpx.Response:
+    user_id, _ = random.choice(ctx.users)
+    payment_intent_id = f"pi_load_{uuid.uuid4().hex}"
+    event = {
+        "id": f"evt_load_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": "payment_intent.succeeded",
+        "created": int(time.time()),
+        "data": {"object": {
+            "id": payment_intent_id,
+            "object": "payment_intent",
+            "amount": random.randint(100, 50_000),
+            "currency": "usd",
+            "status": "succeeded",
+            "created": int(time.time()),
+            "metadata": {"crisis_id": str(random.choice(ctx.crisis_ids)), "user_id": str(user_id)},
+        }},
+    }
+    payload = json.dumps(event).encode("utf-8")
+    return await client.post(
+        "/payments/webhook",
+        content=payload,
+        headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(payload, ctx.webhook_secret)},
+    )
+
+
+OPERATIONS: Dict[str, Callable[[httpx.AsyncClient, LoadContext], Awaitable[httpx.Response]]] = {
+    "crises_list": op_crises_list,
+    "crisis_detail": op_crisis_detail,
+    "charities_list": op_charities_list,
+    "login": op_login,
+    "dashboard": op_dashboard,
+    "webhook": op_webhook,
+}
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse 'name=weight,...' into an operation mix, validating names."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def new_client(base_url: str, concurrency: int) -> httpx.AsyncClient:
+    """An HTTP client sized for the run that never stores cookies."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        # Clients authenticate with bearer tokens; a shared auth cookie would override them
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+    )
+
+
+async def setup_context(client: httpx.AsyncClient, ctx: LoadContext, users: int) -> None:
+    """Collect crisis ids and register/log in the load-test users (not timed)."""
+    response = await client.get("/crises/")
+    response.raise_for_status()
+    ctx.crisis_ids = [crisis["id"] for crisis in response.json()["crises"]]
+    if not ctx.crisis_ids:
+        raise RuntimeError("No crises found; seed the database first")
+
+    for i in range(users):
+        email = f"load-test-{i}@example.com"
+        credentials = {"email": email, "password": LOAD_TEST_PASSWORD}
+        response = await client.post("/auth/register", json=credentials)
+        if response.status_code == 400:
+            response = await client.post("/auth/login", json=credentials)
+        response.raise_for_status()
+        ctx.users.append((response.json()["user"]["id"], email))
+        ctx.tokens.append(response.cookies["auth_token"])
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles (ms) for one operation."""
+    count = len(latencies)
+    result: Dict[str, Any] = {
+        "count": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+    }
+    if count >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result.update(
+            mean_ms=statistics.fmean(latencies),
+            p50_ms=cuts[49],
+            p95_ms=cuts[94],
+            p99_ms=cuts[98],
+            max_ms=max(latencies),
+        )
+    elif count == 1:
+        result.update(mean_ms=latencies[0], p50_ms=latencies[0], p95_ms=latencies[0],
+                      p99_ms=latencies[0], max_ms=latencies[0])
+    return result
+
+
+async def run_load(
+    base_url: str,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    mix: Dict[str, int],
+    users: int,
+    webhook_secret: str,
+) -> Dict[str, Any]:
+    """Drive the server with `concurrency` clients for warmup + duration seconds."""
+    ctx = LoadContext(webhook_secret)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    outcomes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    async with new_client(base_url, concurrency) as client:
+        await setup_context(client, ctx, users)
+        started = time.perf_counter()
+        measure_from = started + warmup
+        deadline = measure_from + duration
+
+        async def worker() -> None:
+            while True:
+                name = random.choices(names, weights)[0]
+                op_started = time.perf_counter()
+                if op_started >= deadline:
+                    return
+                try:
+                    response = await OPERATIONS[name](client, ctx)
+                    outcome = str(response.status_code)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                    failed = True
+                finished = time.perf_counter()
+                if op_started >= measure_from:
+                    latencies[name].append((finished - op_started) * 1000)
+                    outcomes[name][outcome] += 1
+                    if failed:
+                        errors[name] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    endpoints = {name: summarize(latencies[name], errors[name], duration) for name in names}
+    for name in names:
+        # Status codes, or exception names for requests that got no response
+        endpoints[name]["outcomes"] = dict(outcomes[name])
+    return {
+        "endpoints": endpoints,
+        "total": summarize(all_latencies, sum(errors.values()), duration),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_scale(scale: str) -> None:
+    """Empty the application tables and seed sample plus synthetic data at `scale`."""
+    from app.database import get_db_cursor
+    from seed_data import seed_database, seed_synthetic
+
+    with get_db_cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(SEED_TRUNCATE_TABLES)} RESTART IDENTITY CASCADE")
+    seed_database()
+    seed_synthetic(**SCALES[scale])
+
+
+def run_and_save(args: argparse.Namespace, scale: Optional[str], out: Optional[str]) -> Dict[str, Any]:
+    """Run one load test and write its JSON results to `out`."""
+    results = asyncio.run(run_load(
+        args.base_url, args.concurrency, args.duration, args.warmup,
+        args.mix, args.users, args.webhook_secret,
+    ))
+    results["meta"] = {
+        "scale": scale,
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "mix": args.mix,
+        "git_revision": git_revision(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    print_results(results)
+    if out:
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Results written to {out}")
+    return results
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"{'operation':<16} {'count':>8} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for name, stats in rows:
+        print(
+            f"{name:<16} {stats['count']:>8} {stats['throughput_rps']:>9.1f} "
+            f"{stats.get('p50_ms', 0):>9.2f} {stats.get('p95_ms', 0):>9.2f} "
+            f"{stats.get('p99_ms', 0):>9.2f} {stats['errors']:>7}"
+        )
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Return a description of every regression beyond `threshold` (a fraction):
+    higher p50/p95/p99 latency, lower throughput, or a higher error rate.
+    """
+    regressions = []
+    print(f"{'operation':<16} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base in baseline["endpoints"].items():
+        cur = current["endpoints"].get(name)
+        if cur is None:
+            continue
+        checks = [(metric, True) for metric in ("p50_ms", "p95_ms", "p99_ms")] + [("throughput_rps", False)]
+        for metric, higher_is_worse in checks:
+            if metric not in base or metric not in cur or not base[metric]:
+                continue
+            change = (cur[metric] - base[metric]) / base[metric]
+            regressed = change > threshold if higher_is_worse else change < -threshold
+            flag = "  ⚠️" if regressed else ""
+            print(f"{name:<16} {metric:<15} {base[metric]:>10.2f} {cur[metric]:>10.2f} {change:>+8.1%}{flag}")
+            if regressed:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+        if cur["error_rate"] > base["error_rate"] + threshold / 10:
+            regressions.append(f"{name} error_rate {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end load test for the backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_arguments(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument("--base-url", default="http://localhost:8000")
+        sub.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+        sub.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+        sub.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+        sub.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                         help="Operation weights, e.g. crises_list=50,webhook=50")
+        sub.add_argument("--users", type=int, default=20, help="Load-test users to register and log in")
+        sub.add_argument("--webhook-secret", default=os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_emulator"),
+                         help="Must match the server's STRIPE_WEBHOOK_SECRET")
+
+    seed = subparsers.add_parser("seed", help="Reset and seed the database at a scale")
+    seed.add_argument("--scale", choices=SCALES, default="small")
+
+    run = subparsers.add_parser("run", help="Run the load test against a running server")
+    add_run_arguments(run)
+    run.add_argument("--scale", default=None, help="Scale label recorded in the results")
+    run.add_argument("--out", default=None, help="Write results JSON here")
+
+    suite = subparsers.add_parser("suite", help="Seed and run each scale in turn")
+    add_run_arguments(suite)
+    suite.add_argument("--scales", default="small,medium", help="Comma-separated scales")
+    suite.add_argument("--out-dir", default="results")
+
+    compare = subparsers.add_parser("compare", help="Flag regressions against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change")
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed_scale(args.scale)
+    elif args.command == "run":
+        run_and_save(args, args.scale, args.out)
+    elif args.command == "suite":
+        for scale in args.scales.split(","):
+            print(f"\n🌍 Scale: {scale}")
+            seed_scale(scale)
+            run_and_save(args, scale, os.path.join(args.out_dir, f"{scale}.json"))
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {'; '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
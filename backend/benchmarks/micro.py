@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for hot pure-Python paths in the backend.
+
+Each case is timed with timeit: the loop count is auto-ranged to at least
+0.2s and then repeated, so every sample is a mean over many calls with the
+GC disabled. Reported are the median and min time per call, the relative
+standard deviation, and a 95% confidence interval on the mean. A separate
+pass records the tracemalloc peak per call. No database is needed. Run from
+the backend directory:
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter crisis_response --repeat 10 --json results/micro.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+# app.auth refuses to import without a signing key; any value works here
+os.environ.setdefault("SECRET_KEY", "micro-benchmark-secret-key-0123456789abcdef")
+
+import bcrypt
+
+from app.auth import create_access_token, decode_token, hash_password, verify_password
+from app.database import build_crises_query
+from app.models import CrisisListResponse, CrisisResponse
+
+LIST_SIZES = [1, 100, 1_000, 10_000]
+BCRYPT_COSTS = [4, 8, 10, 12]
+# Two-sided 95% Student's t critical values by degrees of freedom
+T_CRITICAL_95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26,
+                 10: 2.23, 15: 2.13, 20: 2.09, 30: 2.04}
+
+
+@dataclass
+class Case:
+    name: str
+    func: Callable[[], Any]
+    # Items processed per call, to report per-item cost for list benchmarks
+    items: int = 1
+
+
+def crisis_rows(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Rows shaped like fetch_crises results."""
+    rng = random.Random(seed)
+    categories = ["Conflict", "Disaster", "Health", "Humanitarian", "Climate"]
+    severities = ["Low", "Medium", "High", "Critical"]
+    now = datetime(2025, 1, 1)
+    return [
+        {
+            "id": i,
+            "title": f"Crisis {i}",
+            "category": rng.choice(categories),
+            "country": "Testland",
+            "latitude": Decimal(f"{rng.uniform(-60, 70):.6f}"),
+            "longitude": Decimal(f"{rng.uniform(-180, 180):.6f}"),
+            "severity": rng.choice(severities),
+            "summary": "Short summary of the situation on the ground.",
+            "description": "A longer description of the crisis. " * 8,
+            "start_date": date(2020, 1, 1) + timedelta(days=rng.randint(0, 1500)),
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+            "total_raised": rng.randint(0, 10_000_000),
+            "donation_count": rng.randint(0, 5_000),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def build_cases() -> List[Case]:
+    cases: List[Case] = []
+
+    for size in LIST_SIZES:
+        rows = crisis_rows(size)
+        models = [CrisisResponse(**row) for row in rows]
+        response = CrisisListResponse(crises=models, total=size)
+        cases += [
+            Case(f"crisis_response.construct[{size}]", lambda rows=rows: [CrisisResponse(**row) for row in rows], size),
+            # What FastAPI does for a response_model: dump to JSON-safe python, then json.dumps
+            Case(f"crisis_response.serialize[{size}]",
+                 lambda response=response: json.dumps(response.model_dump(mode="json")), size),
+            Case(f"crisis_response.dump_json[{size}]", lambda response=response: response.model_dump_json(), size),
+        ]
+
+    token = create_access_token({"user_id": 42, "email": "bench@example.com"})
+    cases += [
+        Case("auth.create_access_token", lambda: create_access_token({"user_id": 42, "email": "bench@example.com"})),
+        Case("auth.decode_token", lambda: decode_token(token)),
+    ]
+
+    # hash_password always uses cost 12; lower costs show how cost scales
+    for cost in BCRYPT_COSTS:
+        cases.append(Case(
+            f"auth.bcrypt_hash[cost={cost}]",
+            lambda cost=cost: bcrypt.hashpw(b"correct horse battery staple", bcrypt.gensalt(rounds=cost)),
+        ))
+    password_hash = hash_password("correct horse battery staple")
+    cases += [
+        Case("auth.hash_password", lambda: hash_password("correct horse battery staple")),
+        Case("auth.verify_password", lambda: verify_password("correct horse battery staple", password_hash)),
+    ]
+
+    cases += [
+        Case("crises_query.build[default]", lambda: build_crises_query()),
+        Case("crises_query.build[all_filters]",
+             lambda: build_crises_query("flood", "Disaster", "High", "funding")),
+    ]
+    return cases
+
+
+def confidence_interval(samples: List[float]) -> float:
+    """Half-width of the 95% confidence interval on the mean of samples."""
+    df = len(samples) - 1
+    if df < 1:
+        return 0.0
+    t = T_CRITICAL_95[max(k for k in T_CRITICAL_95 if k <= df)]
+    return t * statistics.stdev(samples) / math.sqrt(len(samples))
+
+
+def measure_peak_bytes(func: Callable[[], Any], calls: int = 3) -> int:
+    """Largest tracemalloc peak over a few individual calls."""
+    func()
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_case(case: Case, repeat: int, min_time: float) -> Dict[str, Any]:
+    """Time one case and measure its allocation peak."""
+    timer = timeit.Timer(case.func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, math.ceil(number * min_time / elapsed))
+    per_call = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    mean = statistics.fmean(per_call)
+    return {
+        "name": case.name,
+        "loops": number,
+        "repeat": repeat,
+        "median_us": statistics.median(per_call) * 1e6,
+        "min_us": min(per_call) * 1e6,
+        "mean_us": mean * 1e6,
+        "ci95_us": confidence_interval(per_call) * 1e6,
+        "rsd": statistics.stdev(per_call) / mean if len(per_call) > 1 and mean else 0.0,
+        "per_item_us": statistics.median(per_call) * 1e6 / case.items,
+        "peak_kib": measure_peak_bytes(case.func) / 1024,
+    }
+
+
+def format_time(us: float) -> str:
+    if us >= 1e6:
+        return f"{us / 1e6:.2f}s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f}ms"
+    return f"{us:.2f}µs"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for hot pure-Python paths")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed samples per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument("--json", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases() if not args.filter or args.filter in case.name]
+    print(f"{'case':<40} {'median':>10} {'± ci95':>10} {'min':>10} {'rsd':>6} {'per item':>10} {'peak':>10}")
+    results = []
+    for case in cases:
+        result = run_case(case, args.repeat, args.min_time)
+        results.append(result)
+        print(
+            f"{case.name:<40} {format_time(result['median_us']):>10} {format_time(result['ci95_us']):>10} "
+            f"{format_time(result['min_us']):>10} {result['rsd']:>6.1%} "
+            f"{format_time(result['per_item_us']):>10} {result['peak_kib']:>8.1f}KiB"
+        )
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Local Stripe stand-in for load testing the donation flow offline.
+
+Implements the slice of the Stripe API the backend uses (PaymentIntent
+create/retrieve/confirm and Customer create) and delivers signed
+payment_intent.* webhooks to the backend using a test webhook secret.
+Latency, injected API errors and card declines are configurable.
+
+Usage:
+    python -m benchmarks.stripe_emulator --port 12111 \\
+        --webhook-url http://localhost:8000/payments/webhook \\
+        --webhook-secret whsec_emulator --latency-ms 150 --error-rate 0.01
+
+Then start the backend pointed at it:
+    STRIPE_API_BASE=http://localhost:12111 STRIPE_SECRET_KEY=sk_test_emulator \\
+    STRIPE_WEBHOOK_SECRET=whsec_emulator uvicorn app.main:app --port 8000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class EmulatorConfig:
+    """Runtime knobs for the emulator."""
+    webhook_url: Optional[str] = "http://localhost:8000/payments/webhook"
+    webhook_secret: str = "whsec_emulator"
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    decline_rate: float = 0.0
+    auto_confirm_ms: Optional[float] = 500.0
+    webhook_attempts: int = 3
+
+
+def parse_form(body: bytes) -> Dict[str, Any]:
+    """Decode Stripe's form encoding, e.g. metadata[crisis_id]=1, into nested dicts."""
+    params: Dict[str, Any] = {}
+    for key, value in parse_qsl(body.decode("utf-8"), keep_blank_values=True):
+        parts = key.replace("]", "").split("[")
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return params
+
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a Stripe-Signature header value for payload."""
+    timestamp = timestamp or int(time.time())
+    signed = f"{timestamp}.".encode("utf-8") + payload
+    signature = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def stripe_error(status_code: int, message: str, error_type: str = "api_error") -> JSONResponse:
+    """Stripe-shaped error response."""
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"type": error_type, "message": message}},
+    )
+
+
+def create_emulator_app(config: EmulatorConfig) -> FastAPI:
+    """Build the emulator application for the given configuration."""
+    app = FastAPI(title="Stripe Emulator")
+    payment_intents: Dict[str, Dict[str, Any]] = {}
+    idempotent_responses: Dict[str, Dict[str, Any]] = {}
+    stats = {"requests": 0, "injected_errors": 0, "webhooks_sent": 0, "webhooks_failed": 0}
+    background_tasks: set = set()
+    webhook_client = httpx.AsyncClient(timeout=10)
+
+    def spawn(coro) -> None:
+        task = asyncio.create_task(coro)
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    async def deliver_event(event_type: str, payment_intent: Dict[str, Any]) -> None:
+        if not config.webhook_url:
+            return
+        event = {
+            "id": f"evt_{secrets.token_hex(12)}",
+            "object": "event",
+            "api_version": "2024-06-20",
+            "created": int(time.time()),
+            "livemode": False,
+            "type": event_type,
+            "data": {"object": dict(payment_intent)},
+        }
+        payload = json.dumps(event).encode("utf-8")
+        for attempt in range(config.webhook_attempts):
+            try:
+                response = await webhook_client.post(
+                    config.webhook_url,
+                    content=payload,
+                    headers={
+                        "Content-Type": "application/json",
+                        "Stripe-Signature": sign_payload(payload, config.webhook_secret),
+                    },
+                )
+                if response.status_code < 300:
+                    stats["webhooks_sent"] += 1
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        stats["webhooks_failed"] += 1
+
+    async def confirm(payment_intent: Dict[str, Any]) -> None:
+        if payment_intent["status"] in ("succeeded", "canceled"):
+            return
+        if random.random() < config.decline_rate:
+            payment_intent["status"] = "requires_payment_method"
+            payment_intent["last_payment_error"] = {"code": "card_declined", "type": "card_error"}
+            await deliver_event("payment_intent.payment_failed", payment_intent)
+        else:
+            payment_intent["status"] = "succeeded"
+            await deliver_event("payment_intent.succeeded", payment_intent)
+
+    async def auto_confirm(payment_intent: Dict[str, Any]) -> None:
+        await asyncio.sleep(config.auto_confirm_ms / 1000)
+        await confirm(payment_intent)
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        stats["requests"] += 1
+        if request.url.path.startswith("/v1/"):
+            delay_ms = config.latency_ms + random.uniform(-1, 1) * config.latency_jitter_ms
+            if delay_ms > 0:
+                await asyncio.sleep(delay_ms / 1000)
+            if random.random() < config.error_rate:
+                stats["injected_errors"] += 1
+                return stripe_error(500, "Injected emulator error")
+        return await call_next(request)
+
+    @app.post("/v1/payment_intents")
+    async def create_payment_intent(request: Request):
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key and idempotency_key in idempotent_responses:
+            return idempotent_responses[idempotency_key]
+
+        params = parse_form(await request.body())
+        if "amount" not in params or "currency" not in params:
+            return stripe_error(400, "Missing required param: amount or currency", "invalid_request_error")
+
+        payment_intent_id = f"pi_{secrets.token_hex(12)}"
+        payment_intent = {
+            "id": payment_intent_id,
+            "object": "payment_intent",
+            "amount": int(params["amount"]),
+            "currency": params["currency"],
+            "status": "requires_payment_method",
+            "client_secret": f"{payment_intent_id}_secret_{secrets.token_hex(8)}",
+            "metadata": params.get("metadata", {}),
+            "created": int(time.time()),
+            "livemode": False,
+        }
+        payment_intents[payment_intent_id] = payment_intent
+        if idempotency_key:
+            idempotent_responses[idempotency_key] = payment_intent
+
+        spawn(deliver_event("payment_intent.created", payment_intent))
+        if config.auto_confirm_ms is not None:
+            spawn(auto_confirm(payment_intent))
+        return payment_intent
+
+    @app.get("/v1/payment_intents/{payment_intent_id}")
+    async def retrieve_payment_intent(payment_intent_id: str):
+        payment_intent = payment_intents.get(payment_intent_id)
+        if not payment_intent:
+            return stripe_error(404, f"No such payment_intent: '{payment_intent_id}'", "invalid_request_error")
+        return payment_intent
+
+    @app.post("/v1/payment_intents/{payment_intent_id}/confirm")
+    async def confirm_payment_intent(payment_intent_id: str):
+        payment_intent = payment_intents.get(payment_intent_id)
+        if not payment_intent:
+            return stripe_error(404, f"No such payment_intent: '{payment_intent_id}'", "invalid_request_error")
+        await confirm(payment_intent)
+        return payment_intent
+
+    @app.post("/v1/customers")
+    async def create_customer(request: Request):
+        params = parse_form(await request.body())
+        return {
+            "id": f"cus_{secrets.token_hex(8)}",
+            "object": "customer",
+            "email": params.get("email"),
+            "name": params.get("name"),
+            "metadata": params.get("metadata", {}),
+        }
+
+    @app.get("/_emulator/stats")
+    async def get_stats():
+        return {**stats, "payment_intents": len(payment_intents), "pending_webhooks": len(background_tasks)}
+
+    @app.on_event("shutdown")
+    async def close_webhook_client():
+        await webhook_client.aclose()
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Stripe emulator for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--webhook-url", default=EmulatorConfig.webhook_url,
+                        help="Backend webhook endpoint; pass an empty string to disable delivery")
+    parser.add_argument("--webhook-secret", default=EmulatorConfig.webhook_secret)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per API call")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls failing with 500")
+    parser.add_argument("--decline-rate", type=float, default=0.0, help="Fraction of payments declined")
+    parser.add_argument("--auto-confirm-ms", type=float, default=500.0,
+                        help="Confirm each payment intent after this delay; negative to disable")
+    args = parser.parse_args()
+
+    config = EmulatorConfig(
+        webhook_url=args.webhook_url or None,
+        webhook_secret=args.webhook_secret,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        decline_rate=args.decline_rate,
+        auto_confirm_ms=args.auto_confirm_ms if args.auto_confirm_ms >= 0 else None,
+    )
+    uvicorn.run(create_emulator_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
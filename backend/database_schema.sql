@@ -2,7 +2,20 @@
 -- PostgreSQL 15+
 
 -- Drop tables if they exist (for fresh setup)
+DROP VIEW IF EXISTS donations_all;
+DROP SCHEMA IF EXISTS archive CASCADE;
+DROP TABLE IF EXISTS donation_keys CASCADE;
+DROP TABLE IF EXISTS crisis_donation_rollups CASCADE;
+DROP TABLE IF EXISTS user_supported_charities CASCADE;
+DROP TABLE IF EXISTS user_supported_crises CASCADE;
+DROP TABLE IF EXISTS user_donation_stats CASCADE;
+DROP TABLE IF EXISTS charity_donation_totals CASCADE;
+DROP TABLE IF EXISTS crisis_donation_totals CASCADE;
+DROP TABLE IF EXISTS payment_idempotency_keys CASCADE;
+DROP TABLE IF EXISTS webhook_inbox CASCADE;
+DROP TABLE IF EXISTS payment_intent_statuses CASCADE;
 DROP TABLE IF EXISTS donations CASCADE;
+DROP SEQUENCE IF EXISTS donations_id_seq;
 DROP TABLE IF EXISTS charities CASCADE;
 DROP TABLE IF EXISTS crises CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
@@ -42,17 +55,131 @@ CREATE TABLE charities (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create donations table
+-- Create donations table, range partitioned by created_at month.
+-- Partitions are created ahead of time by ensure_donation_partitions()
+-- (see donation_partitions.sql); cold months can be moved to the archive schema.
+CREATE SEQUENCE donations_id_seq;
+
 CREATE TABLE donations (
-    id SERIAL PRIMARY KEY,
+    id INTEGER NOT NULL DEFAULT nextval('donations_id_seq'),
     user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
     crisis_id INTEGER REFERENCES crises(id) ON DELETE CASCADE NOT NULL,
     charity_id INTEGER REFERENCES charities(id) ON DELETE SET NULL,
     amount INTEGER NOT NULL,
     currency VARCHAR(10) NOT NULL,
-    stripe_payment_intent_id VARCHAR(255) UNIQUE NOT NULL,
+    stripe_payment_intent_id VARCHAR(255) NOT NULL,
     status VARCHAR(50) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE donations_id_seq OWNED BY donations.id;
+
+-- One row per payment intent ever recorded, fixing each donation's id and
+-- partition. Partitioned tables cannot enforce uniqueness on
+-- stripe_payment_intent_id alone, so this table does it instead.
+CREATE TABLE donation_keys (
+    stripe_payment_intent_id VARCHAR(255) PRIMARY KEY,
+    donation_id INTEGER NOT NULL DEFAULT nextval('donations_id_seq'),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Archived donation partitions, detached from donations once cold
+CREATE SCHEMA archive;
+
+CREATE TABLE archive.donations (
+    LIKE donations INCLUDING DEFAULTS,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Latest known status of each Stripe payment intent, written by the webhook
+-- so the checkout page can poll without calling Stripe
+CREATE TABLE payment_intent_statuses (
+    payment_intent_id VARCHAR(255) PRIMARY KEY,
+    status VARCHAR(50) NOT NULL,
+    amount INTEGER NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    metadata JSONB NOT NULL DEFAULT '{}',
+    observed_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Verified Stripe webhook events, acknowledged immediately and processed
+-- asynchronously by the inbox workers (event_id deduplicates redeliveries)
+CREATE TABLE webhook_inbox (
+    event_id VARCHAR(255) PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processed', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP
+);
+
+-- Responses of /payments/create-intent keyed by the client's Idempotency-Key,
+-- replayed for retries within the key's TTL
+CREATE TABLE payment_idempotency_keys (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+-- Running totals of succeeded donations, incremented by the webhook workers
+-- and periodically reconciled against donations
+CREATE TABLE crisis_donation_totals (
+    crisis_id INTEGER PRIMARY KEY REFERENCES crises(id) ON DELETE CASCADE,
+    total_amount BIGINT NOT NULL DEFAULT 0,
+    donation_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE charity_donation_totals (
+    charity_id INTEGER PRIMARY KEY REFERENCES charities(id) ON DELETE CASCADE,
+    total_amount BIGINT NOT NULL DEFAULT 0,
+    donation_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Per-user donation summary for the dashboard, updated in the same
+-- transaction that records a succeeded donation
+CREATE TABLE user_donation_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_amount BIGINT NOT NULL DEFAULT 0,
+    currency VARCHAR(10) NOT NULL DEFAULT 'USD',
+    donation_count INTEGER NOT NULL DEFAULT 0,
+    crisis_count INTEGER NOT NULL DEFAULT 0,
+    charity_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Crises and charities each user has supported, so distinct counts in
+-- user_donation_stats stay exact without COUNT(DISTINCT ...)
+CREATE TABLE user_supported_crises (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    crisis_id INTEGER REFERENCES crises(id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, crisis_id)
+);
+
+CREATE TABLE user_supported_charities (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    charity_id INTEGER REFERENCES charities(id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, charity_id)
+);
+
+-- Hourly and daily donation totals per crisis for trend charts, incremented
+-- by the webhook workers and backfilled from donations by a batch job
+CREATE TABLE crisis_donation_rollups (
+    crisis_id INTEGER REFERENCES crises(id) ON DELETE CASCADE,
+    bucket VARCHAR(10) NOT NULL CHECK (bucket IN ('hour', 'day')),
+    bucket_start TIMESTAMP NOT NULL,
+    total_amount BIGINT NOT NULL DEFAULT 0,
+    donation_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (crisis_id, bucket, bucket_start)
 );
 
 -- Create indexes for common queries
@@ -64,8 +191,26 @@ CREATE INDEX idx_charities_crisis_id ON charities(crisis_id);
 CREATE INDEX idx_donations_user_id ON donations(user_id);
 CREATE INDEX idx_donations_crisis_id ON donations(crisis_id);
 CREATE INDEX idx_donations_charity_id ON donations(charity_id);
+-- Serves the keyset-paginated /me/donations list without touching the heap
+CREATE INDEX idx_donations_user_succeeded ON donations(user_id, created_at DESC, id DESC)
+    INCLUDE (amount, currency, crisis_id, charity_id)
+    WHERE status = 'succeeded';
+-- Donations are appended in time order, so a BRIN index serves ad-hoc
+-- created_at ranges at a fraction of a btree's size
+CREATE INDEX idx_donations_created_at_brin ON donations USING BRIN (created_at);
+CREATE INDEX idx_payment_idempotency_keys_created_at ON payment_idempotency_keys(created_at);
+CREATE INDEX idx_webhook_inbox_unprocessed ON webhook_inbox(status, next_attempt_at) WHERE status <> 'processed';
 
 -- Full-text search index
 CREATE INDEX idx_crises_search ON crises USING GIN (
     to_tsvector('english', title || ' ' || summary || ' ' || description || ' ' || country)
 );
+
+-- Partition maintenance functions and the donations_all view
+\ir donation_partitions.sql
+
+-- Partitions for the past year and the next three months
+SELECT ensure_donation_partitions(
+    (CURRENT_DATE - INTERVAL '12 months')::date,
+    (CURRENT_DATE + INTERVAL '3 months')::date
+);
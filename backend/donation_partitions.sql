@@ -0,0 +1,71 @@
+-- Donation partition maintenance
+-- PostgreSQL 15+
+--
+-- Included by database_schema.sql and migrations/partition_donations.sql.
+-- Safe to re-run: everything here is CREATE OR REPLACE.
+
+-- Create any missing monthly partitions of donations covering from_date..to_date.
+-- Months already moved to the archive schema are skipped.
+CREATE OR REPLACE FUNCTION ensure_donation_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        partition_name := format('donations_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(format('public.%I', partition_name)) IS NULL
+            AND to_regclass(format('archive.%I', partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.donations FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move every donations partition that ends on or before cutoff into
+-- archive.donations. Returns the names of the archived partitions.
+CREATE OR REPLACE FUNCTION archive_donation_partitions(cutoff DATE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    partition_name TEXT;
+    month_start DATE;
+BEGIN
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.donations'::regclass
+            AND c.relname ~ '^donations_[0-9]{4}_[0-9]{2}$'
+        ORDER BY c.relname
+    LOOP
+        month_start := to_date(substring(partition_name FROM 11), 'YYYY_MM');
+        IF (month_start + INTERVAL '1 month')::date <= cutoff THEN
+            EXECUTE format('ALTER TABLE public.donations DETACH PARTITION public.%I', partition_name);
+            EXECUTE format('ALTER TABLE public.%I SET SCHEMA archive', partition_name);
+            EXECUTE format(
+                'ALTER TABLE archive.donations ATTACH PARTITION archive.%I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Live and archived donations together, for reconciliation and reporting.
+-- Filters on created_at still prune partitions on both sides.
+CREATE OR REPLACE VIEW donations_all AS
+    SELECT id, user_id, crisis_id, charity_id, amount, currency,
+           stripe_payment_intent_id, status, created_at
+    FROM public.donations
+    UNION ALL
+    SELECT id, user_id, crisis_id, charity_id, amount, currency,
+           stripe_payment_intent_id, status, created_at
+    FROM archive.donations;
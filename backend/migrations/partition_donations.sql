@@ -0,0 +1,91 @@
+-- Convert an existing donations table to monthly range partitions.
+-- PostgreSQL 15+
+--
+-- Run once from the backend directory, ideally with webhook workers stopped:
+--     psql -d globemap -f migrations/partition_donations.sql
+--
+-- The old table is kept as donations_legacy; drop it once the new one checks out.
+
+BEGIN;
+
+LOCK TABLE donations IN ACCESS EXCLUSIVE MODE;
+
+-- Move the old table and its index names out of the way
+ALTER TABLE donations RENAME TO donations_legacy;
+ALTER INDEX donations_pkey RENAME TO donations_legacy_pkey;
+ALTER INDEX donations_stripe_payment_intent_id_key RENAME TO donations_legacy_stripe_payment_intent_id_key;
+ALTER INDEX IF EXISTS idx_donations_user_id RENAME TO idx_donations_legacy_user_id;
+ALTER INDEX IF EXISTS idx_donations_crisis_id RENAME TO idx_donations_legacy_crisis_id;
+ALTER INDEX IF EXISTS idx_donations_charity_id RENAME TO idx_donations_legacy_charity_id;
+ALTER INDEX IF EXISTS idx_donations_user_succeeded RENAME TO idx_donations_legacy_user_succeeded;
+ALTER INDEX IF EXISTS idx_donations_created_at_brin RENAME TO idx_donations_legacy_created_at_brin;
+
+-- Keep the id sequence: existing ids are preserved and new ones continue from it
+ALTER TABLE donations_legacy ALTER COLUMN id DROP DEFAULT;
+ALTER SEQUENCE donations_id_seq OWNED BY NONE;
+UPDATE donations_legacy SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+
+CREATE TABLE donations (
+    id INTEGER NOT NULL DEFAULT nextval('donations_id_seq'),
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    crisis_id INTEGER REFERENCES crises(id) ON DELETE CASCADE NOT NULL,
+    charity_id INTEGER REFERENCES charities(id) ON DELETE SET NULL,
+    amount INTEGER NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    stripe_payment_intent_id VARCHAR(255) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE donations_id_seq OWNED BY donations.id;
+
+CREATE TABLE donation_keys (
+    stripe_payment_intent_id VARCHAR(255) PRIMARY KEY,
+    donation_id INTEGER NOT NULL DEFAULT nextval('donations_id_seq'),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE SCHEMA IF NOT EXISTS archive;
+
+CREATE TABLE archive.donations (
+    LIKE donations INCLUDING DEFAULTS,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX idx_donations_user_id ON donations(user_id);
+CREATE INDEX idx_donations_crisis_id ON donations(crisis_id);
+CREATE INDEX idx_donations_charity_id ON donations(charity_id);
+CREATE INDEX idx_donations_user_succeeded ON donations(user_id, created_at DESC, id DESC)
+    INCLUDE (amount, currency, crisis_id, charity_id)
+    WHERE status = 'succeeded';
+CREATE INDEX idx_donations_created_at_brin ON donations USING BRIN (created_at);
+
+\ir ../donation_partitions.sql
+
+-- Partitions from the oldest donation through three months ahead
+SELECT ensure_donation_partitions(
+    COALESCE((SELECT MIN(created_at)::date FROM donations_legacy), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::date
+);
+
+INSERT INTO donations (
+    id, user_id, crisis_id, charity_id, amount, currency,
+    stripe_payment_intent_id, status, created_at
+)
+SELECT id, user_id, crisis_id, charity_id, amount, currency,
+       stripe_payment_intent_id, status, created_at
+FROM donations_legacy;
+
+INSERT INTO donation_keys (stripe_payment_intent_id, donation_id, created_at)
+SELECT stripe_payment_intent_id, id, created_at FROM donations_legacy;
+
+SELECT setval('donations_id_seq', GREATEST((SELECT MAX(id) FROM donations_legacy), 1));
+
+ANALYZE donations;
+ANALYZE donation_keys;
+
+COMMIT;
+
+-- Once verified:
+--     DROP TABLE donations_legacy;
@@ -1,10 +1,25 @@
 #!/usr/bin/env python3
 """
 Seed script for Global Problems Map database.
-Populates the database with sample crisis and charity data.
+Populates the database with sample crisis and charity data, or with
+synthetic data at production scale:
+
+    python seed_data.py
+    python seed_data.py --synthetic --crises 2000 --charities 10000 \
+        --users 200000 --donations 5000000
 """
 
+import argparse
+import itertools
+import math
 import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import bcrypt
 import psycopg
 from dotenv import load_dotenv
 
@@ -1088,5 +1103,371 @@ def seed_database():
         conn.close()
 
 
+# Synthetic data distributions
+SYNTHETIC_CATEGORIES = ["Conflict", "Disaster", "Health", "Humanitarian", "Climate"]
+SYNTHETIC_CATEGORY_WEIGHTS = [25, 25, 15, 20, 15]
+SYNTHETIC_SEVERITIES = ["Low", "Medium", "High", "Critical"]
+SYNTHETIC_SEVERITY_WEIGHTS = [30, 35, 25, 10]
+# Relative share of donations a crisis attracts, by severity
+SYNTHETIC_SEVERITY_POPULARITY = {"Low": 1, "Medium": 2, "High": 4, "Critical": 8}
+SYNTHETIC_EVENTS = {
+    "Conflict": ["Conflict", "Insurgency", "Displacement"],
+    "Disaster": ["Earthquake", "Flooding", "Cyclone", "Wildfires"],
+    "Health": ["Cholera Outbreak", "Measles Outbreak", "Dengue Epidemic"],
+    "Humanitarian": ["Food Crisis", "Refugee Crisis", "Economic Collapse"],
+    "Climate": ["Drought", "Heatwave", "Coastal Erosion"],
+}
+SYNTHETIC_DONATION_STATUSES = ["succeeded", "requires_payment_method", "canceled"]
+SYNTHETIC_DONATION_STATUS_WEIGHTS = [92, 5, 3]
+# Every synthetic user shares this password, hashed once up front
+SYNTHETIC_PASSWORD = "synthetic-password"
+
+SYNTHETIC_COPY_COLUMNS = {
+    "crises": (
+        ["id", "title", "category", "country", "latitude", "longitude", "severity",
+         "summary", "description", "start_date", "is_active"],
+        ["int4", "varchar", "varchar", "varchar", "numeric", "numeric", "varchar",
+         "text", "text", "date", "bool"],
+    ),
+    "charities": (
+        ["id", "name", "description", "donation_url", "crisis_id"],
+        ["int4", "varchar", "text", "varchar", "int4"],
+    ),
+    "users": (
+        ["id", "email", "password_hash", "created_at"],
+        ["int4", "varchar", "varchar", "timestamp"],
+    ),
+    "donations": (
+        ["id", "user_id", "crisis_id", "charity_id", "amount", "currency",
+         "stripe_payment_intent_id", "status", "created_at"],
+        ["int4", "int4", "int4", "int4", "int4", "varchar", "varchar", "varchar", "timestamp"],
+    ),
+    "donation_keys": (
+        ["stripe_payment_intent_id", "donation_id", "created_at"],
+        ["varchar", "int4", "timestamp"],
+    ),
+}
+
+# Tables whose secondary indexes are dropped during a synthetic load
+SYNTHETIC_INDEXED_TABLES = ["crises", "charities", "users", "donations"]
+
+
+def reserve_ids(cur, table: str, count: int) -> int:
+    """Reserve `count` consecutive ids from a table's sequence; returns the first."""
+    if count < 1:
+        return 0
+    cur.execute(
+        """
+        SELECT setval(pg_get_serial_sequence(%s, 'id'), nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)
+        """,
+        (table, table, count),
+    )
+    return cur.fetchone()[0] - count + 1
+
+
+def copy_rows(conn, table: str, rows: Sequence[Tuple]) -> None:
+    """Load rows into a table with binary COPY and commit."""
+    columns, types = SYNTHETIC_COPY_COLUMNS[table]
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN (FORMAT BINARY)") as copy:
+            copy.set_types(types)
+            for row in rows:
+                copy.write_row(row)
+    conn.commit()
+
+
+def copy_in_batches(conn, table: str, rows: Iterator[Tuple], batch_size: int) -> int:
+    """COPY rows from an iterator in batches of batch_size; returns the row count."""
+    total = 0
+    batch: List[Tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            copy_rows(conn, table, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        copy_rows(conn, table, batch)
+        total += len(batch)
+    return total
+
+
+def drop_secondary_indexes(conn) -> List[Tuple[str, str]]:
+    """Drop indexes not backing a constraint; returns (name, definition) pairs to restore."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = 'public' AND i.tablename = ANY(%s)
+                AND NOT EXISTS (
+                    SELECT 1 FROM pg_constraint con
+                    WHERE con.conindid = format('public.%%I', i.indexname)::regclass
+                )
+            ORDER BY i.indexname
+            """,
+            (SYNTHETIC_INDEXED_TABLES,),
+        )
+        indexes = cur.fetchall()
+        for name, _ in indexes:
+            cur.execute(f'DROP INDEX "{name}"')
+    conn.commit()
+    return indexes
+
+
+def restore_indexes(conn, indexes: List[Tuple[str, str]]) -> None:
+    """
+    Recreate indexes dropped by drop_secondary_indexes, then refresh statistics.
+
+    The saved definition of an index on a partitioned table reads `ON ONLY`,
+    which would recreate just an invalid parent index. Dropping it dropped
+    every partition's index too, so it is rebuilt without ONLY to cascade to
+    the partitions again.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SET maintenance_work_mem = '512MB'")
+        for name, definition in indexes:
+            started = time.perf_counter()
+            cur.execute(definition.replace(" ON ONLY ", " ON ", 1))
+            print(f"  ✓ Rebuilt {name} ({time.perf_counter() - started:.2f}s)")
+        conn.commit()
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = ANY(%s) AND NOT i.indisvalid
+            """,
+            ([name for name, _ in indexes],),
+        )
+        invalid = [row[0] for row in cur.fetchall()]
+        if invalid:
+            raise RuntimeError(f"Indexes left invalid after rebuild: {', '.join(invalid)}")
+        for table in SYNTHETIC_INDEXED_TABLES + ["donation_keys"]:
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
+
+
+def generate_crises(rng: random.Random, first_id: int, count: int) -> Iterator[Tuple]:
+    """Yield crisis rows placed around the sample crises' countries."""
+    today = date.today()
+    for crisis_id in range(first_id, first_id + count):
+        anchor = rng.choice(CRISES)
+        category = rng.choices(SYNTHETIC_CATEGORIES, SYNTHETIC_CATEGORY_WEIGHTS)[0]
+        severity = rng.choices(SYNTHETIC_SEVERITIES, SYNTHETIC_SEVERITY_WEIGHTS)[0]
+        event = rng.choice(SYNTHETIC_EVENTS[category])
+        latitude = max(-90.0, min(90.0, anchor["latitude"] + rng.uniform(-3, 3)))
+        longitude = (anchor["longitude"] + rng.uniform(-3, 3) + 180) % 360 - 180
+        yield (
+            crisis_id,
+            f"{anchor['country']} {event} {crisis_id}",
+            category,
+            anchor["country"],
+            Decimal(f"{latitude:.6f}"),
+            Decimal(f"{longitude:.6f}"),
+            severity,
+            f"{severity} {event.lower()} affecting communities in {anchor['country']}.",
+            f"Synthetic {category.lower()} crisis generated for load testing. {anchor['description']}",
+            today - timedelta(days=rng.randint(0, 15 * 365)),
+            rng.random() < 0.85,
+        )
+
+
+def generate_charities(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+    crisis_ids: Sequence[int],
+) -> Iterator[Tuple]:
+    """Yield charity rows: one per crisis first, the rest spread over random crises."""
+    for offset, charity_id in enumerate(range(first_id, first_id + count)):
+        crisis_id = crisis_ids[offset] if offset < len(crisis_ids) else rng.choice(crisis_ids)
+        yield (
+            charity_id,
+            f"Relief Fund {charity_id}",
+            "Synthetic charity generated for load testing.",
+            f"https://opencollective.com/synthetic-{charity_id}",
+            crisis_id,
+        )
+
+
+def generate_users(rng: random.Random, first_id: int, count: int, days: int) -> Iterator[Tuple]:
+    """Yield user rows sharing one precomputed bcrypt hash of SYNTHETIC_PASSWORD."""
+    password_hash = bcrypt.hashpw(SYNTHETIC_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=12)).decode("utf-8")
+    now = datetime.now()
+    for user_id in range(first_id, first_id + count):
+        yield (
+            user_id,
+            f"user{user_id}@synthetic.example.com",
+            password_hash,
+            now - timedelta(seconds=rng.uniform(0, days * 86400)),
+        )
+
+
+def generate_donations(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+    days: int,
+    first_user_id: int,
+    user_count: int,
+    crises: Sequence[Tuple[int, str]],
+    charities_by_crisis: Dict[int, List[int]],
+) -> Iterator[Tuple]:
+    """
+    Yield donation rows with production-like skew.
+
+    A few heavy donors give a large share, severe crises draw more
+    donations, amounts are log-normal around $25, and ~8% never succeed.
+    """
+    crisis_ids = [crisis_id for crisis_id, _ in crises]
+    crisis_weights = list(
+        itertools.accumulate(SYNTHETIC_SEVERITY_POPULARITY[severity] for _, severity in crises)
+    )
+    now = datetime.now()
+    for donation_id in range(first_id, first_id + count):
+        # Cubing a uniform draw skews toward low ids: the top 1% of users
+        # make about a fifth of all donations
+        user_id = first_user_id + int(user_count * rng.random() ** 3) if user_count else None
+        crisis_id = rng.choices(crisis_ids, cum_weights=crisis_weights)[0]
+        charities = charities_by_crisis.get(crisis_id)
+        amount = int(min(1_000_000, max(100, rng.lognormvariate(math.log(2500), 1.0))))
+        yield (
+            donation_id,
+            user_id,
+            crisis_id,
+            rng.choice(charities) if charities else None,
+            amount,
+            "usd",
+            f"pi_synthetic_{donation_id}",
+            rng.choices(SYNTHETIC_DONATION_STATUSES, SYNTHETIC_DONATION_STATUS_WEIGHTS)[0],
+            now - timedelta(seconds=rng.uniform(0, days * 86400)),
+        )
+
+
+def load_donations(conn, rows: Iterator[Tuple], batch_size: int) -> int:
+    """COPY donations and their donation_keys rows in batches; returns the row count."""
+    total = 0
+    batch: List[Tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            copy_rows(conn, "donations", batch)
+            copy_rows(conn, "donation_keys", [(r[6], r[0], r[8]) for r in batch])
+            total += len(batch)
+            print(f"  … {total} donations")
+            batch = []
+    if batch:
+        copy_rows(conn, "donations", batch)
+        copy_rows(conn, "donation_keys", [(r[6], r[0], r[8]) for r in batch])
+        total += len(batch)
+    return total
+
+
+def seed_synthetic(
+    crises: int,
+    charities: int,
+    users: int,
+    donations: int,
+    days: int = 365,
+    batch_size: int = 50_000,
+    seed: int = 42,
+) -> None:
+    """
+    Append synthetic crises, charities, users and donations using binary COPY.
+
+    Secondary indexes are dropped for the load and rebuilt afterwards, and the
+    donation aggregates are reconciled so the data matches what webhooks
+    would have produced.
+    """
+    from app.database import (
+        ensure_donation_partitions,
+        reconcile_donation_totals,
+        reconcile_user_donation_stats,
+        backfill_donation_rollups,
+    )
+
+    if crises < 1:
+        raise ValueError("At least one crisis is required")
+
+    rng = random.Random(seed)
+    conn = get_connection()
+    started = time.perf_counter()
+    try:
+        print(f"🌍 Generating {crises} crises, {charities} charities, {users} users, {donations} donations...")
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT ensure_donation_partitions((CURRENT_DATE - make_interval(days => %s))::date, CURRENT_DATE)",
+                (days,),
+            )
+            first_crisis = reserve_ids(cur, "crises", crises)
+            first_charity = reserve_ids(cur, "charities", charities)
+            first_user = reserve_ids(cur, "users", users)
+            first_donation = reserve_ids(cur, "donations", donations)
+        conn.commit()
+
+        indexes = drop_secondary_indexes(conn)
+        print(f"  ✓ Dropped {len(indexes)} secondary indexes")
+
+        crisis_rows = list(generate_crises(rng, first_crisis, crises))
+        copy_rows(conn, "crises", crisis_rows)
+        crisis_ids = [row[0] for row in crisis_rows]
+        print(f"  ✓ Loaded {crises} crises")
+
+        charity_rows = list(generate_charities(rng, first_charity, charities, crisis_ids))
+        charities_by_crisis: Dict[int, List[int]] = {}
+        for row in charity_rows:
+            charities_by_crisis.setdefault(row[4], []).append(row[0])
+        copy_in_batches(conn, "charities", iter(charity_rows), batch_size)
+        print(f"  ✓ Loaded {charities} charities")
+
+        copy_in_batches(conn, "users", generate_users(rng, first_user, users, days), batch_size)
+        print(f"  ✓ Loaded {users} users")
+
+        crisis_severities = [(row[0], row[6]) for row in crisis_rows]
+        loaded = load_donations(
+            conn,
+            generate_donations(
+                rng, first_donation, donations, days,
+                first_user, users, crisis_severities, charities_by_crisis,
+            ),
+            batch_size,
+        )
+        print(f"  ✓ Loaded {loaded} donations")
+
+        restore_indexes(conn, indexes)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error seeding synthetic data: {e}")
+        raise
+    finally:
+        conn.close()
+
+    print("  … reconciling donation aggregates")
+    reconcile_donation_totals()
+    reconcile_user_donation_stats()
+    backfill_donation_rollups(days + 1)
+    ensure_donation_partitions(3)
+    print(f"\n✅ Synthetic seed finished in {time.perf_counter() - started:.1f}s")
+
+
 if __name__ == "__main__":
-    seed_database()
+    parser = argparse.ArgumentParser(description="Seed the Global Problems Map database")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Append synthetic data at scale instead of the sample data")
+    parser.add_argument("--crises", type=int, default=1000)
+    parser.add_argument("--charities", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--donations", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365, help="Spread users and donations over this many days")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per COPY batch")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        seed_synthetic(
+            args.crises, args.charities, args.users, args.donations,
+            days=args.days, batch_size=args.batch_size, seed=args.seed,
+        )
+    else:
+        seed_database()
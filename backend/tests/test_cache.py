@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import cache
+from app.cache import StaleWhileRevalidateCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class InlineExecutor:
+    """Runs submitted refreshes straight away, so tests see their result."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("database down")
+        return f"value {self.calls}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def swr(clock):
+    return StaleWhileRevalidateCache(maxsize=4, soft_ttl=10, hard_ttl=60, executor=InlineExecutor(), retry_seconds=5)
+
+
+def test_fresh_entry_is_served_without_loading(swr, clock):
+    load = Loader()
+    assert swr.get("k", load) == ("value 1", None, 0.0)
+    clock.now += 9
+    assert swr.get("k", load) == ("value 1", None, 9)
+    assert load.calls == 1
+
+
+def test_stale_entry_is_served_while_refreshing(swr, clock):
+    load = Loader()
+    swr.get("k", load)
+    clock.now += 10
+    read = swr.get("k", load)
+    assert read.value == "value 1" and read.stale == "revalidating" and read.age == 10
+    assert load.calls == 2
+    assert swr.get("k", load) == ("value 2", None, 0.0)
+
+
+def test_failed_refresh_keeps_serving_old_value(swr, clock):
+    load = Loader()
+    swr.get("k", load)
+    load.fail = True
+    clock.now += 20
+    assert swr.get("k", load).stale == "revalidating"
+    read = swr.get("k", load)
+    assert read.value == "value 1" and read.stale == "error"
+    assert swr.stats()["refresh_failures"] == 1
+
+
+def test_failed_refresh_is_retried_after_retry_seconds(swr, clock):
+    load = Loader()
+    swr.get("k", load)
+    load.fail = True
+    clock.now += 20
+    swr.get("k", load)
+    clock.now += 4
+    swr.get("k", load)
+    assert load.calls == 2
+    load.fail = False
+    clock.now += 1
+    swr.get("k", load)
+    assert load.calls == 3
+    assert swr.get("k", load) == ("value 3", None, 0.0)
+
+
+def test_entry_past_hard_ttl_is_loaded_in_caller(swr, clock):
+    load = Loader()
+    swr.get("k", load)
+    load.fail = True
+    clock.now += 60
+    with pytest.raises(ConnectionError):
+        swr.get("k", load)
+    load.fail = False
+    assert swr.get("k", load) == ("value 3", None, 0.0)
+
+
+def test_values_rejected_by_cache_if_are_not_kept(clock):
+    swr = StaleWhileRevalidateCache(maxsize=4, soft_ttl=10, hard_ttl=60, executor=InlineExecutor(),
+                                    cache_if=lambda value: value is not None)
+    assert swr.get("missing", lambda: None).value is None
+    assert len(swr) == 0
+
+
+def test_least_recently_used_entry_is_evicted(swr):
+    for key in range(4):
+        swr.get(key, Loader())
+    swr.get(0, Loader())
+    swr.get(4, Loader())
+    assert len(swr) == 4
+    load = Loader()
+    swr.get(1, load)
+    assert load.calls == 1
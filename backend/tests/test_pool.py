@@ -0,0 +1,149 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from psycopg.pq import TransactionStatus
+
+from app import pool as pool_module
+from app.pool import ConnectionPool, PoolTimeout
+
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = TransactionStatus.IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.autocommit = False
+        self.info = FakeInfo()
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = TransactionStatus.IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__(lambda: "", **kwargs)
+        self.connections = []
+        self.fail_next = False
+
+    def _connect(self):
+        if self.fail_next:
+            self.fail_next = False
+            raise OSError("connection refused")
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+
+def test_open_fills_to_min_size():
+    pool = FakePool(min_size=2, max_size=4)
+    assert pool.open() == 2
+    stats = pool.get_stats()
+    assert stats["size"] == 2 and stats["idle"] == 2 and stats["in_use"] == 0
+
+
+def test_idle_connection_is_reused():
+    pool = FakePool(max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert first.commits == 2
+    assert pool.get_stats()["opened"] == 1
+
+
+def test_exhausted_pool_times_out():
+    pool = FakePool(max_size=1, timeout=0.05)
+    held = pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    stats = pool.get_stats()
+    assert stats["timeouts"] == 1 and stats["waiting"] == 0
+    assert stats["saturation"] == 1
+    pool.putconn(held)
+
+
+def test_waiter_gets_returned_connection():
+    pool = FakePool(max_size=1, timeout=5)
+    held = pool.getconn()
+    threading.Timer(0.05, pool.putconn, args=(held,)).start()
+    assert pool.getconn() is held
+    assert pool.get_stats()["timeouts"] == 0
+
+
+@pytest.mark.parametrize("breaks", [
+    lambda conn: conn.close(),
+    lambda conn: setattr(conn.info, "transaction_status", TransactionStatus.INERROR),
+    lambda conn: setattr(conn.info, "transaction_status", TransactionStatus.INTRANS),
+])
+def test_broken_connection_is_discarded(breaks):
+    pool = FakePool(max_size=1, timeout=0.05)
+    conn = pool.getconn()
+    breaks(conn)
+    pool.putconn(conn)
+    assert conn.closed
+    stats = pool.get_stats()
+    assert stats["size"] == 0 and stats["idle"] == 0 and stats["discarded"] == 1
+    # The freed slot opens a fresh connection rather than timing out
+    assert pool.getconn() is not conn
+
+
+def test_error_in_block_rolls_back_and_reuses_connection():
+    pool = FakePool(max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("boom")
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert pool.get_stats()["idle"] == 1
+
+
+def test_failed_connect_frees_its_slot():
+    pool = FakePool(max_size=1, timeout=0.05)
+    pool.fail_next = True
+    with pytest.raises(OSError):
+        pool.getconn()
+    stats = pool.get_stats()
+    assert stats["size"] == 0 and stats["failed"] == 1
+    assert pool.getconn() is pool.connections[0]
+
+
+def test_idle_connections_above_min_size_expire(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(pool_module, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    pool = FakePool(min_size=1, max_size=3, max_idle=60)
+    conns = [pool.getconn() for _ in range(3)]
+    for conn in conns:
+        pool.putconn(conn)
+    clock.now += 61
+    pool.putconn(pool.getconn())
+    assert pool.get_stats()["size"] == 1
+    # The most recently returned connection is the one kept
+    assert [conn.closed for conn in conns] == [True, True, False]
+
+
+def test_closed_pool_refuses_requests():
+    pool = FakePool(min_size=1)
+    pool.open()
+    borrowed = pool.getconn()
+    pool.close()
+    with pytest.raises(Exception, match="closed"):
+        pool.getconn()
+    pool.putconn(borrowed)
+    assert borrowed.closed
+    assert pool.get_stats()["size"] == 0
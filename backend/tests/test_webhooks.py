@@ -0,0 +1,69 @@
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+
+import pytest
+
+from app import webhooks
+
+
+@pytest.fixture
+def inbox(monkeypatch):
+    """A fake inbox: claimed rows go in `rows`, failures are recorded in `failed`."""
+    state = SimpleNamespace(rows=[], processed=[], failed=[])
+    cursor = SimpleNamespace(connection=SimpleNamespace(transaction=nullcontext))
+
+    @contextmanager
+    def get_db_cursor():
+        yield cursor
+
+    def mark_failed(cursor, event_id, error, retry_in_seconds):
+        state.failed.append((event_id, error, retry_in_seconds))
+
+    def handle(cursor, payload):
+        if payload.get("fail"):
+            raise ValueError("bad event")
+
+    monkeypatch.setattr(webhooks, "get_db_cursor", get_db_cursor)
+    monkeypatch.setattr(webhooks, "claim_webhook_events", lambda cursor, limit: state.rows[:limit])
+    monkeypatch.setattr(webhooks, "mark_webhook_event_processed",
+                        lambda cursor, event_id: state.processed.append(event_id))
+    monkeypatch.setattr(webhooks, "mark_webhook_event_failed", mark_failed)
+    monkeypatch.setattr(webhooks, "handle_webhook_event", handle)
+    monkeypatch.setattr(webhooks, "_worker_stats", dict(webhooks._worker_stats, processed=0, failed=0, dead_lettered=0))
+    monkeypatch.setattr(webhooks, "WEBHOOK_MAX_ATTEMPTS", 4)
+    monkeypatch.setattr(webhooks, "WEBHOOK_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(webhooks, "WEBHOOK_RETRY_MAX_SECONDS", 30)
+    return state
+
+
+def test_retry_delay_backs_off_exponentially_up_to_the_cap(inbox):
+    for attempts, cap in [(1, 10), (2, 20), (3, 30)]:
+        for _ in range(20):
+            assert cap / 2 <= webhooks.retry_delay_seconds(attempts) <= cap
+
+
+def test_retry_delay_dead_letters_at_max_attempts(inbox):
+    assert webhooks.retry_delay_seconds(4) is None
+    assert webhooks.retry_delay_seconds(5) is None
+
+
+def test_failed_event_is_retried_and_others_still_processed(inbox):
+    inbox.rows = [
+        {"event_id": "evt_bad", "attempts": 0, "payload": {"fail": True}},
+        {"event_id": "evt_ok", "attempts": 0, "payload": {}},
+    ]
+    assert webhooks.process_inbox_batch() == 2
+    assert inbox.processed == ["evt_ok"]
+    [(event_id, error, delay)] = inbox.failed
+    assert event_id == "evt_bad" and error == "bad event"
+    assert 5 <= delay <= 10
+    stats = webhooks.get_worker_stats()
+    assert (stats["processed"], stats["failed"], stats["dead_lettered"]) == (1, 1, 0)
+
+
+def test_event_failing_its_last_attempt_is_dead_lettered(inbox):
+    inbox.rows = [{"event_id": "evt_bad", "attempts": 3, "payload": {"fail": True}}]
+    webhooks.process_inbox_batch()
+    assert inbox.failed == [("evt_bad", "bad event", None)]
+    stats = webhooks.get_worker_stats()
+    assert (stats["failed"], stats["dead_lettered"]) == (1, 1)
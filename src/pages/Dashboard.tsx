@@ -5,7 +5,7 @@ import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { LogOut, Heart, TrendingUp, Building2, Calendar, MapPin, ArrowLeft, User, Trash2, Mail, Lock, Edit2, X, Check } from 'lucide-react';
 import { Link } from 'react-router-dom';
-import api, { authAPI } from '@/lib/auth';
+import api from '@/lib/auth';
 import { useToast } from '@/hooks/use-toast'; // Default axios client with credentials
 
 interface Donation {
@@ -15,7 +15,7 @@ interface Donation {
   created_at: string;
   crisis_title: string;
   crisis_country: string;
-  charity_name: string;
+  charity_name: string | null;
 }
 
 interface DonationSummary {
@@ -25,24 +25,24 @@ interface DonationSummary {
   charity_count: number;
 }
 
-// Custom hook for fetching user donations
-const useUserDonations = () => {
-  return useQuery({
-    queryKey: ['user-donations'],
-    queryFn: async () => {
-      const response = await api.get('/api/me/donations');
-      return response.data as Donation[];
-    },
-  });
-};
+interface DashboardData {
+  user: {
+    id: number;
+    email: string;
+    created_at: string;
+  };
+  donations: Donation[];
+  next_cursor: string | null;
+  summary: DonationSummary;
+}
 
-// Custom hook for fetching donation summary
-const useUserDonationSummary = () => {
+// Custom hook for fetching the user, first page of donations and summary in one request
+const useUserDashboard = () => {
   return useQuery({
-    queryKey: ['user-donation-summary'],
+    queryKey: ['user-dashboard'],
     queryFn: async () => {
-      const response = await api.get('/api/me/donations/summary');
-      return response.data as DonationSummary;
+      const response = await api.get('/api/me/dashboard');
+      return response.data as DashboardData;
     },
   });
 };
@@ -100,17 +100,10 @@ function Dashboard({ onLogout }: DashboardProps) {
   const [newPassword, setNewPassword] = useState('');
   const [confirmPassword, setConfirmPassword] = useState('');
 
-  const { data: donations, isLoading, error, refetch } = useUserDonations();
-  const { data: summary } = useUserDonationSummary();
-
-  // Fetch current user info
-  const { data: currentUser, isLoading: userLoading, error: userError } = useQuery({
-    queryKey: ['current-user'],
-    queryFn: async () => {
-      const response = await authAPI.me();
-      return response;
-    },
-  });
+  const { data: dashboard, isLoading, error, refetch } = useUserDashboard();
+  const donations = dashboard?.donations;
+  const summary = dashboard?.summary;
+  const currentUser = dashboard?.user;
 
   // Debug logging
   console.log('Dashboard Debug:', {
@@ -119,7 +112,6 @@ function Dashboard({ onLogout }: DashboardProps) {
     summary,
     isLoading,
     error: error?.message,
-    userError: userError?.message,
   });
 
   // Update email mutation
@@ -133,7 +125,7 @@ function Dashboard({ onLogout }: DashboardProps) {
         title: 'Success',
         description: 'Email updated successfully',
       });
-      queryClient.invalidateQueries({ queryKey: ['current-user'] });
+      queryClient.invalidateQueries({ queryKey: ['user-dashboard'] });
       setIsEditing(false);
       setNewEmail('');
     },
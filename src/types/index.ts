@@ -14,6 +14,8 @@ export interface Crisis {
   description: string;
   start_date: string;
   is_active: boolean;
+  total_raised?: number;
+  donation_count?: number;
 }
 
 export interface Charity {
@@ -22,6 +24,8 @@ export interface Charity {
   description: string;
   donation_url: string;
   crisis_id: number;
+  total_raised?: number;
+  donation_count?: number;
 }
 
 export interface User {